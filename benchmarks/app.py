@@ -0,0 +1,103 @@
+"""App and requests driven by the benchmarks"""
+
+import re
+from base64 import b64encode
+from dataclasses import dataclass, field
+
+from flask import Flask
+
+from flask_simplelogin import SimpleLogin, login_required
+
+USERNAMES = [f"user{number}" for number in range(100)] + ["admin"]
+
+
+def be_admin(username):
+    if username != "admin":
+        return "User does not have admin role"
+
+
+def be_active(username):
+    return None
+
+
+def have_approval(username):
+    return None
+
+
+def create_app() -> Flask:
+    app = Flask(__name__)
+    app.config["SECRET_KEY"] = "benchmark-secret"
+    SimpleLogin(app)
+
+    @app.route("/usernames")
+    @login_required(username=USERNAMES)
+    def usernames():
+        return "usernames"
+
+    @app.route("/validators")
+    @login_required(must=[be_admin, be_active, have_approval])
+    def validators():
+        return "validators"
+
+    @app.route("/api", methods=["POST"])
+    @login_required(basic=True)
+    def api():
+        return {"data": "api"}
+
+    return app
+
+
+@dataclass
+class Scenario:
+    """A request sent again and again, and the status it must get"""
+
+    name: str
+    method: str
+    path: str
+    status: int
+    headers: dict[str, str] = field(default_factory=dict)
+    body: bytes = b""
+
+
+def _session_cookie(response) -> str:
+    return response.headers["Set-Cookie"].split(";", 1)[0]
+
+
+def build_scenarios(app: Flask) -> list[Scenario]:
+    """Scenarios with the cookies they need, e.g. an anonymous session with a
+    CSRF token to post the login form, so every request can be replayed"""
+    client = app.test_client(use_cookies=False)
+    response = client.get("/login/")
+    anonymous = _session_cookie(response)
+    match = re.search(r'name="csrf_token" type="hidden" value="([^"]+)"', response.text)
+    if match is None:
+        raise RuntimeError("Could not find the CSRF token in the login form")
+    csrf_token = match.group(1)
+
+    form = f"username=admin&password=secret&csrf_token={csrf_token}".encode()
+    form_headers = {
+        "Cookie": anonymous,
+        "Content-Type": "application/x-www-form-urlencoded",
+    }
+    response = client.post("/login/", data=form, headers=form_headers)
+    logged_in = _session_cookie(response)
+
+    credentials = b64encode(b"admin:secret").decode("utf-8")
+    return [
+        Scenario("login_get", "GET", "/login/", 200),
+        Scenario("login_post", "POST", "/login/", 302, form_headers, form),
+        Scenario("logout", "GET", "/logout/", 302, {"Cookie": logged_in}),
+        Scenario("usernames", "GET", "/usernames", 200, {"Cookie": logged_in}),
+        Scenario("validators", "GET", "/validators", 200, {"Cookie": logged_in}),
+        Scenario(
+            "basic_auth_json",
+            "POST",
+            "/api",
+            200,
+            {
+                "Authorization": f"Basic {credentials}",
+                "Content-Type": "application/json",
+            },
+            b"{}",
+        ),
+    ]
@@ -0,0 +1,256 @@
+"""Benchmarks of the login, logout and login_required paths
+
+python -m benchmarks.run
+python -m benchmarks.run --save baseline
+python -m benchmarks.run --compare baseline
+"""
+
+import argparse
+import http.client
+import json
+import platform
+import statistics
+import sys
+import threading
+import time
+import tracemalloc
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from wsgiref.simple_server import WSGIRequestHandler, make_server
+
+from flask import Flask
+
+from benchmarks.app import Scenario, build_scenarios, create_app
+
+BASELINES = Path(__file__).parent / "baselines"
+
+Send = Callable[[Scenario], int]
+
+
+@dataclass
+class Result:
+    scenario: str
+    driver: str
+    requests: int
+    requests_per_second: float
+    p50_ms: float
+    p99_ms: float
+    alloc_kib: float
+
+
+def percentile(values: list[float], percent: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, round(percent / 100 * (len(ordered) - 1)))
+    return ordered[index]
+
+
+@contextmanager
+def client_driver(app: Flask) -> Iterator[Send]:
+    client = app.test_client(use_cookies=False)
+
+    def send(scenario: Scenario) -> int:
+        response = client.open(
+            scenario.path,
+            method=scenario.method,
+            headers=scenario.headers,
+            data=scenario.body,
+        )
+        return response.status_code
+
+    yield send
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+@contextmanager
+def server_driver(app: Flask) -> Iterator[Send]:
+    """A local `wsgiref` server, one connection per request"""
+    server = make_server("127.0.0.1", 0, app, handler_class=QuietHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    port = server.server_port
+
+    def send(scenario: Scenario) -> int:
+        connection = http.client.HTTPConnection("127.0.0.1", port)
+        try:
+            connection.request(
+                scenario.method,
+                scenario.path,
+                body=scenario.body or None,
+                headers=scenario.headers,
+            )
+            response = connection.getresponse()
+            response.read()
+            return response.status
+        finally:
+            connection.close()
+
+    try:
+        yield send
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+DRIVERS = {"client": client_driver, "server": server_driver}
+
+
+def measure(
+    send: Send, scenario: Scenario, driver: str, requests: int, warmup: int
+) -> Result:
+    for _ in range(warmup):
+        status = send(scenario)
+        if status != scenario.status:
+            raise RuntimeError(
+                f"{scenario.name}: expected {scenario.status}, got {status}"
+            )
+
+    latencies = []
+    started_at = time.perf_counter()
+    for _ in range(requests):
+        request_started_at = time.perf_counter()
+        send(scenario)
+        latencies.append(time.perf_counter() - request_started_at)
+    elapsed = time.perf_counter() - started_at
+
+    # a separate pass, since tracing allocations slows everything down
+    peaks = []
+    tracemalloc.start()
+    try:
+        for _ in range(min(requests, 50)):
+            tracemalloc.reset_peak()
+            before, _ = tracemalloc.get_traced_memory()
+            send(scenario)
+            _, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak - before)
+    finally:
+        tracemalloc.stop()
+
+    return Result(
+        scenario=scenario.name,
+        driver=driver,
+        requests=requests,
+        requests_per_second=requests / elapsed,
+        p50_ms=percentile(latencies, 50) * 1000,
+        p99_ms=percentile(latencies, 99) * 1000,
+        alloc_kib=statistics.mean(peaks) / 1024,
+    )
+
+
+def run(
+    drivers: list[str], requests: int, warmup: int, only: list[str] | None = None
+) -> list[Result]:
+    app = create_app()
+    scenarios = [
+        scenario
+        for scenario in build_scenarios(app)
+        if not only or scenario.name in only
+    ]
+    results = []
+    for driver in drivers:
+        with DRIVERS[driver](app) as send:
+            for scenario in scenarios:
+                results.append(measure(send, scenario, driver, requests, warmup))
+    return results
+
+
+def report(results: list[Result], baseline: dict[str, Result] | None = None) -> str:
+    header = f"{'scenario':<18}{'driver':<8}{'req/s':>10}{'p50 ms':>10}"
+    header += f"{'p99 ms':>10}{'alloc KiB':>11}"
+    if baseline is not None:
+        header += f"{'req/s vs base':>15}"
+    lines = [header, "-" * len(header)]
+    for result in results:
+        line = (
+            f"{result.scenario:<18}{result.driver:<8}"
+            f"{result.requests_per_second:>10.0f}{result.p50_ms:>10.3f}"
+            f"{result.p99_ms:>10.3f}{result.alloc_kib:>11.1f}"
+        )
+        if baseline is not None:
+            before = baseline.get(key(result))
+            if before is None:
+                line += f"{'new':>15}"
+            else:
+                change = result.requests_per_second / before.requests_per_second - 1
+                line += f"{change:>+15.1%}"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def key(result: Result) -> str:
+    return f"{result.scenario}/{result.driver}"
+
+
+def save(results: list[Result], name: str) -> Path:
+    BASELINES.mkdir(exist_ok=True)
+    path = BASELINES / f"{name}.json"
+    data = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "results": [asdict(result) for result in results],
+    }
+    path.write_text(json.dumps(data, indent=2) + "\n")
+    return path
+
+
+def load(name: str) -> dict[str, Result]:
+    data = json.loads((BASELINES / f"{name}.json").read_text())
+    results = (Result(**result) for result in data["results"])
+    return {key(result): result for result in results}
+
+
+def regressions(
+    results: list[Result], baseline: dict[str, Result], threshold: float
+) -> list[str]:
+    """Scenarios whose throughput dropped more than `threshold` (e.g. 0.1)"""
+    slower = []
+    for result in results:
+        before = baseline.get(key(result))
+        if before is None:
+            continue
+        if result.requests_per_second < before.requests_per_second * (1 - threshold):
+            slower.append(key(result))
+    return slower
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--warmup", type=int, default=100)
+    parser.add_argument(
+        "--driver", choices=[*DRIVERS, "all"], default="all", help="default: all"
+    )
+    parser.add_argument("--only", nargs="*", help="scenarios to run, default: all")
+    parser.add_argument("--save", metavar="NAME", help="save results as a baseline")
+    parser.add_argument("--compare", metavar="NAME", help="compare with a baseline")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="fail if req/s drops more than this fraction (default: 0.1)",
+    )
+    args = parser.parse_args(argv)
+
+    drivers = list(DRIVERS) if args.driver == "all" else [args.driver]
+    results = run(drivers, args.requests, args.warmup, args.only)
+    baseline = load(args.compare) if args.compare else None
+    print(report(results, baseline))
+
+    if args.save:
+        print(f"\nSaved to {save(results, args.save)}")
+
+    if baseline is not None:
+        slower = regressions(results, baseline, args.threshold)
+        if slower:
+            print(f"\nSlower than {args.compare}: {', '.join(slower)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
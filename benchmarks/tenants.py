@@ -0,0 +1,107 @@
+"""Memory taken by each app served by Simple Login
+
+python -m benchmarks.tenants
+python -m benchmarks.tenants --apps 500 --max-kib 64
+"""
+
+import argparse
+import gc
+import sys
+import tracemalloc
+from collections.abc import Callable
+from dataclasses import dataclass
+
+from flask import Flask
+
+from flask_simplelogin import SimpleLogin
+
+
+@dataclass
+class Footprint:
+    setup: str
+    apps: int
+    total_kib: float
+
+    @property
+    def per_app_kib(self) -> float:
+        return self.total_kib / self.apps
+
+
+def _apps(count: int) -> list[Flask]:
+    apps = []
+    for number in range(count):
+        app = Flask(f"tenant{number}")
+        app.config["SECRET_KEY"] = f"tenant-secret-{number}"
+        apps.append(app)
+    return apps
+
+
+def _shared(apps: list[Flask]) -> list[SimpleLogin]:
+    simple_login = SimpleLogin()
+    for app in apps:
+        simple_login.init_app(app)
+    return [simple_login]
+
+
+def _separate(apps: list[Flask]) -> list[SimpleLogin]:
+    return [SimpleLogin(app) for app in apps]
+
+
+SETUPS: dict[str, Callable[[list[Flask]], list[SimpleLogin]]] = {
+    "shared": _shared,
+    "separate": _separate,
+}
+
+
+def measure(setup: str, count: int) -> Footprint:
+    """Memory still allocated after initializing `count` apps, not counting
+    the apps themselves"""
+    apps = _apps(count)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        extensions = SETUPS[setup](apps)
+        gc.collect()
+        after, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    del extensions
+    return Footprint(setup, count, (after - before) / 1024)
+
+
+def report(footprints: list[Footprint]) -> str:
+    header = f"{'setup':<10}{'apps':>6}{'total KiB':>12}{'KiB/app':>10}"
+    lines = [header, "-" * len(header)]
+    for footprint in footprints:
+        lines.append(
+            f"{footprint.setup:<10}{footprint.apps:>6}"
+            f"{footprint.total_kib:>12.1f}{footprint.per_app_kib:>10.2f}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--apps", type=int, default=100)
+    parser.add_argument(
+        "--max-kib",
+        type=float,
+        help="fail if any setup takes more than this per app",
+    )
+    args = parser.parse_args(argv)
+
+    footprints = [measure(setup, args.apps) for setup in SETUPS]
+    print(report(footprints))
+
+    if args.max_kib is not None:
+        over = [f.setup for f in footprints if f.per_app_kib > args.max_kib]
+        if over:
+            print(f"\nOver {args.max_kib} KiB per app: {', '.join(over)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
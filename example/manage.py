@@ -1,25 +1,16 @@
-import json
 import os
 from functools import wraps
 
 import click
 from flask import Flask, jsonify, render_template
-from werkzeug.security import check_password_hash, generate_password_hash
 
-from flask_simplelogin import Message, SimpleLogin, login_required
+from flask_simplelogin import Message, SimpleLogin, SQLiteUserStore, login_required
 
 # [ -- Utils -- ]
 
-
-def validate_login(user):
-    with open("users.json") as handler:
-        db_users = json.load(handler)
-
-    if not db_users.get(user["username"]):
-        return False
-
-    stored_password = db_users[user["username"]]["password"]
-    return check_password_hash(stored_password, user["password"])
+# users are stored with hashed passwords in a SQLite database, looked up by
+# username on each login (instead of loading all users from a file)
+users = SQLiteUserStore(os.getenv("USERS_DB", "users.db"))
 
 
 def create_user(**data):
@@ -27,24 +18,7 @@ def create_user(**data):
     if "username" not in data or "password" not in data:
         raise ValueError("username and password are required.")
 
-    # Hash the user password
-    data["password"] = generate_password_hash(
-        data.pop("password"), method="pbkdf2:sha256"
-    )
-
-    # Here you insert the `data` in your users database
-    # for this simple example we are recording in a json file
-    with open("users.json") as handler:
-        db_users = json.load(handler)
-
-    # add the new created user to json
-    db_users[data["username"]] = data
-
-    # commit changes to database
-    with open("users.json", "w") as handler:
-        json.dump(db_users, handler)
-
-    return data
+    return users.create_user(**data)
 
 
 # [--- Flask Factories  ---]
@@ -62,11 +36,7 @@ def configure_extensions(app):
         "is_logged_in": Message("already logged in", "success"),
         "logout": None,
     }
-    SimpleLogin(app, login_checker=validate_login, messages=messages)
-    if not os.path.exists("users.json"):
-        with open("users.json", "a") as json_file:
-            # This just touch create a new dbfile
-            json.dump({"username": "", "password": ""}, json_file)
+    SimpleLogin(app, user_store=users, messages=messages)
 
 
 def configure_views(app):
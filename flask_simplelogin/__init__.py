@@ -4,11 +4,19 @@ __author__ = "Bruno Rocha"
 __email__ = "rochacbruno@gmail.com"
 
 
+import asyncio
+import copy
+import hmac
+import inspect
 import logging
 import os
-from functools import wraps
-from typing import Callable, Iterable, Mapping, TypedDict
-from urllib.parse import urljoin, urlparse
+import signal
+import threading
+import time
+from functools import lru_cache, wraps
+from hashlib import sha256
+from types import MappingProxyType
+from typing import Any, Awaitable, Callable, Iterable, Mapping, TypedDict, cast
 from uuid import uuid4
 from warnings import warn
 
@@ -18,17 +26,64 @@ from flask import (
     abort,
     current_app,
     flash,
+    g,
+    jsonify,
     redirect,
     render_template,
     request,
     session,
     url_for,
 )
-from flask.typing import ResponseReturnValue
+from flask.typing import ResponseReturnValue, RouteCallable
 from flask_wtf import FlaskForm, Form  # type: ignore
 from wtforms import PasswordField, StringField
 from wtforms.validators import DataRequired
 
+from flask_simplelogin import signals
+from flask_simplelogin.cache import CredentialCache
+from flask_simplelogin.executor import CheckerExecutor
+from flask_simplelogin.executor import (
+    CheckerOverloadedError as CheckerOverloadedError,
+)
+from flask_simplelogin.hashing import PasswordHasher as PasswordHasher
+from flask_simplelogin.i18n import Message as Message
+from flask_simplelogin.i18n import MessageCatalog
+from flask_simplelogin.metrics import MetricsExporter, MetricsRegistry
+from flask_simplelogin.metrics import PrometheusExporter as PrometheusExporter
+from flask_simplelogin.page import LoginPageCache
+from flask_simplelogin.ratelimit import CounterStorage, LoginRateLimiter
+from flask_simplelogin.ratelimit import (
+    TooManyLoginAttemptsError as TooManyLoginAttemptsError,
+)
+from flask_simplelogin.redirects import RedirectPolicy
+from flask_simplelogin.revocation import RevocationList
+from flask_simplelogin.roles import PERMISSION_BITS, ROLE_BITS
+from flask_simplelogin.roles import RoleRegistry as RoleRegistry
+from flask_simplelogin.sessions import MemorySessionBackend as MemorySessionBackend
+from flask_simplelogin.sessions import (
+    ServerSideSession,
+    ServerSideSessionInterface,
+    SessionBackend,
+)
+from flask_simplelogin.sessions import SQLiteSessionBackend as SQLiteSessionBackend
+from flask_simplelogin.stores import FileUserStore as FileUserStore
+from flask_simplelogin.stores import MemoryUserStore as MemoryUserStore
+from flask_simplelogin.stores import SQLiteUserStore as SQLiteUserStore
+from flask_simplelogin.stores import UserStore
+from flask_simplelogin.tokens import TokenSigner
+from flask_simplelogin.validators import BatchValidator as BatchValidator
+from flask_simplelogin.validators import (
+    Validator,
+    Validators,
+    ValidatorTimings,
+    compile_validators,
+    run_validators,
+    run_validators_async,
+    run_validators_concurrently,
+    run_validators_concurrently_async,
+)
+from flask_simplelogin.validators import batch_validator as batch_validator
+
 logger = logging.getLogger(__name__)
 
 
@@ -37,25 +92,91 @@ class User(TypedDict):
     password: str | None
 
 
-Validator = Callable[[str | None], str | None]
-LoginChecker = Callable[[User], bool]
+CHECKER_SECONDS = "simplelogin_login_checker_seconds"
+VALIDATOR_SECONDS = "simplelogin_validator_seconds"
+FORM_VALIDATION_SECONDS = "simplelogin_form_validation_seconds"
+REDIRECTS = "simplelogin_redirects_total"
+
+BASIC_AUTH_SESSION_MODES = ("always", "changed", "never")
+ANONYMOUS_RESPONSES = ("redirect", "light", "json")
+AUTH_ENVIRON_KEY = "simplelogin.auth"
+
+_executor_lock = threading.Lock()
+
+LoginChecker = Callable[[User], bool | Awaitable[bool]]
+
+Translations = Mapping[str, Mapping[str, Message | str | None]]
+
+
+DEFAULT_CONFIG: Mapping[str, Any] = MappingProxyType(
+    {
+        "blueprint": "simplelogin",
+        "login_url": "/login/",
+        "logout_url": "/logout/",
+        "home_url": "/",
+        "basic_auth_cache_ttl": 0,
+        "basic_auth_cache_size": 1024,
+        "basic_auth_reverify_interval": 0,
+        "basic_auth_session": "changed",
+        "token_max_age": 0,
+        "token_keys": None,
+        "revoke_sessions": False,
+        "checker_max_workers": 0,
+        "checker_queue_size": 16,
+        "checker_retry_after": 1,
+        "validator_max_workers": 4,
+        "validator_queue_size": 16,
+        "metrics": False,
+        "metrics_url": None,
+        "login_page_cache": False,
+        "login_page_max_age": 0,
+        "anonymous_response": "redirect",
+        "password_hash_method": None,
+        "login_rate_limit": 0,
+        "login_rate_window": 60,
+        "login_lockout": 60,
+        "login_lockout_max": 3600,
+    }
+)
+
+DEFAULT_MESSAGES: Mapping[str, Message | None] = MappingProxyType(
+    {
+        "login_success": Message("login success!", "success"),
+        "login_failure": Message("invalid credentials", "danger"),
+        "is_logged_in": Message("already logged in"),
+        "logout": Message("Logged out!"),
+        "login_required": Message("You need to login first", "warning"),
+        "access_denied": Message("Access Denied"),
+        "auth_error": Message("Authentication Error: {0}"),
+    }
+)
+
+
+@lru_cache(maxsize=64)
+def _interned(items: tuple[tuple[str, Any], ...]) -> Mapping[str, Any]:
+    return MappingProxyType(dict(items))
+
 
+def _shared_mapping(values: dict[str, Any]) -> Mapping[str, Any]:
+    """A read only mapping, the same one for every instance (i.e. app) with
+    the same values if they are hashable"""
+    items = tuple(sorted(values.items()))
+    try:
+        return _interned(items)
+    except TypeError:
+        return MappingProxyType(values)
 
-class Message:
-    def __init__(self, text: str, category: str = "primary"):
-        self.text = text
-        self.category = category
 
-    @classmethod
-    def from_current_app(cls, label: str) -> "Message":
-        """Helper to get messages from Flask's current_app"""
-        return current_app.extensions["simplelogin"].messages.get(label)
+def _app_namespace(app: Flask) -> str:
+    """Prefix for the keys an app keeps in storages shared with other apps,
+    the same across restarts"""
+    key = f"{app.import_name}\0{app.config['SECRET_KEY']!r}".encode("utf-8")
+    return sha256(key).hexdigest()[:16] + ":"
 
-    def __str__(self) -> str:
-        return self.text
 
-    def format(self, *args, **kwargs) -> str:
-        return self.text.format(*args, **kwargs)
+def _message_text(label: str, *args) -> str:
+    """The text of a message for the current request, formatted with `args`"""
+    return current_app.extensions["simplelogin"].catalog.format(label, *args)
 
 
 class LoginForm(FlaskForm):
@@ -72,41 +193,150 @@ def default_login_checker(user: User) -> bool:
     if login is ok returns True else False
 
     :param user: dict {'username':'', 'password': ''}
+
+    Credentials are read once from SIMPLELOGIN_USERNAME and SIMPLELOGIN_PASSWORD
+    (environment variables or app.config), see `SimpleLogin.reload_credentials`.
+    If SimpleLogin has a `user_store` the credentials are checked against it.
     """
-    username = user.get("username")
-    password = user.get("password")
-    the_username = os.environ.get(
-        "SIMPLELOGIN_USERNAME", current_app.config.get("SIMPLELOGIN_USERNAME", "admin")
-    )
-    the_password = os.environ.get(
-        "SIMPLELOGIN_PASSWORD", current_app.config.get("SIMPLELOGIN_PASSWORD", "secret")
+    user_store = current_app.extensions["simplelogin"].user_store
+    if user_store is not None:
+        return user_store.check(user)
+
+    return current_app.extensions["simplelogin"].check_default_credentials(
+        user.get("username"), user.get("password")
     )
-    return username == the_username and password == the_password
+
+
+def _digest(value: str | None) -> bytes:
+    return sha256((value or "").encode("utf-8")).digest()
+
+
+def _credential_index(
+    username: str, password: str
+) -> tuple[bytes, bytes | None, str | None]:
+    """Digests compared by `check_default_credentials`. Not cached: a cache
+    would keep plain text passwords, rotated ones included, in memory."""
+    if PasswordHasher.is_hash(password):
+        return _digest(username), None, password
+    return _digest(username), _digest(password), None
+
+
+class AuthContext:
+    """Authentication state of the current request. `method` is "session"
+    (login form), "basic", "token" or None if nobody is logged in."""
+
+    __slots__ = ("logged_in", "username", "method")
+
+    def __init__(
+        self,
+        logged_in: bool = False,
+        username: str | None = None,
+        method: str | None = None,
+    ) -> None:
+        self.logged_in = logged_in
+        self.username = username
+        self.method = method
+
+    def __repr__(self) -> str:
+        return (
+            f"AuthContext(logged_in={self.logged_in!r}, "
+            f"username={self.username!r}, method={self.method!r})"
+        )
+
+
+def get_auth_context() -> AuthContext:
+    """Returns the authentication state of the current request, resolved from
+    the session once and then kept in `flask.g`"""
+    # `g` outlives the request when an app context wraps many requests (e.g.
+    # in tests), so the cache is valid only for the request it was made in
+    current = request.environ
+    cached = g.get("simplelogin_auth")
+    if cached is not None and cached[0] is current:
+        return cast(AuthContext, cached[1])
+
+    # resolved by SimpleLoginMiddleware before the request reached the app
+    auth = current.get(AUTH_ENVIRON_KEY) or _resolve_auth_context()
+    g.simplelogin_auth = (current, auth)
+    return auth
+
+
+def _resolve_auth_context() -> AuthContext:
+    if "simple_logged_in" not in session or _session_is_revoked():
+        return AuthContext()
+    method = "basic" if session.get("simple_basic_auth") else "session"
+    return AuthContext(True, session.get("simple_username"), method)
+
+
+def _set_auth_context(auth: AuthContext | None) -> None:
+    """Sets the state of the current request (stateless basic auth and bearer
+    tokens), or with None makes it resolved again after the session changed"""
+    if auth is None:
+        g.pop("simplelogin_auth", None)
+        request.environ.pop(AUTH_ENVIRON_KEY, None)
+    else:
+        g.simplelogin_auth = (request.environ, auth)
+
+
+def _authenticated_upstream() -> bool:
+    """True if SimpleLoginMiddleware logged the user in before the request
+    reached the app, so views do not check the credentials again"""
+    return request.environ.get(AUTH_ENVIRON_KEY) is not None
+
+
+def _session_is_revoked() -> bool:
+    session_id = session.get("simple_session_id")
+    if session_id is None:
+        return False
+    ext = current_app.extensions.get("simplelogin")
+    return ext is not None and ext.revocations.is_revoked(session_id)
 
 
 def is_logged_in(username: str | Iterable[str] | None = None) -> bool:
     """Checks if user is logged in if `username` is passed check if specified
     user is logged in username can be a list"""
-    if username:
-        if isinstance(username, str):
-            username = (username,)
-        got = get_username()
-        return (
-            "simple_logged_in" in session and isinstance(got, str) and got in username
-        )
-    return "simple_logged_in" in session
+    auth = get_auth_context()
+    if not auth.logged_in or not username:
+        return auth.logged_in
+    if isinstance(username, str):
+        return auth.username == username
+    return auth.username is not None and auth.username in username
 
 
 def get_username() -> str | None:
     """Get current logged in username"""
-    return session.get("simple_username")
+    return get_auth_context().username
+
+
+def _compile_usernames(
+    username: str | Iterable[str] | None,
+) -> frozenset[str] | None:
+    if not username:
+        return None
+    if isinstance(username, str):
+        return frozenset((username,))
+    return frozenset(username)
+
+
+def memoize_validator(validator: Validator, maxsize: int | None = 1024) -> Validator:
+    """Cache the results of a pure validator (one whose result depends only
+    on the username), so it runs once per username. Use `cache_clear()` on
+    the returned validator to invalidate the cache:
+    @login_required(must=memoize_validator(be_admin))
+    """
+    if inspect.iscoroutinefunction(validator):
+        raise TypeError("Only synchronous validators can be memoized")
+
+    return wraps(validator)(lru_cache(maxsize=maxsize)(validator))
 
 
 def login_required(
     function: Callable | None = None,
     username: str | Iterable[str] | None = None,
     basic: bool = False,
-    must: Iterable[Validator] | None = None,
+    must: Validators | None = None,
+    roles: str | Iterable[str] | None = None,
+    permissions: str | Iterable[str] | None = None,
+    concurrent: bool = False,
 ):
     """Decorate views to require login
     @login_required
@@ -115,6 +345,9 @@ def login_required(
     @login_required(username=['admin', 'jon'])
     @login_required(basic=True)
     @login_required(must=[function, another_function])
+    @login_required(must=[function, another_function], concurrent=True)
+    @login_required(roles=['admin', 'editor'])  # any of the roles
+    @login_required(permissions=['read', 'write'])  # all of the permissions
     """
 
     if function and not callable(function):
@@ -123,36 +356,113 @@ def login_required(
             'try login_required(username="foo")'
         )
 
-    def check(
-        validators: Validator | Iterable[Validator] | None,
-    ) -> tuple[str, int] | None:
+    # compiled once, at decoration time, to keep the per request work minimal
+    allowed = _compile_usernames(username)
+    validators = compile_validators(must)
+    concurrent = concurrent and len(validators) > 1
+    required_roles = ROLE_BITS.mask(roles)
+    required_permissions = PERMISSION_BITS.mask(permissions)
+
+    def check() -> tuple[str, int] | None:
         """Return in the first validation error, else return None"""
-        if validators is None:
+        if not validators:
+            return None
+
+        simplelogin = current_app.extensions["simplelogin"]
+        current_username = get_auth_context().username
+        if concurrent:
+            error = run_validators_concurrently(
+                validators,
+                current_username,
+                simplelogin.validator_timings,
+                current_app.ensure_sync,
+                simplelogin.validator_executor,
+            )
+        else:
+            error = run_validators(
+                validators,
+                current_username,
+                simplelogin.validator_timings,
+                current_app.ensure_sync,
+            )
+
+        if error is not None:
+            signals.send(
+                signals.access_denied, username=current_username, reason="validator"
+            )
+            return _message_text("auth_error", error), 403
+        return None
+
+    async def check_async() -> tuple[str, int] | None:
+        """Same as `check`, but awaits coroutine validators"""
+        if not validators:
             return None
 
-        if callable(validators):
-            validators = (validators,)
+        timings = current_app.extensions["simplelogin"].validator_timings
+        current_username = get_auth_context().username
+        if concurrent:
+            error = await run_validators_concurrently_async(
+                validators, current_username, timings
+            )
+        else:
+            error = await run_validators_async(validators, current_username, timings)
+
+        if error is not None:
+            signals.send(
+                signals.access_denied, username=current_username, reason="validator"
+            )
+            return _message_text("auth_error", error), 403
+        return None
+
+    def deny() -> ResponseReturnValue | None:
+        """Return the response for users not allowed in, else return None"""
+        auth = get_auth_context()
+        if not auth.logged_in:
+            signals.send(signals.access_denied, username=None, reason="login_required")
+            return current_app.extensions["simplelogin"].anonymous_response()
+
+        return forbid(auth)
+
+    def forbid(auth: AuthContext) -> ResponseReturnValue | None:
+        """Return a 403 if the user lacks the username, roles or permissions
+        required, else return None"""
+        if allowed is not None and (
+            auth.username is None or auth.username not in allowed
+        ):
+            signals.send(
+                signals.access_denied, username=auth.username, reason="username"
+            )
+            return _message_text("access_denied"), 403
 
-        for validator in validators:
-            error = validator(get_username())
-            if error is not None:
-                return Message.from_current_app("auth_error").format(error), 403
+        if required_roles or required_permissions:
+            registry = current_app.extensions["simplelogin"].roles
+            user_roles, user_permissions = (
+                registry.masks(auth.username) if auth.username else (0, 0)
+            )
+            if (required_roles and not user_roles & required_roles) or (
+                user_permissions & required_permissions != required_permissions
+            ):
+                signals.send(
+                    signals.access_denied, username=auth.username, reason="roles"
+                )
+                return _message_text("access_denied"), 403
 
         return None
 
     def dispatch(
         fun: Callable[..., ResponseReturnValue], *args, **kwargs
     ) -> ResponseReturnValue:
-        if basic and request.is_json:
+        if _authenticated_upstream():
+            return deny() or check() or fun(*args, **kwargs)
+
+        token_response = current_app.extensions["simplelogin"].token_auth()
+        if token_response is None and basic and request.is_json:
             return dispatch_basic_auth(fun, *args, **kwargs)
 
-        if is_logged_in(username=username):
-            return check(must) or fun(*args, **kwargs)
-        elif is_logged_in():
-            return Message.from_current_app("access_denied").text, 403
-        else:
-            SimpleLogin.flash("login_required")
-            return redirect(url_for("simplelogin.login", next=request.path))
+        if token_response not in (None, True):
+            return token_response
+
+        return deny() or check() or fun(*args, **kwargs)
 
     def dispatch_basic_auth(
         fun: Callable[..., ResponseReturnValue], *args, **kwargs
@@ -160,21 +470,42 @@ def login_required(
         simplelogin = current_app.extensions["simplelogin"]
         auth_response = simplelogin.basic_auth()
         if auth_response is True:
-            return check(must) or fun(*args, **kwargs)
+            return forbid(get_auth_context()) or check() or fun(*args, **kwargs)
         else:
             return auth_response
 
-    if function:
+    async def dispatch_async(
+        fun: Callable[..., Awaitable[ResponseReturnValue]], *args, **kwargs
+    ) -> ResponseReturnValue:
+        simplelogin = current_app.extensions["simplelogin"]
+        if _authenticated_upstream():
+            return deny() or await check_async() or await fun(*args, **kwargs)
+
+        token_response = simplelogin.token_auth()
+        if token_response not in (None, True):
+            return token_response
+
+        if token_response is None and basic and request.is_json:
+            auth_response = await simplelogin.basic_auth_async()
+            if auth_response is not True:
+                return auth_response
+            denied = forbid(get_auth_context())
+        else:
+            denied = deny()
 
-        @wraps(function)
-        def simple_decorator(*args, **kwargs) -> ResponseReturnValue:
-            """This is for when decorator is @login_required"""
-            return dispatch(function, *args, **kwargs)
+        if denied is not None:
+            return denied
 
-        return simple_decorator
+        return await check_async() or await fun(*args, **kwargs)
 
-    def decorator(f):
-        """This is for when decorator is @login_required(...)"""
+    def wrap_view(f: Callable) -> Callable:
+        if inspect.iscoroutinefunction(f):
+
+            @wraps(f)
+            async def async_wrap(*args, **kwargs) -> ResponseReturnValue:
+                return await dispatch_async(f, *args, **kwargs)
+
+            return async_wrap
 
         @wraps(f)
         def wrap(*args, **kwargs) -> ResponseReturnValue:
@@ -182,7 +513,12 @@ def login_required(
 
         return wrap
 
-    return decorator
+    if function:
+        # this is for when decorator is @login_required
+        return wrap_view(function)
+
+    # this is for when decorator is @login_required(...)
+    return wrap_view
 
 
 class SimpleLoginNotInitializedError(Exception):
@@ -195,19 +531,11 @@ class SimpleLoginNotInitializedError(Exception):
 class SimpleLogin:
     """Simple Flask Login"""
 
-    messages = {
-        "login_success": Message("login success!", "success"),
-        "login_failure": Message("invalid credentials", "danger"),
-        "is_logged_in": Message("already logged in"),
-        "logout": Message("Logged out!"),
-        "login_required": Message("You need to login first", "warning"),
-        "access_denied": Message("Access Denied"),
-        "auth_error": Message("Authentication Error: {0}"),
-    }
+    messages: Mapping[str, Message | None] = DEFAULT_MESSAGES
 
     @staticmethod
     def flash(label: str, *args, **kwargs) -> None:
-        msg = Message.from_current_app(label)
+        msg = current_app.extensions["simplelogin"].catalog.get(label)
         if not msg:
             return
 
@@ -222,56 +550,178 @@ class SimpleLogin:
         login_checker: LoginChecker | None = None,
         login_form: Form = None,
         messages: Mapping[str, Message] | None = None,
+        user_store: UserStore | None = None,
+        rate_limit_storage: CounterStorage | None = None,
+        session_backend: SessionBackend | None = None,
+        roles: RoleRegistry | None = None,
+        metrics_exporter: MetricsExporter | None = None,
+        translations: Translations | None = None,
     ):
-        self.config = {
-            "blueprint": "simplelogin",
-            "login_url": "/login/",
-            "logout_url": "/logout/",
-            "home_url": "/",
-        }
-        self.app: Flask | None = None
+        self.config: Mapping[str, Any] = DEFAULT_CONFIG
+        self._reset_app_state()
+        self.metrics_exporter = metrics_exporter or PrometheusExporter()
+        self._rate_limit_storage = rate_limit_storage
+        self.session_backend = session_backend
+        self.roles = roles if roles is not None else RoleRegistry()
         self._login_checker = login_checker or default_login_checker
         self._login_form = login_form or LoginForm
+        self.user_store: UserStore | None = None
         self.on_logout_callbacks: list[Callable] = []
+        self.translations = translations
+        self.catalog = MessageCatalog(self.messages, translations)
+        self._root = self
+        self._tenants: list[SimpleLogin] = []
+        if user_store is not None:
+            self._set_user_store(user_store)
         if app is not None:
             self.init_app(
                 app=app,
                 login_checker=login_checker,
                 login_form=login_form,
                 messages=messages,
+                translations=translations,
             )
 
+    def _reset_app_state(self) -> None:
+        """State that belongs to the app this instance is bound to"""
+        self.app: Flask | None = None
+        self.credential_cache: CredentialCache | None = None
+        self.hasher = PasswordHasher()
+        self._credentials = _credential_index("admin", "secret")
+        self._reload_requested = False
+        self.checker_executor: CheckerExecutor | None = None
+        self._validator_executor: CheckerExecutor | None = None
+        self.validator_timings = ValidatorTimings()
+        self.metrics: MetricsRegistry | None = None
+        self.login_page: LoginPageCache | None = None
+        self.token_signer: TokenSigner | None = None
+        self.revocations = RevocationList()
+        self.rate_limiter: LoginRateLimiter | None = None
+        self.redirect_policy: RedirectPolicy | None = None
+        self.namespace = ""
+        self._login_locations = lru_cache(maxsize=1024)(self._login_location)
+
+    def _tenant(self) -> "SimpleLogin":
+        """A copy to bind to another app, sharing the form, checker, user
+        store, role definitions and callbacks but none of the per app state
+        (the roles users have included)"""
+        tenant = copy.copy(self)
+        tenant.config = DEFAULT_CONFIG
+        tenant.roles = self.roles.copy()
+        tenant._reset_app_state()
+        if tenant.user_store is not None:
+            tenant.user_store.register_on_change_callback(tenant.invalidate_credentials)
+            tenant.user_store.register_on_change_callback(tenant.roles.invalidate)
+        self._root._tenants.append(tenant)
+        return tenant
+
+    @property
+    def tenants(self) -> "list[SimpleLogin]":
+        """Every instance bound to an app, this one (if it is) included"""
+        root = self._root
+        bound = [root] if root.app is not None else []
+        return bound + root._tenants
+
+    def for_app(self, app: Flask | None = None) -> "SimpleLogin":
+        """The instance bound to `app` (defaults to the current app), when
+        one SimpleLogin is initialized with many apps"""
+        app = app or current_app
+        tenant = app.extensions.get("simplelogin")
+        if tenant is None or tenant._root is not self._root:
+            raise SimpleLoginNotInitializedError
+        return tenant
+
+    @property
+    def validator_executor(self) -> CheckerExecutor:
+        """Threads for `login_required(concurrent=True)`, created on first use"""
+        if self._validator_executor is None:
+            with _executor_lock:
+                if self._validator_executor is None:
+                    self._validator_executor = CheckerExecutor(
+                        max_workers=int(self.config["validator_max_workers"]),
+                        queue_size=int(self.config["validator_queue_size"]),
+                        retry_after=int(self.config["checker_retry_after"]),
+                    )
+        return self._validator_executor
+
     def login_checker(self, f: LoginChecker) -> LoginChecker:
         """To set login_checker as decorator:
         @simple.login_checher
         def foo(user): ...
         """
         self._login_checker = f
+        for tenant in self.tenants if self is self._root else [self]:
+            tenant._login_checker = f
+            if tenant.app is not None:
+                endpoint = f"{tenant.config['blueprint']}.login"
+                tenant.app.view_functions[endpoint] = tenant._login_view()
         return f
 
+    def _set_user_store(self, user_store: UserStore) -> None:
+        if self.user_store is user_store:
+            return
+
+        previous, self.user_store = self.user_store, user_store
+        user_store.register_on_change_callback(self.invalidate_credentials)
+        user_store.register_on_change_callback(self.roles.invalidate)
+        # roles come from the store unless the registry has a loader of its
+        # own (a tenant's copy may still read from the store it was copied with)
+        loader = self.roles.loader
+        if loader is None or (previous is not None and loader == previous.get_roles):
+            self.roles.loader = user_store.get_roles
+            self.roles.invalidate()
+        if self.config.get("password_hash_method"):
+            user_store.hasher = self.hasher
+            user_store.rehash = True
+
     def init_app(
         self,
         app: Flask,
         login_checker: LoginChecker | None = None,
         login_form: Form | None = None,
         messages: Mapping[str, Message] | None = None,
+        user_store: UserStore | None = None,
+        translations: Translations | None = None,
     ) -> None:
+        if self.app is not None and self.app is not app:
+            self._tenant().init_app(
+                app, login_checker, login_form, messages, user_store, translations
+            )
+            return
+
         if login_checker:
             self._login_checker = login_checker
 
+        if user_store is not None:
+            self._set_user_store(user_store)
+
         if login_form:
             self._login_form = login_form
 
-        if messages and isinstance(messages, dict):
-            cleaned = {k: v for k, v in messages.items() if k in self.messages}
-            for key in cleaned:
-                if isinstance(cleaned[key], str):
-                    cleaned[key] = Message(cleaned[key])
-            self.messages.update(cleaned)
+        if messages:
+            cleaned = {
+                label: Message(message) if isinstance(message, str) else message
+                for label, message in messages.items()
+                if label in DEFAULT_MESSAGES
+            }
+            merged = {**self.messages, **cleaned}
+            self.messages = _shared_mapping(merged)
+
+        if translations is not None:
+            self.translations = translations
+        self.catalog = MessageCatalog(self.messages, self.translations)
 
         self._register(app)
         self._load_config()
         self._set_default_secret()
+        self._configure_sessions()
+        self._configure_credential_cache()
+        self._configure_checker_executor()
+        self._configure_rate_limiter()
+        self._configure_tokens()
+        self._configure_metrics()
+        self._configure_login_page()
+        self._configure_redirects()
         self._register_views()
         self._register_extras()
 
@@ -304,9 +754,86 @@ class SimpleLogin:
                 "Please, use SIMPLELOGIN_ instead."
             )
             warn(msg, FutureWarning)
-            self.config.update(old_config)
 
-        self.config.update(dict((key, value) for key, value in config.items() if value))
+        settings = dict(self.config)
+        settings.update((key, value) for key, value in config.items() if value)
+        self.config = _shared_mapping(settings)
+        if self.config["basic_auth_session"] not in BASIC_AUTH_SESSION_MODES:
+            raise ValueError(
+                "SIMPLELOGIN_BASIC_AUTH_SESSION must be one of: "
+                + ", ".join(BASIC_AUTH_SESSION_MODES)
+            )
+        if self.config["anonymous_response"] not in ANONYMOUS_RESPONSES:
+            raise ValueError(
+                "SIMPLELOGIN_ANONYMOUS_RESPONSE must be one of: "
+                + ", ".join(ANONYMOUS_RESPONSES)
+            )
+
+        self._configure_hasher()
+        self.reload_credentials()
+
+    def _configure_hasher(self) -> None:
+        method = self.config.get("password_hash_method")
+        if not method:
+            return
+
+        self.hasher = PasswordHasher(method)
+        if self.user_store is not None:
+            self.user_store.hasher = self.hasher
+            self.user_store.rehash = True
+
+    def reload_credentials(self) -> None:
+        """Reads the credentials used by `default_login_checker` again, from
+        environment variables or app.config, e.g. after rotating them"""
+        if self.app is None:
+            raise SimpleLoginNotInitializedError
+
+        username = os.environ.get(
+            "SIMPLELOGIN_USERNAME", self.app.config.get("SIMPLELOGIN_USERNAME", "admin")
+        )
+        password = os.environ.get(
+            "SIMPLELOGIN_PASSWORD",
+            self.app.config.get("SIMPLELOGIN_PASSWORD", "secret"),
+        )
+        self._credentials = _credential_index(username, password)
+        self.invalidate_credentials()
+
+    def register_reload_signal(self, signum: int | None = None) -> None:
+        """Calls `reload_credentials` on the first login attempt after the
+        process receives `signum` (defaults to SIGHUP). Must be called from
+        the main thread."""
+        if signum is None:
+            signum = signal.SIGHUP
+
+        def handler(*_) -> None:
+            # the signal can interrupt a thread holding the credential cache
+            # lock, so reloading here could deadlock
+            self._reload_requested = True
+
+        signal.signal(signum, handler)
+
+    def _reload_if_requested(self) -> None:
+        if self._reload_requested:
+            self._reload_requested = False
+            self.reload_credentials()
+
+    def check_default_credentials(
+        self, username: str | None, password: str | None
+    ) -> bool:
+        """Constant time comparison with the credentials loaded from
+        SIMPLELOGIN_USERNAME and SIMPLELOGIN_PASSWORD (which can be a hash
+        created with `PasswordHasher`)"""
+        self._reload_if_requested()
+        the_username, the_password, the_hash = self._credentials
+        if the_hash is not None:
+            valid_password = password is not None and self.hasher.verify(
+                password, the_hash
+            )
+        else:
+            valid_password = hmac.compare_digest(_digest(password), the_password or b"")
+
+        # `&` instead of `and` so the username is always compared
+        return hmac.compare_digest(_digest(username), the_username) & valid_password
 
     def _set_default_secret(self) -> None:
         if self.app is None:
@@ -322,6 +849,175 @@ class SimpleLogin:
             )
             self.app.config["SECRET_KEY"] = secret_key
 
+    def _configure_sessions(self) -> None:
+        if self.app is None:
+            raise SimpleLoginNotInitializedError
+
+        if self._root is not self:
+            # the session backend and the rate limiter storage are shared with
+            # the other apps, so keys are namespaced (not the first app's, so
+            # sessions stored before it served many apps stay valid)
+            self.namespace = _app_namespace(self.app)
+        if self.session_backend is not None:
+            self.app.session_interface = ServerSideSessionInterface(
+                self.session_backend, namespace=self.namespace
+            )
+
+    def _configure_credential_cache(self) -> None:
+        ttl = self.config.get("basic_auth_cache_ttl")
+        if ttl:
+            self.credential_cache = CredentialCache(
+                ttl=float(ttl), maxsize=int(self.config["basic_auth_cache_size"])
+            )
+
+    def _configure_checker_executor(self) -> None:
+        max_workers = self.config.get("checker_max_workers")
+        if max_workers:
+            self.checker_executor = CheckerExecutor(
+                max_workers=int(max_workers),
+                queue_size=int(self.config["checker_queue_size"]),
+                retry_after=int(self.config["checker_retry_after"]),
+            )
+
+    def _configure_rate_limiter(self) -> None:
+        limit = self.config.get("login_rate_limit")
+        if limit:
+            self.rate_limiter = LoginRateLimiter(
+                limit=int(limit),
+                window=float(self.config["login_rate_window"]),
+                lockout=float(self.config["login_lockout"]),
+                max_lockout=float(self.config["login_lockout_max"]),
+                storage=self._rate_limit_storage,
+            )
+
+    def _configure_tokens(self) -> None:
+        if self.app is None:
+            raise SimpleLoginNotInitializedError
+
+        max_age = self.config.get("token_max_age")
+        if max_age:
+            keys = self.config.get("token_keys") or [self.app.config["SECRET_KEY"]]
+            self.token_signer = TokenSigner(keys, max_age=int(max_age))
+
+    def _configure_metrics(self) -> None:
+        if not self.config.get("metrics"):
+            return
+
+        self.metrics = MetricsRegistry()
+        self.metrics.histogram(CHECKER_SECONDS, "Time spent in the login checker")
+        self.metrics.histogram(VALIDATOR_SECONDS, "Time spent in each validator")
+        self.metrics.histogram(
+            FORM_VALIDATION_SECONDS, "Time spent validating the login form"
+        )
+        self.metrics.counter(REDIRECTS, "Redirects by reason")
+        self.validator_timings.observer = self._observe_validator
+
+    def _observe_validator(self, name: str, seconds: float) -> None:
+        if self.metrics is not None:
+            self.metrics.histogram(VALIDATOR_SECONDS).observe(seconds, validator=name)
+
+    def _configure_login_page(self) -> None:
+        mode = self.config.get("login_page_cache")
+        if mode not in (False, True, "always"):
+            raise ValueError('SIMPLELOGIN_LOGIN_PAGE_CACHE must be True or "always"')
+        if mode:
+            self.login_page = LoginPageCache(
+                lambda: self._login_form(),
+                max_age=int(self.config["login_page_max_age"]),
+                only_builtin_template=mode != "always",
+            )
+
+    def _configure_redirects(self) -> None:
+        if self.app is None:
+            raise SimpleLoginNotInitializedError
+
+        allowed_hosts = self.app.config.get("ALLOWED_HOSTS") or ()
+        self.redirect_policy = RedirectPolicy(allowed_hosts)
+
+    def metrics_view(self) -> ResponseReturnValue:
+        """Serves the metrics rendered by `metrics_exporter`"""
+        if self.metrics is None:
+            abort(404)
+        body = self.metrics_exporter.render(self.metrics)
+        return body, 200, {"Content-Type": self.metrics_exporter.content_type}
+
+    def issue_token(self, username: str) -> str:
+        """Creates a bearer token for `username`, valid for `token_max_age`
+        seconds"""
+        if self.token_signer is None:
+            raise RuntimeError("Set SIMPLELOGIN_TOKEN_MAX_AGE to use tokens")
+        return self.token_signer.issue(username)
+
+    def token_auth(self) -> ResponseReturnValue | bool | None:
+        """Authenticates `Authorization: Bearer <token>` requests. Returns None
+        if there is no bearer token (or tokens are disabled), True if the token
+        is valid, and a 401 response otherwise"""
+        if self.token_signer is None:
+            return None
+
+        scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+        if scheme.lower() != "bearer":
+            return None
+
+        claims = self.token_signer.claims(token.strip())
+        if claims is None or self.revocations.is_revoked(claims.token_id):
+            headers = {"WWW-Authenticate": 'Bearer error="invalid_token"'}
+            return "Invalid token", 401, headers
+
+        _set_auth_context(AuthContext(True, claims.username, "token"))
+        return True
+
+    def authenticate(self, basic: bool = False) -> AuthContext:
+        """Authentication state of the current request from its bearer token
+        or session, or from its basic auth credentials if `basic`, without
+        writing to the session"""
+        token_response = self.token_auth()
+        if token_response is not None:
+            return get_auth_context() if token_response is True else AuthContext()
+
+        auth = get_auth_context()
+        credentials = request.authorization
+        if auth.logged_in or not basic or credentials is None:
+            return auth
+
+        if credentials.type == "basic" and self._check_basic_auth(
+            credentials.username, credentials.password
+        ):
+            return AuthContext(True, credentials.username, "basic")
+        return AuthContext()
+
+    def revoke_token(self, token: str) -> bool:
+        """Rejects `token` from now on, until it would have expired anyway.
+        Returns False if it is not a valid token."""
+        if self.token_signer is None:
+            return False
+
+        claims = self.token_signer.claims(token)
+        if claims is None or not claims.token_id:
+            return False
+
+        self.revocations.revoke(claims.token_id, claims.expires_at)
+        return True
+
+    def _revoke_current_session(self) -> None:
+        """Revokes the session ID of the current session, so copies of its
+        cookie are not logged in anymore after a logout"""
+        if self.app is None:
+            raise SimpleLoginNotInitializedError
+
+        session_id = session.get("simple_session_id")
+        if session_id is None:
+            return
+
+        lifetime = self.app.permanent_session_lifetime.total_seconds()
+        self.revocations.revoke(session_id, time.time() + lifetime)
+
+    def invalidate_credentials(self, username: str | None = None) -> None:
+        """Drop cached basic auth verifications, e.g. when a password changes.
+        If `username` is None the whole cache is cleared."""
+        if self.credential_cache is not None:
+            self.credential_cache.invalidate(username)
+
     def _register_views(self) -> None:
         if not self.app:
             raise SimpleLoginNotInitializedError(
@@ -335,7 +1031,7 @@ class SimpleLogin:
         self.blueprint.add_url_rule(
             self.config["login_url"],
             endpoint="login",
-            view_func=self.login,
+            view_func=self._login_view(),
             methods=["GET", "POST"],
         )
 
@@ -346,8 +1042,21 @@ class SimpleLogin:
             methods=["GET"],
         )
 
+        if self.metrics is not None and self.config.get("metrics_url"):
+            self.blueprint.add_url_rule(
+                self.config["metrics_url"],
+                endpoint="metrics",
+                view_func=self.metrics_view,
+                methods=["GET"],
+            )
+
         self.app.register_blueprint(self.blueprint)
 
+    def _login_view(self) -> RouteCallable:
+        if inspect.iscoroutinefunction(self._login_checker):
+            return self.login_async
+        return self.login
+
     def _register_extras(self) -> None:
         if self.app is None:
             raise SimpleLoginNotInitializedError
@@ -360,18 +1069,240 @@ class SimpleLogin:
     ) -> ResponseReturnValue | bool:
         """Support basic_auth via /login or login_required(basic=True)"""
         auth = request.authorization
-        if auth and self._login_checker(
-            {"username": auth.username, "password": auth.password}
-        ):
-            session["simple_logged_in"] = True
-            session["simple_basic_auth"] = True
-            session["simple_username"] = auth.username
+        if auth and self._basic_auth_session_is_fresh(auth.username):
+            return response or True
+
+        if auth and self._check_basic_auth(auth.username, auth.password):
+            self._basic_auth_succeeded(auth.username)
+            return response or True
+
+        return self._basic_auth_failed()
+
+    async def basic_auth_async(
+        self, response: ResponseReturnValue | None = None
+    ) -> ResponseReturnValue | bool:
+        """Same as `basic_auth`, but awaits coroutine login checkers"""
+        auth = request.authorization
+        if auth and self._basic_auth_session_is_fresh(auth.username):
+            return response or True
+
+        if auth and await self._check_basic_auth_async(auth.username, auth.password):
+            self._basic_auth_succeeded(auth.username)
             return response or True
+
+        return self._basic_auth_failed()
+
+    def _basic_auth_succeeded(self, username: str | None) -> None:
+        """Stores the login according to `basic_auth_session`: "always" writes
+        to the session, "changed" writes only values that changed (so an
+        unchanged session is not sent back to the client) and "never" keeps
+        the user only for the current request"""
+        signals.send(signals.basic_auth_checked, username=username, succeeded=True)
+        mode = self.config["basic_auth_session"]
+        if mode == "never":
+            _set_auth_context(AuthContext(True, username, "basic"))
+            return
+
+        values: dict[str, Any] = {
+            "simple_logged_in": True,
+            "simple_basic_auth": True,
+            "simple_username": username,
+        }
+        if self.config.get("basic_auth_reverify_interval"):
+            values["simple_basic_auth_verified_at"] = time.time()
+
+        self._regenerate_session(username)
+        for key, value in values.items():
+            if mode == "always" or session.get(key) != value:
+                session[key] = value
+        _set_auth_context(None)
+
+    def _basic_auth_failed(self) -> ResponseReturnValue:
+        if signals.basic_auth_checked.receivers:
+            auth = request.authorization
+            username = auth.username if auth else None
+            signals.send(signals.basic_auth_checked, username=username, succeeded=False)
+        headers = {"WWW-Authenticate": 'Basic realm="Login Required"'}
+        return "Invalid credentials", 401, headers
+
+    def _basic_auth_session_is_fresh(self, username: str | None) -> bool:
+        """Checks if the session already proves that `username` passed basic
+        auth less than `basic_auth_reverify_interval` seconds ago"""
+        interval = self.config.get("basic_auth_reverify_interval")
+        if not interval or username is None:
+            return False
+
+        if not session.get("simple_basic_auth") or not get_auth_context().logged_in:
+            return False
+
+        if session.get("simple_username") != username:
+            return False
+
+        verified_at = session.get("simple_basic_auth_verified_at")
+        if not isinstance(verified_at, (int, float)):
+            return False
+
+        return 0 <= time.time() - verified_at < float(interval)
+
+    def _check_basic_auth(self, username: str | None, password: str | None) -> bool:
+        self._reload_if_requested()
+        cache = self.credential_cache
+        if cache is None or username is None or password is None:
+            return self._run_login_checker({"username": username, "password": password})
+
+        if cache.get(username, password):
+            return True
+
+        if self._run_login_checker({"username": username, "password": password}):
+            cache.add(username, password)
+            return True
+
+        return False
+
+    async def _check_basic_auth_async(
+        self, username: str | None, password: str | None
+    ) -> bool:
+        self._reload_if_requested()
+        user: User = {"username": username, "password": password}
+        cache = self.credential_cache
+        if cache is None or username is None or password is None:
+            return await self._run_login_checker_async(user)
+
+        if cache.get(username, password):
+            return True
+
+        if await self._run_login_checker_async(user):
+            cache.add(username, password)
+            return True
+
+        return False
+
+    def _rate_limit_keys(self, user: User) -> tuple[str, ...]:
+        """Keys throttled by the rate limiter: the client IP and the username"""
+        ip_key = f"{self.namespace}ip:{request.remote_addr}"
+        if not user.get("username"):
+            return (ip_key,)
+        return ip_key, f"{self.namespace}username:{user.get('username')}"
+
+    def _run_login_checker(self, user: User) -> bool:
+        """Calls the login checker, unless the rate limiter rejects the attempt
+        with `TooManyLoginAttemptsError` (429)"""
+        if self.rate_limiter is None:
+            return self._call_login_checker(user)
+
+        keys = self._rate_limit_keys(user)
+        self.rate_limiter.check(keys)
+        valid = self._call_login_checker(user)
+        self._record_login_attempt(keys, valid)
+        return valid
+
+    async def _run_login_checker_async(self, user: User) -> bool:
+        """Same as `_run_login_checker`, awaiting coroutine checkers"""
+        if self.rate_limiter is None:
+            return await self._call_login_checker_async(user)
+
+        keys = self._rate_limit_keys(user)
+        self.rate_limiter.check(keys)
+        valid = await self._call_login_checker_async(user)
+        self._record_login_attempt(keys, valid)
+        return valid
+
+    def _record_login_attempt(self, keys: tuple[str, ...], valid: bool) -> None:
+        if self.rate_limiter is None:
+            return
+
+        if valid:
+            # only the username is cleared: a valid login for one account
+            # must not reset the failures of the client IP
+            self.rate_limiter.succeeded(keys[1:])
         else:
-            headers = {"WWW-Authenticate": 'Basic realm="Login Required"'}
-            return "Invalid credentials", 401, headers
+            self.rate_limiter.failed(keys)
+
+    def _call_login_checker(self, user: User) -> bool:
+        """Calls the login checker, running coroutine checkers to completion.
+        Raises `CheckerOverloadedError` if the checker executor is full."""
+        started_at = time.perf_counter()
+        try:
+            checker = self._login_checker
+            if inspect.iscoroutinefunction(checker):
+                checker = current_app.ensure_sync(checker)
+            if self.checker_executor is not None:
+                return cast(bool, self.checker_executor.run(checker, user))
+            return cast(bool, checker(user))
+        finally:
+            self._observe(CHECKER_SECONDS, started_at)
+
+    async def _call_login_checker_async(self, user: User) -> bool:
+        """Calls the login checker, awaiting it if it is a coroutine"""
+        started_at = time.perf_counter()
+        try:
+            checker = self._login_checker
+            if self.checker_executor is not None and not inspect.iscoroutinefunction(
+                checker
+            ):
+                future = self.checker_executor.submit(checker, user)
+                return cast(bool, await asyncio.wrap_future(future))
+
+            result = checker(user)
+            if inspect.isawaitable(result):
+                return await result
+            return cast(bool, result)
+        finally:
+            self._observe(CHECKER_SECONDS, started_at)
+
+    def _observe(self, histogram: str, started_at: float, **labels: str) -> None:
+        if self.metrics is not None:
+            elapsed = time.perf_counter() - started_at
+            self.metrics.histogram(histogram).observe(elapsed, **labels)
+
+    def _redirect(self, location: str, reason: str) -> ResponseReturnValue:
+        """A redirect, counted in the metrics by `reason`"""
+        if self.metrics is not None:
+            self.metrics.counter(REDIRECTS).inc(reason=reason)
+        return redirect(location)
+
+    def _login_location(self, script_root: str, path: str) -> str:
+        return url_for(f"{self.config['blueprint']}.login", next=path)
+
+    def anonymous_response(self) -> ResponseReturnValue:
+        """What `login_required` answers to users not logged in: a redirect to
+        the login page, cached by path. With `anonymous_response` set to
+        "light" or "json", clients not asking for HTML get a redirect without
+        a flashed message (so the session is not written), or a 401."""
+        location = self._login_locations(request.script_root, request.path)
+        mode = self.config["anonymous_response"]
+        if mode == "redirect":
+            SimpleLogin.flash("login_required")
+            return self._redirect(location, "login_required")
 
-    def login(self) -> ResponseReturnValue:
+        if "text/html" in request.headers.get("Accept", ""):
+            SimpleLogin.flash("login_required")
+            response = self._redirect(location, "login_required")
+        elif mode == "json":
+            message = self.catalog.get("login_required")
+            response = jsonify(
+                error="login_required", message=message.text if message else None
+            )
+            response.status_code = 401
+        else:
+            if self.metrics is not None:
+                self.metrics.counter(REDIRECTS).inc(reason="login_required")
+            response = current_app.response_class(
+                status=302, headers={"Location": location}
+            )
+
+        response.vary.add("Accept")  # type: ignore[union-attr]
+        return response
+
+    def _validate_form(self, form: Form) -> bool:
+        started_at = time.perf_counter()
+        try:
+            return bool(form.validate_on_submit())
+        finally:
+            self._observe(FORM_VALIDATION_SECONDS, started_at)
+
+    def _login_destiny(self) -> str:
+        """Returns the `next` URL, aborting if it points to a foreign host"""
         if self.app is None:
             raise SimpleLoginNotInitializedError
 
@@ -380,47 +1311,141 @@ class SimpleLogin:
             default=request.form.get("next", default=self.config.get("home_url", "/")),
         )
 
-        host_url = urlparse(request.host_url)
-        redirect_url = urlparse(urljoin(request.host_url, destiny))
-        if (
-            host_url.netloc != redirect_url.netloc
-            and redirect_url.netloc not in self.app.config.get("ALLOWED_HOSTS", [])
-        ):
-            return abort(400, "Invalid next url, can only redirect to the same host")
+        allowed_hosts = self.app.config.get("ALLOWED_HOSTS") or ()
+        policy = self.redirect_policy
+        if policy is None or policy.source is not allowed_hosts:
+            # ALLOWED_HOSTS was replaced since the last request
+            policy = self.redirect_policy = RedirectPolicy(allowed_hosts)
+
+        if not policy.is_allowed(request.host, destiny):
+            abort(400, "Invalid next url, can only redirect to the same host")
+
+        return destiny
+
+    def _regenerate_session(self, username: str | None) -> None:
+        """Server side sessions get a new ID when a user logs in, so an ID
+        known before the login (session fixation) is useless afterwards.
+        With `revoke_sessions` each login gets an ID that logout revokes."""
+        auth = get_auth_context()
+        if auth.logged_in and auth.username == username:
+            return
+        if isinstance(session, ServerSideSession):
+            session.regenerate()
+        if self.config.get("revoke_sessions"):
+            session["simple_session_id"] = uuid4().hex
+
+    def _login_succeeded(self, form: Form, destiny: str) -> ResponseReturnValue:
+        self._regenerate_session(form.data.get("username"))
+        self.flash("login_success")
+        session["simple_logged_in"] = True
+        session["simple_username"] = form.data.get("username")
+        _set_auth_context(None)
+        signals.send(
+            signals.login_succeeded, username=form.data.get("username"), method="form"
+        )
+        return self._redirect(destiny, "login")
+
+    def _login_failed(self, form: Form, destiny: str) -> ResponseReturnValue:
+        signals.send(
+            signals.login_failed, username=form.data.get("username"), method="form"
+        )
+        self.flash("login_failure")
+        # invalid credentials RFC7235
+        return render_template("login.html", form=form, next=destiny), 401
+
+    def _json_login_response(self, destiny: str) -> ResponseReturnValue:
+        """Response to a successful JSON login: a bearer token if tokens are
+        enabled, else a redirect to `destiny`"""
+        username = cast(str, get_username())
+        signals.send(signals.login_succeeded, username=username, method="json")
+        if self.token_signer is None:
+            return self._redirect(destiny, "login")
+
+        return jsonify(
+            token=self.token_signer.issue(username),
+            token_type="Bearer",
+            expires_in=self.token_signer.max_age,
+        )
 
+    def _json_login_failed(self) -> None:
+        auth = request.authorization
+        username = auth.username if auth else None
+        signals.send(signals.login_failed, username=username, method="json")
+
+    def login(self) -> ResponseReturnValue:
+        destiny = self._login_destiny()
         if is_logged_in():
             self.flash("is_logged_in")
-            return redirect(destiny)
+            return self._redirect(destiny, "is_logged_in")
 
         # recommended to use `login_required(basic=True)` instead this
         if request.is_json:
-            resp = self.basic_auth(redirect(destiny))
-            if not isinstance(resp, bool):
-                return resp  # should not happen since we passed a response
+            resp = self.basic_auth()
+            if resp is not True:
+                self._json_login_failed()
+                return cast(ResponseReturnValue, resp)
+            return self._json_login_response(destiny)
+
+        if self.login_page is not None and request.method == "GET":
+            page = self.login_page.render(destiny)
+            if page is not None:
+                return page
 
         form = self._login_form()
-        ret_code = 200
-        if form.validate_on_submit():
-            if self._login_checker(form.data):
-                self.flash("login_success")
-                session["simple_logged_in"] = True
-                session["simple_username"] = form.data.get("username")
-                return redirect(destiny)
-            else:
-                self.flash("login_failure")
-                ret_code = 401  # <-- invalid credentials RFC7235
-
-        return render_template("login.html", form=form, next=destiny), ret_code
+        if self._validate_form(form):
+            if self._run_login_checker(form.data):
+                return self._login_succeeded(form, destiny)
+            return self._login_failed(form, destiny)
+
+        return render_template("login.html", form=form, next=destiny), 200
+
+    async def login_async(self) -> ResponseReturnValue:
+        """Login view used when the login checker is a coroutine function"""
+        destiny = self._login_destiny()
+        if is_logged_in():
+            self.flash("is_logged_in")
+            return self._redirect(destiny, "is_logged_in")
+
+        if request.is_json:
+            resp = await self.basic_auth_async()
+            if resp is not True:
+                self._json_login_failed()
+                return cast(ResponseReturnValue, resp)
+            return self._json_login_response(destiny)
+
+        if self.login_page is not None and request.method == "GET":
+            page = self.login_page.render(destiny)
+            if page is not None:
+                return page
+
+        form = self._login_form()
+        if self._validate_form(form):
+            if await self._run_login_checker_async(form.data):
+                return self._login_succeeded(form, destiny)
+            return self._login_failed(form, destiny)
+
+        return render_template("login.html", form=form, next=destiny), 200
 
     def register_on_logout_callback(self, callback: Callable) -> None:
         """Register a callback to be called on logout"""
         self.on_logout_callbacks.append(callback)
 
     def logout(self) -> ResponseReturnValue:
+        username = get_username()
+        if username is not None:
+            self.invalidate_credentials(username)
+
+        scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+        if scheme.lower() == "bearer":
+            self.revoke_token(token.strip())
+
+        self._revoke_current_session()
         session.clear()
+        _set_auth_context(None)
         self.flash("logout")
 
         for callback in self.on_logout_callbacks:
             callback()
 
-        return redirect(self.config.get("home_url", "/"))
+        signals.send(signals.logged_out, username=username)
+        return self._redirect(self.config.get("home_url", "/"), "logout")
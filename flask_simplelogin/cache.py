@@ -0,0 +1,83 @@
+"""Cache of credentials already verified by the login checker"""
+
+import hmac
+import os
+import threading
+import time
+from collections import OrderedDict
+from hashlib import sha256
+from typing import Callable
+
+
+class CredentialCache:
+    """Bounded, TTL based cache of successful credential verifications.
+
+    Entries are keyed on a HMAC of the username and password (using a random
+    per-process key), so plain text passwords are never stored."""
+
+    def __init__(
+        self,
+        ttl: float,
+        maxsize: int = 1024,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._clock = clock
+        self._key = os.urandom(32)
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[bytes, tuple[float, str]] = OrderedDict()
+        self._by_username: dict[str, set[bytes]] = {}
+
+    def _digest(self, username: str, password: str) -> bytes:
+        msg = f"{len(username)}:{username}{password}".encode("utf-8")
+        return hmac.new(self._key, msg, sha256).digest()
+
+    def _discard(self, digest: bytes) -> None:
+        _, username = self._entries.pop(digest)
+        digests = self._by_username.get(username)
+        if digests is not None:
+            digests.discard(digest)
+            if not digests:
+                del self._by_username[username]
+
+    def get(self, username: str, password: str) -> bool:
+        """Returns True if this pair of credentials was verified recently"""
+        digest = self._digest(username, password)
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is not None and entry[0] > self._clock():
+                self._entries.move_to_end(digest)
+                self.hits += 1
+                return True
+            if entry is not None:
+                self._discard(digest)
+            self.misses += 1
+            return False
+
+    def add(self, username: str, password: str) -> None:
+        """Records a successful verification of these credentials"""
+        digest = self._digest(username, password)
+        with self._lock:
+            if digest in self._entries:
+                self._discard(digest)
+            self._entries[digest] = (self._clock() + self.ttl, username)
+            self._by_username.setdefault(username, set()).add(digest)
+            while len(self._entries) > self.maxsize:
+                self._discard(next(iter(self._entries)))
+
+    def invalidate(self, username: str | None = None) -> None:
+        """Forget cached verifications for `username` (or for everyone)"""
+        with self._lock:
+            if username is None:
+                self._entries.clear()
+                self._by_username.clear()
+                return
+
+            for digest in tuple(self._by_username.get(username, ())):
+                self._discard(digest)
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,89 @@
+"""Bounded thread pool to run CPU heavy login checkers"""
+
+import contextvars
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, TypeVar
+
+from werkzeug.exceptions import ServiceUnavailable
+
+T = TypeVar("T")
+
+
+class CheckerOverloadedError(ServiceUnavailable):
+    """Raised (and rendered as a 503 with `Retry-After`) when there are too
+    many login checks running or waiting to run"""
+
+    description = "Too many login attempts in progress, please try again later"
+
+
+class LatencyStats:
+    """Minimal accumulator of durations in seconds"""
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self.count += 1
+            self.total += seconds
+            self.max = max(self.max, seconds)
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+
+class CheckerExecutor:
+    """Runs login checkers in at most `max_workers` threads, with up to
+    `queue_size` calls waiting for a free thread. Calls beyond that fail fast
+    with `CheckerOverloadedError`."""
+
+    def __init__(
+        self, max_workers: int = 4, queue_size: int = 16, retry_after: int = 1
+    ):
+        self.max_workers = max_workers
+        self.queue_size = queue_size
+        self.retry_after = retry_after
+        self.rejected = 0
+        self.queue_wait = LatencyStats()
+        self.checker_latency = LatencyStats()
+        self._slots = threading.BoundedSemaphore(max_workers + queue_size)
+        self._pool = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="simplelogin-checker"
+        )
+
+    def submit(self, fn: Callable[..., T], *args) -> "Future[T]":
+        if not self._slots.acquire(blocking=False):
+            self.rejected += 1
+            raise CheckerOverloadedError(retry_after=self.retry_after)
+
+        submitted_at = time.perf_counter()
+
+        def task() -> T:
+            started_at = time.perf_counter()
+            self.queue_wait.record(started_at - submitted_at)
+            try:
+                return fn(*args)
+            finally:
+                self.checker_latency.record(time.perf_counter() - started_at)
+
+        try:
+            # copying the context makes Flask's current_app available to fn
+            future = self._pool.submit(contextvars.copy_context().run, task)
+        except BaseException:
+            self._slots.release()
+            raise
+
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def run(self, fn: Callable[..., T], *args) -> T:
+        return self.submit(fn, *args).result()
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._pool.shutdown(wait=wait)
@@ -0,0 +1,131 @@
+"""Password hashing with tunable cost, compatible with werkzeug's hashes"""
+
+import hashlib
+import hmac
+import secrets
+import string
+import time
+
+from werkzeug.security import check_password_hash
+
+SALT_CHARS = string.ascii_letters + string.digits
+
+DEFAULT_PBKDF2_ITERATIONS = 600_000
+
+
+class PasswordHasher:
+    """Hashes and verifies passwords using `hashlib`'s pbkdf2 or scrypt.
+
+    The `method` includes the cost parameters, in the same format used by
+    werkzeug's `generate_password_hash`:
+    PasswordHasher("pbkdf2:sha256:600000")
+    PasswordHasher("scrypt:32768:8:1")  # n, r and p
+    """
+
+    def __init__(
+        self,
+        method: str = f"pbkdf2:sha256:{DEFAULT_PBKDF2_ITERATIONS}",
+        salt_length: int = 16,
+    ):
+        self._parse(method)  # raises ValueError early for invalid methods
+        self.method = method
+        self.salt_length = salt_length
+
+    @staticmethod
+    def _parse(method: str) -> tuple[str, tuple]:
+        name, *args = method.split(":")
+        if name == "pbkdf2" and len(args) == 2:
+            hashlib.new(args[0])  # raises ValueError for unknown algorithms
+            return name, (args[0], int(args[1]))
+        if name == "scrypt" and len(args) == 3:
+            n, r, p = map(int, args)
+            return name, (n, r, p)
+        raise ValueError(f"Invalid password hash method: {method!r}")
+
+    @classmethod
+    def _hash_internal(cls, method: str, salt: str, password: str) -> str:
+        name, args = cls._parse(method)
+        secret = password.encode("utf-8")
+        salt_bytes = salt.encode("utf-8")
+        if name == "scrypt":
+            n, r, p = args
+            maxmem = 132 * n * r * p  # ideally 128, but some extra seems needed
+            digest = hashlib.scrypt(
+                secret, salt=salt_bytes, n=n, r=r, p=p, maxmem=maxmem, dklen=64
+            )
+        else:
+            hash_name, iterations = args
+            digest = hashlib.pbkdf2_hmac(hash_name, secret, salt_bytes, iterations)
+        return digest.hex()
+
+    def hash(self, password: str) -> str:
+        salt = "".join(secrets.choice(SALT_CHARS) for _ in range(self.salt_length))
+        value = self._hash_internal(self.method, salt, password)
+        return f"{self.method}${salt}${value}"
+
+    def verify(self, password: str, password_hash: str) -> bool:
+        try:
+            method, salt, value = password_hash.split("$", 2)
+            expected = self._hash_internal(method, salt, password)
+        except ValueError:
+            return self._verify_with_werkzeug(password, password_hash)
+        return hmac.compare_digest(expected, value)
+
+    @staticmethod
+    def _verify_with_werkzeug(password: str, password_hash: str) -> bool:
+        """Not a format we know, but maybe one werkzeug does"""
+        try:
+            return check_password_hash(password_hash, password)
+        except ValueError:
+            return False
+
+    def needs_rehash(self, password_hash: str) -> bool:
+        """True if the hash was not created with the current algorithm, or
+        with a lower cost (hashes with a higher cost are kept)"""
+        try:
+            name, args = self._parse(password_hash.split("$", 1)[0])
+        except ValueError:
+            return True
+
+        current_name, current_args = self._parse(self.method)
+        if name != current_name:
+            return True
+        if name == "pbkdf2":
+            hash_name, iterations = args
+            return hash_name != current_args[0] or iterations < current_args[1]
+        return any(arg < current for arg, current in zip(args, current_args))
+
+    @staticmethod
+    def is_hash(value: str) -> bool:
+        return value.startswith(("pbkdf2:", "scrypt:")) and value.count("$") == 2
+
+    @classmethod
+    def calibrate(
+        cls, target: float = 0.05, algorithm: str = "pbkdf2", hash_name: str = "sha256"
+    ) -> "PasswordHasher":
+        """Returns a hasher whose verifications take about `target` seconds
+        on the current hardware, e.g. PasswordHasher.calibrate(0.05)"""
+        if algorithm == "scrypt":
+            n = 2**10
+            while True:
+                method = f"scrypt:{n}:8:1"
+                if n >= 2**20 or cls._time(method) >= target:
+                    return cls(method)
+                n *= 2
+
+        if algorithm != "pbkdf2":
+            raise ValueError(f"Unknown algorithm: {algorithm!r}")
+
+        iterations = 10_000
+        elapsed = cls._time(f"pbkdf2:{hash_name}:{iterations}")
+        iterations = max(int(iterations * target / max(elapsed, 1e-6)), 1_000)
+        return cls(f"pbkdf2:{hash_name}:{iterations}")
+
+    @classmethod
+    def _time(cls, method: str, rounds: int = 3) -> float:
+        timings = []
+        for _ in range(rounds):
+            start = time.perf_counter()
+            cls._hash_internal(method, "calibration", "password")
+            timings.append(time.perf_counter() - start)
+        return min(timings)
@@ -0,0 +1,187 @@
+"""Messages, compiled once per locale and picked by Accept-Language"""
+
+import re
+from functools import lru_cache
+from string import Formatter
+from types import MappingProxyType
+from typing import Mapping
+
+from flask import current_app, request
+from werkzeug.datastructures import LanguageAccept
+from werkzeug.http import parse_accept_header
+
+_SIMPLE_FIELD = re.compile(r"\d*|[A-Za-z_]\w*")
+
+
+class Message:
+    def __init__(self, text: str, category: str = "primary"):
+        self.text = text
+        self.category = category
+
+    @classmethod
+    def from_current_app(cls, label: str) -> "Message":
+        """Helper to get messages from Flask's current_app"""
+        return current_app.extensions["simplelogin"].messages.get(label)
+
+    def __str__(self) -> str:
+        return self.text
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Message):
+            return NotImplemented
+        return (self.text, self.category) == (other.text, other.category)
+
+    def __hash__(self) -> int:
+        return hash((self.text, self.category))
+
+    def format(self, *args, **kwargs) -> str:
+        return self.text.format(*args, **kwargs)
+
+
+Field = int | str
+
+
+def _parse(text: str) -> tuple[tuple[tuple[str, Field], ...], str] | None:
+    """The literal text before each replacement field and the field's index
+    or name, plus the text after the last field. None if a field uses
+    attributes, indexes, conversions or format specs."""
+    fields: list[tuple[str, Field]] = []
+    pending = ""
+    automatic = 0
+    numbering = set()
+    for literal, name, spec, conversion in Formatter().parse(text):
+        pending += literal
+        if name is None:
+            continue
+        if spec or conversion or not _SIMPLE_FIELD.fullmatch(name):
+            return None
+
+        key: Field
+        if name == "":
+            key, automatic = automatic, automatic + 1
+            numbering.add("automatic")
+        elif name.isdigit():
+            key = int(name)
+            numbering.add("manual")
+        else:
+            key = name
+        fields.append((pending, key))
+        pending = ""
+
+    if len(numbering) > 1:
+        return None  # let str.format raise its usual error
+    return tuple(fields), pending
+
+
+class CompiledMessage:
+    """A message with its replacement fields located once, so formatting it
+    only joins the pieces"""
+
+    __slots__ = ("text", "category", "_fields", "_tail")
+
+    def __init__(self, text: str, category: str = "primary") -> None:
+        self.text = text
+        self.category = category
+        parsed = _parse(text)
+        self._fields = parsed[0] if parsed is not None else None
+        self._tail = parsed[1] if parsed is not None else text
+
+    def __str__(self) -> str:
+        return self.text
+
+    def format(self, *args, **kwargs) -> str:
+        if self._fields is None:
+            return self.text.format(*args, **kwargs)
+        if not self._fields:
+            return self.text
+
+        pieces = []
+        for literal, key in self._fields:
+            pieces.append(literal)
+            value = args[key] if isinstance(key, int) else kwargs[key]
+            pieces.append(format(value))
+        pieces.append(self._tail)
+        return "".join(pieces)
+
+
+@lru_cache(maxsize=1024)
+def compile_message(message: Message | str | None) -> CompiledMessage | None:
+    if message is None:
+        return None
+    if isinstance(message, str):
+        return CompiledMessage(message)
+    return CompiledMessage(message.text, message.category)
+
+
+MessageTable = Mapping[str, CompiledMessage | None]
+
+
+@lru_cache(maxsize=64)
+def _compile_table(items: tuple[tuple[str, Message | str | None], ...]) -> MessageTable:
+    return MappingProxyType({label: compile_message(value) for label, value in items})
+
+
+def compile_table(messages: Mapping[str, Message | str | None]) -> MessageTable:
+    """Compiled messages, the same table for every catalog (e.g. of other
+    apps) with the same ones"""
+    return _compile_table(tuple(sorted(messages.items())))
+
+
+class MessageCatalog:
+    """`messages` compiled once, plus a table per locale in `translations`
+    (e.g. `{"pt-BR": {"logout": "Até logo!"}}`) where labels not translated
+    fall back to `messages`. A regional locale also serves its language if
+    it has no table of its own.
+
+    The table for a request is negotiated from its Accept-Language header
+    once per distinct header, so the number of locales does not change the
+    cost of a lookup."""
+
+    def __init__(
+        self,
+        messages: Mapping[str, Message | str | None],
+        translations: Mapping[str, Mapping[str, Message | str | None]] | None = None,
+        cache_size: int = 256,
+    ) -> None:
+        self.default = compile_table(messages)
+        self.tables: dict[str, MessageTable] = {
+            locale: compile_table(
+                {
+                    **messages,
+                    **{k: v for k, v in translated.items() if k in messages},
+                }
+            )
+            for locale, translated in (translations or {}).items()
+        }
+        # clients asking for "pt" get "pt-BR" if there is no plain "pt"
+        for locale, table in list(self.tables.items()):
+            language = re.split(r"[-_]", locale, maxsplit=1)[0]
+            self.tables.setdefault(language, table)
+        self.locales = tuple(self.tables)
+        self._negotiate = lru_cache(maxsize=cache_size)(self._best_table)
+
+    def _best_table(self, accept_language: str) -> MessageTable:
+        accept = parse_accept_header(accept_language, LanguageAccept)
+        locale = accept.best_match(self.locales)
+        return self.default if locale is None else self.tables[locale]
+
+    def table(self, accept_language: str | None = None) -> MessageTable:
+        """The messages in the best language for `accept_language`"""
+        if not self.tables or not accept_language:
+            return self.default
+        return self._negotiate(accept_language)
+
+    def for_request(self) -> MessageTable:
+        if not self.tables:
+            return self.default
+        return self.table(request.headers.get("Accept-Language"))
+
+    def get(self, label: str) -> CompiledMessage | None:
+        """The message `label` in the language the current client prefers"""
+        return self.for_request().get(label)
+
+    def format(self, label: str, *args, **kwargs) -> str:
+        message = self.get(label)
+        if message is None:
+            return ""
+        return message.format(*args, **kwargs)
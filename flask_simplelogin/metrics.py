@@ -0,0 +1,214 @@
+"""In process metrics (counters and histograms) and their exporters"""
+
+import bisect
+import math
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Iterator
+
+Labels = tuple[tuple[str, str], ...]
+
+DEFAULT_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+
+def _labels(labels: dict[str, str]) -> Labels:
+    return tuple(sorted(labels.items())) if labels else ()
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str) -> None:
+        self.name = name
+        self.documentation = documentation
+        self._values: dict[Labels, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = _labels(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(_labels(labels), 0)
+
+    def samples(self) -> Iterator[tuple[Labels, float]]:
+        with self._lock:
+            yield from list(self._values.items())
+
+
+class HistogramSeries:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self, buckets: int) -> None:
+        self.counts = [0] * (buckets + 1)  # the last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+
+class Histogram:
+    """Distribution of values (e.g. durations in seconds) in `buckets`"""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(sorted(buckets))
+        self._series: dict[Labels, HistogramSeries] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = _labels(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = HistogramSeries(len(self.buckets))
+            series.counts[index] += 1
+            series.sum += value
+            series.count += 1
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started_at, **labels)
+
+    def series(self, **labels: str) -> HistogramSeries | None:
+        return self._series.get(_labels(labels))
+
+    def samples(self) -> Iterator[tuple[Labels, list[int], float, int]]:
+        """Labels, cumulative bucket counts, sum and count of each series"""
+        with self._lock:
+            snapshot = [
+                (key, list(series.counts), series.sum, series.count)
+                for key, series in self._series.items()
+            ]
+        for key, counts, total, count in snapshot:
+            cumulative, running = [], 0
+            for bucket_count in counts:
+                running += bucket_count
+                cumulative.append(running)
+            yield key, cumulative, total, count
+
+
+Metric = Counter | Histogram
+
+
+class MetricsRegistry:
+    """Metrics by name, created on first use"""
+
+    def __init__(self) -> None:
+        self._metrics: dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, name: str, kind: type, *args) -> Metric:
+        metric = self._metrics.get(name)
+        if metric is None:
+            with self._lock:
+                metric = self._metrics.setdefault(name, kind(name, *args))
+        if not isinstance(metric, kind):
+            raise ValueError(f"{name} is already registered as a {metric.kind}")
+        return metric
+
+    def counter(self, name: str, documentation: str = "") -> Counter:
+        return self._get(name, Counter, documentation)  # type: ignore[return-value]
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str = "",
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self._get(name, Histogram, documentation, buckets)  # type: ignore[return-value]
+
+    def __getitem__(self, name: str) -> Metric:
+        return self._metrics[name]
+
+    def __contains__(self, name: object) -> bool:
+        return name in self._metrics
+
+    def __iter__(self) -> Iterator[Metric]:
+        return iter(list(self._metrics.values()))
+
+
+class MetricsExporter(ABC):
+    """Renders a registry in a format some monitoring system can scrape"""
+
+    content_type = "text/plain; charset=utf-8"
+
+    @abstractmethod
+    def render(self, registry: MetricsRegistry) -> str:
+        pass
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", r"\\").replace("\n", r"\n").replace('"', r"\"")
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class PrometheusExporter(MetricsExporter):
+    """Prometheus text exposition format"""
+
+    content_type = "text/plain; version=0.0.4; charset=utf-8"
+
+    def render(self, registry: MetricsRegistry) -> str:
+        lines: list[str] = []
+        for metric in registry:
+            lines.append(f"# HELP {metric.name} {_escape(metric.documentation)}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            if isinstance(metric, Counter):
+                for labels, value in metric.samples():
+                    lines.append(
+                        f"{metric.name}{_format_labels(labels)} {_format_value(value)}"
+                    )
+                continue
+
+            bounds = [*metric.buckets, math.inf]
+            for labels, cumulative, total, count in metric.samples():
+                for bound, bucket_count in zip(bounds, cumulative):
+                    bucket_labels = (*labels, ("le", _format_value(bound)))
+                    lines.append(
+                        f"{metric.name}_bucket{_format_labels(bucket_labels)} "
+                        f"{bucket_count}"
+                    )
+                suffix = _format_labels(labels)
+                lines.append(f"{metric.name}_sum{suffix} {_format_value(total)}")
+                lines.append(f"{metric.name}_count{suffix} {count}")
+        return "\n".join(lines) + "\n"
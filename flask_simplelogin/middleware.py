@@ -0,0 +1,157 @@
+"""WSGI middleware requiring a login for whole subtrees of an app's URLs:
+
+app.wsgi_app = SimpleLoginMiddleware(app, protect=["/admin"])
+"""
+
+import json
+from typing import TYPE_CHECKING, Iterable, NamedTuple
+from urllib.parse import urlencode
+
+from flask import Flask, Request
+from werkzeug.exceptions import HTTPException
+from werkzeug.utils import redirect
+from werkzeug.wrappers import Response
+
+from flask_simplelogin import AUTH_ENVIRON_KEY, AuthContext, SimpleLogin
+
+if TYPE_CHECKING:  # pragma: no cover
+    from _typeshed.wsgi import StartResponse, WSGIApplication, WSGIEnvironment
+
+
+class PathRule(NamedTuple):
+    protected: bool
+    basic: bool = False
+
+
+class _Node:
+    __slots__ = ("children", "rule")
+
+    def __init__(self) -> None:
+        self.children: dict[str, _Node] = {}
+        self.rule: PathRule | None = None
+
+
+def _segments(path: str) -> list[str]:
+    return [segment for segment in path.split("/") if segment]
+
+
+class PrefixTrie:
+    """Rules by path prefix, matched segment by segment (so `/admin` covers
+    `/admin/users` but not `/administrators`), the longest prefix winning"""
+
+    def __init__(self) -> None:
+        self._root = _Node()
+
+    def add(self, prefix: str, rule: PathRule) -> None:
+        node = self._root
+        for segment in _segments(prefix):
+            node = node.children.setdefault(segment, _Node())
+        node.rule = rule
+
+    def match(self, path: str) -> PathRule | None:
+        node = self._root
+        rule = node.rule
+        for segment in _segments(path):
+            child = node.children.get(segment)
+            if child is None:
+                break
+            node = child
+            if node.rule is not None:
+                rule = node.rule
+        return rule
+
+
+class SimpleLoginMiddleware:
+    """Rejects requests to protected path prefixes before they reach the app
+    (its routing, hooks and views), using the app's SimpleLogin for bearer
+    tokens, sessions and, under prefixes protected with `basic=True`, basic
+    auth. Views still use `login_required` for finer rules, and get the user
+    the middleware found from `get_auth_context` without checking again.
+
+    Clients asking for HTML are redirected to the login page, others get a
+    401. The login and logout URLs are never protected."""
+
+    def __init__(
+        self,
+        app: Flask,
+        protect: Iterable[str] = (),
+        allow: Iterable[str] = (),
+        basic: bool = False,
+    ) -> None:
+        self.app = app
+        self.wsgi_app: WSGIApplication = app.wsgi_app
+        self.rules = PrefixTrie()
+        for prefix in protect:
+            self.protect(prefix, basic=basic)
+        for prefix in allow:
+            self.allow(prefix)
+
+        config = self.simplelogin.config
+        self.allow(config["login_url"])
+        self.allow(config["logout_url"])
+
+    @property
+    def simplelogin(self) -> SimpleLogin:
+        return self.app.extensions["simplelogin"]
+
+    def protect(self, prefix: str, basic: bool = False) -> None:
+        """Requires a login under `prefix`, accepting basic auth if `basic`"""
+        self.rules.add(prefix, PathRule(protected=True, basic=basic))
+
+    def allow(self, prefix: str) -> None:
+        """Lets everyone in under `prefix`, e.g. a public page in a protected
+        subtree"""
+        self.rules.add(prefix, PathRule(protected=False))
+
+    def __call__(
+        self, environ: "WSGIEnvironment", start_response: "StartResponse"
+    ) -> Iterable[bytes]:
+        rule = self.rules.match(environ.get("PATH_INFO", ""))
+        if rule is None or not rule.protected:
+            return self.wsgi_app(environ, start_response)
+
+        auth, rejection = self._authenticate(environ, rule)
+        if rejection is not None:
+            return rejection(environ, start_response)
+
+        environ[AUTH_ENVIRON_KEY] = auth
+        return self.wsgi_app(environ, start_response)
+
+    def _authenticate(
+        self, environ: "WSGIEnvironment", rule: PathRule
+    ) -> tuple[AuthContext, Response | None]:
+        """Authenticates in a request context of its own: the login checker
+        may use the app's resources, so the app's teardown functions run when
+        it is closed, before the app handles the request in a new context"""
+        context = self.app.request_context(environ)
+        context.url_adapter = None  # authenticating does not need the URL map
+        with context:
+            simplelogin = self.simplelogin
+            try:
+                auth = simplelogin.authenticate(basic=rule.basic)
+            except HTTPException as error:  # e.g. too many login attempts
+                return AuthContext(), error.get_response(environ)
+
+            if auth.logged_in:
+                return auth, None
+            return auth, self._reject(simplelogin, context.request, rule)
+
+    def _reject(
+        self, simplelogin: SimpleLogin, request: Request, rule: PathRule
+    ) -> Response:
+        if "text/html" in request.headers.get("Accept", ""):
+            query = urlencode({"next": request.full_path.rstrip("?")}, safe="/")
+            login_url = request.script_root + simplelogin.config["login_url"]
+            response = redirect(f"{login_url}?{query}")
+        else:
+            message = simplelogin.catalog.get("login_required")
+            body = {
+                "error": "login_required",
+                "message": message.text if message else None,
+            }
+            response = Response(json.dumps(body), 401, mimetype="application/json")
+            if rule.basic:
+                response.headers["WWW-Authenticate"] = 'Basic realm="Login Required"'
+
+        response.vary.add("Accept")
+        return response
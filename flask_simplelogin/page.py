@@ -0,0 +1,107 @@
+"""Login page for anonymous GETs, filled in from a cached skeleton"""
+
+import hashlib
+import os
+import threading
+import time
+from typing import Callable
+
+from flask import Response, current_app, render_template, request, session
+from flask_wtf import Form  # type: ignore
+from flask_wtf.csrf import generate_csrf  # type: ignore
+from markupsafe import escape
+
+CSRF_MARKER = "__simplelogin_csrf_token__"
+NEXT_MARKER = "__simplelogin_next__"
+BUILTIN_TEMPLATE = os.path.join(os.path.dirname(__file__), "templates", "login.html")
+
+
+class LoginPageCache:
+    """Renders the login page once (per script root) with placeholders that
+    each request fills with its CSRF token and `next` URL, skipping the form
+    and the template. Requests with flashed messages, or while templates are
+    auto reloaded, render the page as usual.
+
+    With `only_builtin_template` the cache is used only if `login.html` is the
+    template shipped with Simple Login, since a custom one may depend on other
+    per request data. With `max_age` the page is sent with `Cache-Control` and
+    an `ETag`, valid while the session keeps the same CSRF token."""
+
+    def __init__(
+        self,
+        form_factory: Callable[[], Form],
+        max_age: int = 0,
+        only_builtin_template: bool = True,
+    ) -> None:
+        self.form_factory = form_factory
+        self.max_age = max_age
+        self.only_builtin_template = only_builtin_template
+        self._skeletons: dict[str, tuple[str, str]] = {}  # and their digest
+        self._usable: bool | None = None
+        self._lock = threading.Lock()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._skeletons.clear()
+            self._usable = None
+
+    def _is_usable(self) -> bool:
+        if current_app.jinja_env.auto_reload or "_flashes" in session:
+            return False
+        if self._usable is None:
+            template = current_app.jinja_env.get_or_select_template("login.html")
+            self._usable = not self.only_builtin_template or (
+                template.filename is not None
+                and os.path.samefile(template.filename, BUILTIN_TEMPLATE)
+            )
+        return self._usable
+
+    def _skeleton(self) -> tuple[str, str]:
+        key = request.script_root
+        cached = self._skeletons.get(key)
+        if cached is None:
+            form = self.form_factory()
+            skeleton = render_template("login.html", form=form, next=NEXT_MARKER)
+            token = getattr(getattr(form, "csrf_token", None), "current_token", None)
+            if token:
+                skeleton = skeleton.replace(token, CSRF_MARKER)
+            digest = hashlib.sha256(skeleton.encode("utf-8")).hexdigest()
+            cached = (skeleton, digest)
+            with self._lock:
+                self._skeletons[key] = cached
+        return cached
+
+    def _etag(self, skeleton: str, digest: str, destiny: str) -> str | None:
+        if not self.max_age:
+            return None
+        field_name = current_app.config.get("WTF_CSRF_FIELD_NAME", "csrf_token")
+        raw_token = session.get(field_name)
+        if CSRF_MARKER in skeleton and raw_token is None:
+            return None
+        # a new ETag every `max_age` seconds, so the CSRF token cached by the
+        # client is not revalidated forever
+        period = int(time.time() // self.max_age)
+        key = f"{digest}:{raw_token}:{destiny}:{period}"
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()[:32]
+
+    def render(self, destiny: str) -> Response | None:
+        """The login page, None if it has to be rendered as usual"""
+        if not self._is_usable():
+            return None
+
+        skeleton, digest = self._skeleton()
+        etag = self._etag(skeleton, digest, destiny)
+        if etag is not None and etag in request.if_none_match:
+            response = current_app.response_class(status=304)
+        else:
+            body = skeleton.replace(NEXT_MARKER, str(escape(destiny)))
+            if CSRF_MARKER in skeleton:
+                body = body.replace(CSRF_MARKER, generate_csrf())
+                etag = self._etag(skeleton, digest, destiny)
+            response = current_app.response_class(body, mimetype="text/html")
+
+        if etag is not None:
+            response.set_etag(etag)
+            response.cache_control.private = True
+            response.cache_control.max_age = self.max_age
+        return response
@@ -0,0 +1,143 @@
+"""Throttling of failed login attempts"""
+
+import math
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Callable, Iterable
+
+from werkzeug.exceptions import TooManyRequests
+
+
+class TooManyLoginAttemptsError(TooManyRequests):
+    """Raised (and rendered as a 429 with `Retry-After`) before running the
+    login checker for clients or usernames with too many failed attempts"""
+
+    description = "Too many failed login attempts, please try again later"
+
+
+@dataclass
+class LimiterState:
+    failures: list[float] = field(default_factory=list)
+    locked_until: float = 0.0
+    strikes: int = 0
+
+
+class CounterStorage(ABC):
+    """Where `LoginRateLimiter` keeps its state. Implement it on top of a
+    shared backend (e.g. Redis or memcached) so all workers share limits."""
+
+    @abstractmethod
+    def get(self, key: str) -> LimiterState | None:
+        pass
+
+    @abstractmethod
+    def set(self, key: str, state: LimiterState, ttl: float) -> None:
+        """Saves the state, which can be forgotten after `ttl` seconds"""
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        pass
+
+
+class MemoryCounterStorage(CounterStorage):
+    """In process storage, evicting the least recently used keys once it
+    holds `maxsize` keys"""
+
+    def __init__(
+        self, maxsize: int = 10_000, clock: Callable[[], float] = time.time
+    ) -> None:
+        self.maxsize = maxsize
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._states: OrderedDict[str, tuple[float, LimiterState]] = OrderedDict()
+
+    def get(self, key: str) -> LimiterState | None:
+        with self._lock:
+            entry = self._states.get(key)
+            if entry is None:
+                return None
+            expires_at, state = entry
+            if expires_at <= self._clock():
+                del self._states[key]
+                return None
+            self._states.move_to_end(key)
+            return state
+
+    def set(self, key: str, state: LimiterState, ttl: float) -> None:
+        with self._lock:
+            self._states[key] = (self._clock() + ttl, state)
+            self._states.move_to_end(key)
+            while len(self._states) > self.maxsize:
+                self._states.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._states.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._states)
+
+
+class LoginRateLimiter:
+    """Allows up to `limit` failed attempts per key within a sliding window
+    of `window` seconds. Once a key hits the limit it is locked out for
+    `lockout` seconds, doubling at each new lockout up to `max_lockout`."""
+
+    def __init__(
+        self,
+        limit: int = 5,
+        window: float = 60,
+        lockout: float = 60,
+        max_lockout: float = 3600,
+        storage: CounterStorage | None = None,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.limit = limit
+        self.window = window
+        self.lockout = lockout
+        self.max_lockout = max_lockout
+        self.storage = (
+            storage if storage is not None else MemoryCounterStorage(clock=clock)
+        )
+        self._clock = clock
+
+    @property
+    def _ttl(self) -> float:
+        return self.window + self.max_lockout
+
+    def retry_after(self, keys: Iterable[str]) -> int | None:
+        """Seconds until all `keys` can try again, None if they can now"""
+        now = self._clock()
+        locked_until = max(
+            (state.locked_until for state in map(self.storage.get, keys) if state),
+            default=0.0,
+        )
+        if locked_until > now:
+            return math.ceil(locked_until - now)
+        return None
+
+    def check(self, keys: Iterable[str]) -> None:
+        """Raises `TooManyLoginAttemptsError` if any of `keys` is locked out"""
+        retry_after = self.retry_after(keys)
+        if retry_after is not None:
+            raise TooManyLoginAttemptsError(retry_after=retry_after)
+
+    def failed(self, keys: Iterable[str]) -> None:
+        now = self._clock()
+        for key in keys:
+            state = self.storage.get(key) or LimiterState()
+            state.failures = [at for at in state.failures if now - at < self.window]
+            state.failures.append(now)
+            if len(state.failures) >= self.limit:
+                duration = min(self.lockout * 2**state.strikes, self.max_lockout)
+                state.locked_until = now + duration
+                state.strikes += 1
+                state.failures = []
+            self.storage.set(key, state, self._ttl)
+
+    def succeeded(self, keys: Iterable[str]) -> None:
+        for key in keys:
+            self.storage.delete(key)
@@ -0,0 +1,77 @@
+"""Validation of the `next` URLs users are redirected to after a login"""
+
+import re
+from functools import lru_cache
+from typing import Iterable
+from urllib.parse import urljoin, urlsplit
+
+# browsers read `\` as `/` and drop tabs and newlines, so URLs with them (or
+# other control characters) do not go where they seem to
+_UNSAFE_URL = re.compile(r"[\\\x00-\x1f\x7f]")
+_UNSAFE_NETLOC = re.compile(r"[\\%\s\x00-\x1f\x7f]")
+
+
+class AllowedHosts:
+    """Hosts (as in a URL's netloc, e.g. `example.com` or `example.com:8080`)
+    allowed as redirect targets. `*.example.com` (or `.example.com`) allows
+    any subdomain of `example.com`, but not `example.com` itself. Hosts with
+    characters browsers would read differently (`\\`, `%`, whitespace or
+    control characters) are never allowed, and only the host after any user
+    info (`user@`) is checked.
+
+    Exact hosts are kept in a set, and wildcards in a set of suffixes, so a
+    lookup costs one set lookup per label of the host however many hosts
+    are allowed."""
+
+    def __init__(self, hosts: Iterable[str]) -> None:
+        exact, suffixes = set(), set()
+        for host in hosts:
+            host = host.strip().lower()
+            if host.startswith("*."):
+                suffixes.add(host[1:])
+            elif host.startswith("."):
+                suffixes.add(host)
+            elif host:
+                exact.add(host)
+        self.exact = frozenset(exact)
+        self.suffixes = frozenset(suffixes)
+
+    def __contains__(self, netloc: object) -> bool:
+        if not isinstance(netloc, str) or not netloc or _UNSAFE_NETLOC.search(netloc):
+            return False
+
+        # browsers go to what follows the user info
+        netloc = netloc.rpartition("@")[2].lower()
+        if netloc in self.exact:
+            return True
+        if not self.suffixes:
+            return False
+
+        hostname, colon, port = netloc.partition(":")
+        dot = hostname.find(".")
+        while dot != -1:
+            if hostname[dot:] + colon + port in self.suffixes:
+                return True
+            dot = hostname.find(".", dot + 1)
+        return False
+
+    def __len__(self) -> int:
+        return len(self.exact) + len(self.suffixes)
+
+
+class RedirectPolicy:
+    """Decides if a `next` URL stays on the requested host or goes to an
+    allowed one. Decisions are cached by host and URL, up to `cache_size`."""
+
+    def __init__(self, allowed_hosts: Iterable[str], cache_size: int = 1024) -> None:
+        self.source = allowed_hosts
+        self.allowed_hosts = AllowedHosts(allowed_hosts)
+        self.is_allowed = lru_cache(maxsize=cache_size)(self._is_allowed)
+
+    def _is_allowed(self, host: str, url: str) -> bool:
+        """True if `url`, relative to a request to `host`, points to `host`
+        or to an allowed host"""
+        if _UNSAFE_URL.search(url) or url != url.strip():
+            return False
+        netloc = urlsplit(urljoin(f"http://{host}/", url)).netloc
+        return netloc == host or netloc in self.allowed_hosts
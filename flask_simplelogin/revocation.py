@@ -0,0 +1,84 @@
+"""Revoked token and session IDs, kept only until they would expire anyway"""
+
+import heapq
+import math
+import threading
+import time
+from typing import Callable, Iterable
+
+
+class RevocationList:
+    """Set of revoked IDs, each with the time it expires (after which it
+    does not need to be revoked anymore). Lookups are a dictionary lookup,
+    and IDs are grouped in buckets of `bucket_seconds` by expiration time so
+    expired IDs are dropped a whole bucket at a time, keeping memory bounded
+    by the number of IDs revoked within their lifetime."""
+
+    def __init__(
+        self, bucket_seconds: float = 60, clock: Callable[[], float] = time.time
+    ) -> None:
+        self.bucket_seconds = bucket_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._expires_at: dict[str, float] = {}
+        self._buckets: dict[int, set[str]] = {}
+        self._bucket_heap: list[int] = []
+
+    def _bucket(self, timestamp: float) -> int:
+        return math.ceil(timestamp / self.bucket_seconds)
+
+    def _purge(self, now: float) -> None:
+        """Drops buckets whose IDs have all expired"""
+        current = self._bucket(now)
+        while self._bucket_heap and self._bucket_heap[0] < current:
+            bucket = heapq.heappop(self._bucket_heap)
+            for revoked_id in self._buckets.pop(bucket, ()):
+                del self._expires_at[revoked_id]
+
+    def revoke(self, revoked_id: str, expires_at: float) -> None:
+        now = self._clock()
+        if expires_at <= now:
+            return
+
+        with self._lock:
+            self._purge(now)
+            previous = self._expires_at.get(revoked_id)
+            if previous is not None and previous >= expires_at:
+                return
+            if previous is not None:
+                self._buckets[self._bucket(previous)].discard(revoked_id)
+
+            self._expires_at[revoked_id] = expires_at
+            bucket = self._bucket(expires_at)
+            if bucket not in self._buckets:
+                self._buckets[bucket] = set()
+                heapq.heappush(self._bucket_heap, bucket)
+            self._buckets[bucket].add(revoked_id)
+
+    def is_revoked(self, revoked_id: str) -> bool:
+        expires_at = self._expires_at.get(revoked_id)
+        if expires_at is None:
+            return False
+
+        now = self._clock()
+        if expires_at > now:
+            return True
+
+        with self._lock:
+            self._purge(now)
+        return False
+
+    def snapshot(self) -> list[tuple[str, float]]:
+        """IDs still revoked and their expiration, e.g. to save as JSON"""
+        now = self._clock()
+        with self._lock:
+            self._purge(now)
+            return [(key, at) for key, at in self._expires_at.items() if at > now]
+
+    def load(self, entries: Iterable[tuple[str, float]]) -> None:
+        """Adds IDs from a `snapshot` (e.g. taken by another worker)"""
+        for revoked_id, expires_at in entries:
+            self.revoke(revoked_id, expires_at)
+
+    def __len__(self) -> int:
+        return len(self._expires_at)
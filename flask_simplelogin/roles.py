@@ -0,0 +1,118 @@
+"""Roles and permissions checked as bitmasks"""
+
+import copy
+import threading
+from collections import OrderedDict
+from typing import Callable, Iterable, Mapping
+
+RolesLoader = Callable[[str], Iterable[str] | None]
+
+
+class BitIndex:
+    """Gives each name its own bit the first time it is seen, so a set of
+    names becomes an integer mask. Bits are global to the process, so masks
+    can be compiled before any app (or `RoleRegistry`) exists."""
+
+    def __init__(self) -> None:
+        self._bits: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def bit(self, name: str) -> int:
+        bit = self._bits.get(name)
+        if bit is None:
+            with self._lock:
+                bit = self._bits.setdefault(name, 1 << len(self._bits))
+        return bit
+
+    def mask(self, names: str | Iterable[str] | None) -> int:
+        if not names:
+            return 0
+        if isinstance(names, str):
+            names = (names,)
+        mask = 0
+        for name in names:
+            mask |= self.bit(name)
+        return mask
+
+
+ROLE_BITS = BitIndex()
+PERMISSION_BITS = BitIndex()
+
+
+class RoleRegistry:
+    """Maps roles to the permissions they grant, and users to their roles.
+
+    `roles` maps each role name to its permissions, and `loader` returns the
+    role names of a username (e.g. reading them from a database). The roles
+    of a user are loaded once and kept as bitmasks for up to `maxsize`
+    users; call `invalidate` when the roles of a user change:
+    RoleRegistry({"editor": ["read", "write"]}, loader=roles_from_db)
+    """
+
+    def __init__(
+        self,
+        roles: Mapping[str, Iterable[str]] | None = None,
+        loader: RolesLoader | None = None,
+        maxsize: int = 10_000,
+    ) -> None:
+        self.loader = loader
+        self.maxsize = maxsize
+        self._permissions: dict[str, int] = {}
+        self._masks: OrderedDict[str, tuple[int, int]] = OrderedDict()
+        self._lock = threading.Lock()
+        for role, permissions in (roles or {}).items():
+            self.define_role(role, permissions)
+
+    def define_role(self, role: str, permissions: Iterable[str]) -> None:
+        """Creates or replaces a role and the permissions it grants"""
+        self._permissions[role] = PERMISSION_BITS.mask(permissions)
+        ROLE_BITS.bit(role)
+        self.invalidate()
+
+    def copy(self) -> "RoleRegistry":
+        """A registry with the same roles and loader, and a cache of its own"""
+        registry = copy.copy(self)
+        registry._permissions = dict(self._permissions)
+        registry._masks = OrderedDict()
+        registry._lock = threading.Lock()
+        return registry
+
+    def _load(self, username: str) -> tuple[int, int]:
+        roles = tuple(self.loader(username) or ()) if self.loader else ()
+        permissions = 0
+        for role in roles:
+            permissions |= self._permissions.get(role, 0)
+        return ROLE_BITS.mask(roles), permissions
+
+    def masks(self, username: str) -> tuple[int, int]:
+        """Returns the roles and the permissions of `username` as bitmasks"""
+        masks = self._masks.get(username)
+        if masks is not None:
+            return masks
+
+        masks = self._load(username)
+        with self._lock:
+            self._masks[username] = masks
+            while len(self._masks) > self.maxsize:
+                self._masks.popitem(last=False)
+        return masks
+
+    def has_roles(self, username: str, roles: str | Iterable[str]) -> bool:
+        """True if `username` has at least one of `roles`"""
+        return bool(self.masks(username)[0] & ROLE_BITS.mask(roles))
+
+    def has_permissions(self, username: str, permissions: str | Iterable[str]) -> bool:
+        """True if `username` has all of `permissions`"""
+        required = PERMISSION_BITS.mask(permissions)
+        return self.masks(username)[1] & required == required
+
+    def invalidate(self, username: str | None = None) -> None:
+        """Forgets the roles of `username`, or of all users if it is None"""
+        with self._lock:
+            if username is None:
+                self._masks.clear()
+            else:
+                self._masks.pop(username, None)
+
+    def __len__(self) -> int:
+        return len(self._masks)
@@ -0,0 +1,245 @@
+"""Server side sessions: the cookie carries only an opaque session ID"""
+
+import heapq
+import json
+import secrets
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Callable
+
+from flask import Flask, Request, Response
+from flask.sessions import SessionInterface, SessionMixin
+from werkzeug.datastructures import CallbackDict
+
+
+class SessionBackend(ABC):
+    """Where `ServerSideSessionInterface` keeps session data"""
+
+    @abstractmethod
+    def get(self, sid: str) -> dict[str, Any] | None:
+        """Returns the data of a session, None if missing or expired"""
+
+    @abstractmethod
+    def set(self, sid: str, data: dict[str, Any], ttl: float) -> None:
+        pass
+
+    @abstractmethod
+    def delete(self, sid: str) -> None:
+        pass
+
+
+class MemorySessionBackend(SessionBackend):
+    """Sessions kept in a dictionary, expired sessions are evicted as new
+    ones are saved. When it is full the sessions closer to expire are
+    evicted too, 1% of `maxsize` at a time."""
+
+    def __init__(
+        self, maxsize: int = 100_000, clock: Callable[[], float] = time.time
+    ) -> None:
+        self.maxsize = maxsize
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._sessions: dict[str, tuple[float, dict[str, Any]]] = {}
+        # heap of (expires_at, sid), with stale entries for sessions deleted
+        # or saved again, skipped when popped
+        self._expirations: list[tuple[float, str]] = []
+        self._batch = max(1, maxsize // 100)
+
+    def get(self, sid: str) -> dict[str, Any] | None:
+        entry = self._sessions.get(sid)
+        if entry is None:
+            return None
+        expires_at, data = entry
+        if expires_at <= self._clock():
+            self.delete(sid)
+            return None
+        return dict(data)
+
+    def _evict(self) -> None:
+        """Drops the expired sessions, and then the ones closer to expire
+        until there is room for a batch of new sessions"""
+        now = self._clock()
+        room = self.maxsize - self._batch
+        while self._expirations:
+            expires_at, sid = self._expirations[0]
+            entry = self._sessions.get(sid)
+            if entry is not None and entry[0] == expires_at:
+                if expires_at > now and len(self._sessions) <= room:
+                    break
+                del self._sessions[sid]
+            heapq.heappop(self._expirations)
+
+    def _compact(self) -> None:
+        self._expirations = [(at, sid) for sid, (at, _) in self._sessions.items()]
+        heapq.heapify(self._expirations)
+
+    def set(self, sid: str, data: dict[str, Any], ttl: float) -> None:
+        expires_at = self._clock() + ttl
+        with self._lock:
+            if sid not in self._sessions and len(self._sessions) >= self.maxsize:
+                self._evict()
+            self._sessions[sid] = (expires_at, dict(data))
+            heapq.heappush(self._expirations, (expires_at, sid))
+            if len(self._expirations) > 2 * len(self._sessions) + self._batch:
+                self._compact()
+
+    def delete(self, sid: str) -> None:
+        with self._lock:
+            self._sessions.pop(sid, None)
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+
+class SQLiteSessionBackend(SessionBackend):
+    """Sessions kept in a SQLite database. Expired sessions are deleted every
+    `cleanup_every` writes."""
+
+    def __init__(
+        self,
+        path: str,
+        cleanup_every: int = 1000,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.path = path
+        self.cleanup_every = cleanup_every
+        self._clock = clock
+        self._writes = 0
+        self._local = threading.local()
+        self._memory: sqlite3.Connection | None = None
+        if path == ":memory:":  # every connection would be a new database
+            self._memory = sqlite3.connect(path, check_same_thread=False)
+        with self._connection() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS simplelogin_sessions ("
+                "id TEXT PRIMARY KEY, data TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS simplelogin_sessions_expires_at "
+                "ON simplelogin_sessions (expires_at)"
+            )
+
+    def _connection(self) -> sqlite3.Connection:
+        """One connection per thread"""
+        if self._memory is not None:
+            return self._memory
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path)
+            self._local.connection = connection
+        return connection
+
+    def get(self, sid: str) -> dict[str, Any] | None:
+        row = (
+            self._connection()
+            .execute(
+                "SELECT data FROM simplelogin_sessions WHERE id = ? AND expires_at > ?",
+                (sid, self._clock()),
+            )
+            .fetchone()
+        )
+        return json.loads(row[0]) if row else None
+
+    def set(self, sid: str, data: dict[str, Any], ttl: float) -> None:
+        now = self._clock()
+        with self._connection() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO simplelogin_sessions (id, data, expires_at) "
+                "VALUES (?, ?, ?)",
+                (sid, json.dumps(data), now + ttl),
+            )
+            self._writes += 1
+            if self._writes % self.cleanup_every == 0:
+                connection.execute(
+                    "DELETE FROM simplelogin_sessions WHERE expires_at <= ?", (now,)
+                )
+
+    def delete(self, sid: str) -> None:
+        with self._connection() as connection:
+            connection.execute("DELETE FROM simplelogin_sessions WHERE id = ?", (sid,))
+
+
+class ServerSideSession(CallbackDict, SessionMixin):
+    def __init__(self, initial: dict[str, Any] | None = None, sid: str | None = None):
+        def on_update(self) -> None:
+            self.modified = True
+
+        super().__init__(initial, on_update)
+        self.new = sid is None
+        self.sid = sid or secrets.token_urlsafe(32)
+        self.previous_sid: str | None = None
+        self.modified = False
+
+    def regenerate(self) -> None:
+        """Moves the data to a new session ID (e.g. on login, to prevent
+        session fixation)"""
+        if not self.new:
+            self.previous_sid = self.sid
+        self.sid = secrets.token_urlsafe(32)
+        self.new = True
+        self.modified = True
+
+
+class ServerSideSessionInterface(SessionInterface):
+    """Session interface keeping the session data in a `SessionBackend`.
+
+    The backend is written, and the cookie is sent, only when the session
+    changes (or when a permanent session needs its expiration refreshed).
+    Session IDs are prefixed with `namespace` in the backend, so apps sharing
+    a backend never read each other's sessions."""
+
+    session_class = ServerSideSession
+
+    def __init__(self, backend: SessionBackend, namespace: str = "") -> None:
+        self.backend = backend
+        self.namespace = namespace
+
+    def open_session(self, app: Flask, request: Request) -> ServerSideSession:
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid:
+            data = self.backend.get(self.namespace + sid)
+            if data is not None:
+                return self.session_class(data, sid=sid)
+        return self.session_class()
+
+    def save_session(
+        self,
+        app: Flask,
+        session: SessionMixin,
+        response: Response,
+    ) -> None:
+        assert isinstance(session, ServerSideSession)
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        if session.previous_sid is not None:
+            self.backend.delete(self.namespace + session.previous_sid)
+            session.previous_sid = None
+
+        if not session:
+            if session.modified and not session.new:
+                self.backend.delete(self.namespace + session.sid)
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        # true when the session changed, or if it is a permanent session and
+        # SESSION_REFRESH_EACH_REQUEST is on (then its expiration is renewed)
+        if not self.should_set_cookie(app, session):
+            return
+
+        ttl = app.permanent_session_lifetime.total_seconds()
+        self.backend.set(self.namespace + session.sid, dict(session), ttl)
+
+        response.set_cookie(
+            name,
+            session.sid,
+            expires=self.get_expiration_time(app, session),
+            httponly=self.get_cookie_httponly(app),
+            domain=domain,
+            path=path,
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app),
+        )
+        response.vary.add("Cookie")
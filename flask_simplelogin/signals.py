@@ -0,0 +1,27 @@
+"""Signals sent by Simple Login, the sender is the app:
+
+from flask_simplelogin.signals import login_failed
+
+@login_failed.connect_via(app)
+def alert(app, username, **extra): ...
+"""
+
+from typing import Any
+
+from blinker import NamedSignal, Namespace
+from flask import current_app
+
+_signals = Namespace()
+
+login_succeeded = _signals.signal("login-succeeded")
+login_failed = _signals.signal("login-failed")
+basic_auth_checked = _signals.signal("basic-auth-checked")
+access_denied = _signals.signal("access-denied")
+logged_out = _signals.signal("logged-out")
+
+
+def send(signal: NamedSignal, **kwargs: Any) -> None:
+    """Sends `signal` only if something is connected to it"""
+    if signal.receivers:
+        app = current_app._get_current_object()  # type: ignore[attr-defined]
+        signal.send(app, _async_wrapper=app.ensure_sync, **kwargs)
@@ -0,0 +1,362 @@
+"""User stores, indexed by username, to be used as login checkers"""
+
+import json
+import logging
+import os
+import queue
+import secrets
+import sqlite3
+import tempfile
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Any, Callable, Iterable, Iterator, Mapping
+
+from flask_simplelogin.hashing import PasswordHasher
+
+logger = logging.getLogger(__name__)
+
+UserRecord = dict[str, Any]
+
+
+class UserStore(ABC):
+    """Base class for user stores. Records are dictionaries with at least
+    `username` and `password` (a password hash) keys.
+
+    A store is also a login checker, so it can be used directly:
+    SimpleLogin(app, login_checker=MemoryUserStore())
+
+    Passwords are hashed with `hasher`. If `rehash` is True (it is when
+    SIMPLELOGIN_PASSWORD_HASH_METHOD is set), hashes created with another
+    algorithm or a lower cost are upgraded on the next successful login.
+    """
+
+    def __init__(self) -> None:
+        self.on_change_callbacks: list[Callable[[str], None]] = []
+        self.hasher = PasswordHasher()
+        self.rehash = False
+        self._dummy_hash: str | None = None
+
+    @abstractmethod
+    def get(self, username: str) -> UserRecord | None:
+        """Returns the record for `username`, or None if there is no user"""
+
+    @abstractmethod
+    def put(self, record: UserRecord) -> None:
+        """Inserts or replaces a record"""
+
+    @abstractmethod
+    def delete(self, username: str) -> bool:
+        """Deletes a user, returns False if the user did not exist"""
+
+    def register_on_change_callback(self, callback: Callable[[str], None]) -> None:
+        """Register a callback called with the username whenever a user's
+        credentials change or the user is deleted"""
+        self.on_change_callbacks.append(callback)
+
+    def _changed(self, username: str) -> None:
+        for callback in self.on_change_callbacks:
+            callback(username)
+
+    def create_user(self, username: str, password: str, **data) -> UserRecord:
+        """Creates (or replaces) a user hashing its password"""
+        if not username or not password:
+            raise ValueError("username and password are required.")
+
+        record = {**data, "username": username}
+        record["password"] = self.hasher.hash(password)
+        self.put(record)
+        self._changed(username)
+        return record
+
+    def set_password(self, username: str, password: str) -> None:
+        record = self.get(username)
+        if record is None:
+            raise KeyError(username)
+
+        record["password"] = self.hasher.hash(password)
+        self.put(record)
+        self._changed(username)
+
+    def get_roles(self, username: str) -> list[str]:
+        """Role names of a user, kept in the `roles` key of its record"""
+        record = self.get(username)
+        return list(record.get("roles") or ()) if record else []
+
+    def set_roles(self, username: str, roles: Iterable[str]) -> None:
+        record = self.get(username)
+        if record is None:
+            raise KeyError(username)
+
+        record["roles"] = list(roles)
+        self.put(record)
+        self._changed(username)
+
+    def delete_user(self, username: str) -> bool:
+        deleted = self.delete(username)
+        if deleted:
+            self._changed(username)
+        return deleted
+
+    def check(self, user: Mapping[str, Any]) -> bool:
+        """Login checker: verifies the password of `user` against its hash"""
+        username = user.get("username")
+        password = user.get("password")
+        if not username or not password:
+            return False
+
+        record = self.get(username)
+        if record is None or not record.get("password"):
+            # verify anyway, so unknown usernames take as long as wrong
+            # passwords and cannot be told apart by timing
+            self.hasher.verify(password, self._unknown_user_hash())
+            return False
+
+        if not self.hasher.verify(password, record["password"]):
+            return False
+
+        if self.rehash and self.hasher.needs_rehash(record["password"]):
+            record["password"] = self.hasher.hash(password)
+            self.put(record)
+
+        return True
+
+    def __call__(self, user: Mapping[str, Any]) -> bool:
+        return self.check(user)
+
+    def _unknown_user_hash(self) -> str:
+        """Hash of a random password, with the current method and cost"""
+        method = self.hasher.method
+        if self._dummy_hash is None or not self._dummy_hash.startswith(f"{method}$"):
+            self._dummy_hash = self.hasher.hash(secrets.token_hex(16))
+        return self._dummy_hash
+
+
+class MemoryUserStore(UserStore):
+    """User store kept in a dictionary indexed by username"""
+
+    def __init__(self, records: dict[str, UserRecord] | None = None) -> None:
+        super().__init__()
+        self._lock = threading.Lock()
+        self._records: dict[str, UserRecord] = {}
+        for username, record in (records or {}).items():
+            self._records[username] = {**record, "username": username}
+
+    def get(self, username: str) -> UserRecord | None:
+        record = self._records.get(username)
+        return dict(record) if record is not None else None
+
+    def put(self, record: UserRecord) -> None:
+        with self._lock:
+            self._records[record["username"]] = dict(record)
+
+    def delete(self, username: str) -> bool:
+        with self._lock:
+            return self._records.pop(username, None) is not None
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+
+class SQLiteUserStore(UserStore):
+    """User store backed by a SQLite database (using the standard library's
+    `sqlite3`) with a pool of up to `pool_size` connections. Users are looked
+    up by their primary key, so logins never load the whole table."""
+
+    SELECT = "SELECT password, data FROM simplelogin_users WHERE username = ?"
+    UPSERT = (
+        "INSERT INTO simplelogin_users (username, password, data) VALUES (?, ?, ?) "
+        "ON CONFLICT(username) DO UPDATE SET "
+        "password = excluded.password, data = excluded.data"
+    )
+    DELETE = "DELETE FROM simplelogin_users WHERE username = ?"
+
+    def __init__(self, path: str, pool_size: int = 4, timeout: float = 5.0) -> None:
+        super().__init__()
+        self.path = path
+        # every connection to :memory: would be a different database
+        self.pool_size = 1 if path == ":memory:" else pool_size
+        self.timeout = timeout
+        self._pool: queue.LifoQueue[sqlite3.Connection] = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+        with self._connection() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS simplelogin_users ("
+                "username TEXT PRIMARY KEY, "
+                "password TEXT NOT NULL, "
+                "data TEXT NOT NULL DEFAULT '{}')"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=self.timeout, check_same_thread=False)
+
+    @contextmanager
+    def _connection(self) -> Iterator[sqlite3.Connection]:
+        try:
+            connection = self._pool.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                can_create = self._created < self.pool_size
+                if can_create:
+                    self._created += 1
+            if can_create:
+                connection = self._connect()
+            else:
+                connection = self._pool.get(timeout=self.timeout)
+
+        try:
+            with connection:  # commits or rolls back the transaction
+                yield connection
+        finally:
+            self._pool.put(connection)
+
+    def get(self, username: str) -> UserRecord | None:
+        with self._connection() as connection:
+            row = connection.execute(self.SELECT, (username,)).fetchone()
+
+        if row is None:
+            return None
+
+        password, data = row
+        return {**json.loads(data), "username": username, "password": password}
+
+    def put(self, record: UserRecord) -> None:
+        data = {k: v for k, v in record.items() if k not in ("username", "password")}
+        with self._connection() as connection:
+            connection.execute(
+                self.UPSERT,
+                (record["username"], record["password"], json.dumps(data)),
+            )
+
+    def delete(self, username: str) -> bool:
+        with self._connection() as connection:
+            return connection.execute(self.DELETE, (username,)).rowcount > 0
+
+    def close(self) -> None:
+        """Closes the idle connections of the pool"""
+        while True:
+            try:
+                connection = self._pool.get_nowait()
+            except queue.Empty:
+                break
+            connection.close()
+            with self._lock:
+                self._created -= 1
+
+
+class FileUserStore(UserStore):
+    """User store loaded once from a JSON file mapping usernames to records,
+    e.g. {"chuck": {"password": "<hash>"}}.
+
+    The file is checked for changes (mtime and size) at most every
+    `check_interval` seconds, and if it changed it is parsed again in a
+    background thread: requests keep using the users loaded before until the
+    new ones replace them at once."""
+
+    def __init__(
+        self,
+        path: str,
+        check_interval: float = 1.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        super().__init__()
+        self.path = path
+        self.check_interval = check_interval
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._reloading = False
+        self._checked_at = clock()
+        self._signature, self._records = self._load()
+
+    def _stat(self) -> tuple[int, int] | None:
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _load(self) -> tuple[tuple[int, int] | None, dict[str, UserRecord]]:
+        signature = self._stat()
+        if signature is None:
+            return None, {}
+
+        with open(self.path) as handler:
+            data = json.load(handler)
+
+        records = {
+            username: {**record, "username": username}
+            for username, record in data.items()
+            if isinstance(record, dict)
+        }
+        return signature, records
+
+    def _reload(self) -> None:
+        try:
+            signature, records = self._load()
+        except (OSError, ValueError):
+            logger.exception("Could not reload users from %s", self.path)
+        else:
+            with self._lock:
+                self._signature, self._records = signature, records
+        finally:
+            self._reloading = False
+
+    def _maybe_reload(self) -> None:
+        now = self._clock()
+        if now - self._checked_at < self.check_interval:
+            return
+
+        self._checked_at = now
+        if self._reloading or self._stat() == self._signature:
+            return
+
+        with self._lock:
+            if self._reloading:
+                return
+            self._reloading = True
+
+        threading.Thread(
+            target=self._reload, name="simplelogin-user-reload", daemon=True
+        ).start()
+
+    def get(self, username: str) -> UserRecord | None:
+        self._maybe_reload()
+        record = self._records.get(username)
+        return dict(record) if record is not None else None
+
+    def _write(self, records: dict[str, UserRecord]) -> None:
+        """Writes the file atomically and stores its new signature"""
+        data = {
+            username: {k: v for k, v in record.items() if k != "username"}
+            for username, record in records.items()
+        }
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as handler:
+                json.dump(data, handler)
+            os.replace(tmp, self.path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        self._signature = self._stat()
+
+    def put(self, record: UserRecord) -> None:
+        with self._lock:
+            records = {**self._records, record["username"]: dict(record)}
+            self._write(records)
+            self._records = records
+
+    def delete(self, username: str) -> bool:
+        with self._lock:
+            if username not in self._records:
+                return False
+            records = {k: v for k, v in self._records.items() if k != username}
+            self._write(records)
+            self._records = records
+            return True
+
+    def __len__(self) -> int:
+        return len(self._records)
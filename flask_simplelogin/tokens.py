@@ -0,0 +1,57 @@
+"""Short lived signed bearer tokens"""
+
+import secrets
+from typing import NamedTuple, Sequence
+
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+
+
+class TokenClaims(NamedTuple):
+    username: str
+    token_id: str
+    expires_at: float
+
+
+class TokenSigner:
+    """Issues and verifies tokens signed with HMAC. All `keys` are accepted
+    when verifying and the last one is used to sign, so keys can be rotated
+    by appending a new one and later removing the oldest."""
+
+    def __init__(
+        self,
+        keys: Sequence[str] | Sequence[bytes],
+        max_age: int,
+        salt: str = "simplelogin-token",
+    ) -> None:
+        if not keys:
+            raise ValueError("At least one key is required to sign tokens")
+        self.keys = keys
+        self.max_age = max_age
+        self._serializer = URLSafeTimedSerializer(keys, salt=salt)
+
+    def issue(self, username: str) -> str:
+        payload = {"sub": username, "jti": secrets.token_urlsafe(12)}
+        return str(self._serializer.dumps(payload))
+
+    def claims(self, token: str) -> TokenClaims | None:
+        """Returns the claims of the token, None if it is invalid or expired"""
+        try:
+            payload, signed_at = self._serializer.loads(
+                token, max_age=self.max_age, return_timestamp=True
+            )
+        except BadSignature:  # SignatureExpired is a BadSignature as well
+            return None
+
+        if not isinstance(payload, dict) or not isinstance(payload.get("sub"), str):
+            return None
+
+        return TokenClaims(
+            username=payload["sub"],
+            token_id=str(payload.get("jti", "")),
+            expires_at=signed_at.timestamp() + self.max_age,
+        )
+
+    def verify(self, token: str) -> str | None:
+        """Returns the username in the token, None if it is invalid or expired"""
+        claims = self.claims(token)
+        return claims.username if claims else None
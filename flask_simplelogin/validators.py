@@ -0,0 +1,264 @@
+"""Validators for `login_required(must=...)`: batches, concurrency and timings"""
+
+import asyncio
+import inspect
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, wait
+from functools import wraps
+from typing import Any, Awaitable, Callable, Iterable, NamedTuple, Sequence
+
+from flask_simplelogin.executor import CheckerExecutor, LatencyStats
+
+Validator = Callable[[str | None], str | None]
+BatchFunction = Callable[
+    [str | None, tuple[Any, ...]],
+    Sequence[str | None] | Awaitable[Sequence[str | None]],
+]
+
+
+class BatchCheck(NamedTuple):
+    """One of the checks answered by a `BatchValidator`"""
+
+    batch: "BatchValidator"
+    args: tuple[Any, ...]
+
+
+Validators = Validator | BatchCheck | Iterable[Validator | BatchCheck]
+
+
+class BatchValidator:
+    """Validator answering many checks of a user at once, e.g. with a single
+    query. The function receives the username and a tuple with the arguments
+    of each check, and returns an error (or None) for each of them:
+
+    @batch_validator
+    def can(username, checks):
+        granted = permissions_from_db(username, [action for action, in checks])
+        return [None if action in granted else f"Cannot {action}"
+                for action, in checks]
+
+    @login_required(must=[can.check("edit"), can.check("publish")])
+    """
+
+    def __init__(self, function: BatchFunction) -> None:
+        self.function = function
+
+    def check(self, *args: Any) -> BatchCheck:
+        return BatchCheck(self, args)
+
+
+def batch_validator(function: BatchFunction) -> BatchValidator:
+    return BatchValidator(function)
+
+
+def first_error(errors: Iterable[str | None]) -> str | None:
+    return next((error for error in errors if error is not None), None)
+
+
+def _batch_step(batch: BatchValidator, checks: tuple[tuple[Any, ...], ...]) -> Callable:
+    """A single validator running all `checks` of `batch` together"""
+    function: Any = batch.function
+    if inspect.iscoroutinefunction(function):
+
+        @wraps(function)
+        async def step_async(username: str | None) -> str | None:
+            return first_error(await function(username, checks))
+
+        return step_async
+
+    @wraps(function)
+    def step(username: str | None) -> str | None:
+        return first_error(function(username, checks))
+
+    return step
+
+
+def compile_validators(validators: Validators | None) -> tuple[Validator, ...]:
+    """Normalizes `must` into a tuple, merging the checks of each batch
+    validator into a single validator (placed where its first check was)"""
+    if validators is None:
+        return ()
+    if callable(validators):
+        return (validators,)
+    if isinstance(validators, BatchCheck):
+        validators = (validators,)
+
+    order: list[Validator | BatchValidator] = []
+    batches: dict[BatchValidator, list[tuple[Any, ...]]] = {}
+    for validator in validators:
+        if isinstance(validator, BatchCheck):
+            if validator.batch not in batches:
+                batches[validator.batch] = []
+                order.append(validator.batch)
+            batches[validator.batch].append(validator.args)
+        else:
+            order.append(validator)
+
+    return tuple(
+        _batch_step(item, tuple(batches[item]))
+        if isinstance(item, BatchValidator)
+        else item
+        for item in order
+    )
+
+
+def validator_name(validator: Callable) -> str:
+    name = getattr(validator, "__qualname__", None)
+    module = getattr(validator, "__module__", None)
+    if name is None:
+        return repr(validator)
+    return f"{module}.{name}" if module else name
+
+
+class ValidatorTimings:
+    """How long each validator takes, by validator name"""
+
+    def __init__(self) -> None:
+        self._stats: dict[str, LatencyStats] = {}
+        self._lock = threading.Lock()
+        self.observer: Callable[[str, float], None] | None = None
+
+    def record(self, name: str, seconds: float) -> None:
+        stats = self._stats.get(name)
+        if stats is None:
+            with self._lock:
+                stats = self._stats.setdefault(name, LatencyStats())
+        stats.record(seconds)
+        if self.observer is not None:
+            self.observer(name, seconds)
+
+    def __getitem__(self, name: str) -> LatencyStats:
+        return self._stats[name]
+
+    def __contains__(self, name: object) -> bool:
+        return name in self._stats
+
+    def slowest(self, count: int = 10) -> list[tuple[str, LatencyStats]]:
+        """Validators with the highest mean duration"""
+        items = sorted(self._stats.items(), key=lambda item: -item[1].mean)
+        return items[:count]
+
+
+def run_validators(
+    validators: Sequence[Callable],
+    username: str | None,
+    timings: ValidatorTimings,
+    ensure_sync: Callable[[Callable], Callable],
+) -> str | None:
+    """Calls the validators one after the other, until the first error"""
+    for validator in validators:
+        name = validator_name(validator)
+        if inspect.iscoroutinefunction(validator):
+            validator = ensure_sync(validator)
+        started_at = time.perf_counter()
+        try:
+            error = validator(username)
+        finally:
+            timings.record(name, time.perf_counter() - started_at)
+        if error is not None:
+            return error
+    return None
+
+
+def run_validators_concurrently(
+    validators: Sequence[Callable],
+    username: str | None,
+    timings: ValidatorTimings,
+    ensure_sync: Callable[[Callable], Callable],
+    executor: CheckerExecutor,
+) -> str | None:
+    """Calls the validators in `executor` threads, returning the first error
+    as soon as it is known. Validators not started yet are cancelled."""
+    pending = {
+        executor.submit(_timed(validator, timings, ensure_sync), username)
+        for validator in validators
+    }
+    try:
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                error = future.result()
+                if error is not None:
+                    return error
+        return None
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+async def run_validators_async(
+    validators: Sequence[Callable],
+    username: str | None,
+    timings: ValidatorTimings,
+) -> str | None:
+    """Same as `run_validators`, awaiting coroutine validators"""
+    for validator in validators:
+        error = await _timed_async(validator, timings, threaded=False)(username)
+        if error is not None:
+            return error
+    return None
+
+
+async def run_validators_concurrently_async(
+    validators: Sequence[Callable],
+    username: str | None,
+    timings: ValidatorTimings,
+) -> str | None:
+    """Runs coroutine validators as tasks and the others in threads,
+    returning the first error as soon as it is known"""
+    tasks = {
+        asyncio.ensure_future(_timed_async(validator, timings, threaded=True)(username))
+        for validator in validators
+    }
+    try:
+        while tasks:
+            done, tasks = await asyncio.wait(tasks, return_when=FIRST_COMPLETED)
+            for task in done:
+                error = task.result()
+                if error is not None:
+                    return error
+        return None
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+def _timed(
+    validator: Callable,
+    timings: ValidatorTimings,
+    ensure_sync: Callable[[Callable], Callable],
+) -> Validator:
+    name = validator_name(validator)
+    if inspect.iscoroutinefunction(validator):
+        validator = ensure_sync(validator)
+
+    def timed(username: str | None) -> str | None:
+        started_at = time.perf_counter()
+        try:
+            return validator(username)
+        finally:
+            timings.record(name, time.perf_counter() - started_at)
+
+    return timed
+
+
+def _timed_async(
+    validator: Callable, timings: ValidatorTimings, threaded: bool
+) -> Callable[[str | None], Awaitable[str | None]]:
+    name = validator_name(validator)
+
+    async def timed(username: str | None) -> str | None:
+        started_at = time.perf_counter()
+        try:
+            if threaded and not inspect.iscoroutinefunction(validator):
+                # to_thread copies the context, so Flask's globals work
+                return await asyncio.to_thread(validator, username)
+            error = validator(username)
+            if inspect.isawaitable(error):
+                error = await error
+            return error
+        finally:
+            timings.record(name, time.perf_counter() - started_at)
+
+    return timed
@@ -53,6 +53,26 @@ def app():
     return myapp
 
 
+@pytest.fixture
+def create_app():
+    """Factory of apps with CSRF protection off and `settings` in their
+    config, e.g. create_app(SIMPLELOGIN_TOKEN_MAX_AGE=60). Apps are
+    initialized with `SimpleLogin(app)` unless `init` is False."""
+
+    def factory(
+        import_name=__name__, template_folder="templates", init=True, **settings
+    ):
+        myapp = Flask(import_name, template_folder=template_folder)
+        myapp.config["SECRET_KEY"] = "secret-here"
+        myapp.config["WTF_CSRF_ENABLED"] = False
+        myapp.config.update(settings)
+        if init:
+            SimpleLogin(myapp)
+        return myapp
+
+    return factory
+
+
 @pytest.fixture
 def csrf_token_for():
     """Based on how Flask-WTF generates it on the fly:
@@ -1,9 +1,28 @@
+import os
+import signal
 from base64 import b64encode
+from types import MappingProxyType
 from unittest.mock import Mock, call
 
-from flask import session, url_for
+import pytest
+from flask import Flask, session, url_for
 
-from flask_simplelogin import is_logged_in
+from flask_simplelogin import (
+    SimpleLogin,
+    get_auth_context,
+    get_username,
+    is_logged_in,
+    login_required,
+    memoize_validator,
+)
+from flask_simplelogin.cache import CredentialCache
+
+
+def configure(app, **settings):
+    """Config is read only once initialized, so tests replace it"""
+    simplelogin = app.extensions["simplelogin"]
+    simplelogin.config = MappingProxyType({**simplelogin.config, **settings})
+    return simplelogin
 
 
 def test_get_login(client):
@@ -108,6 +127,7 @@ def test_logout(app, client, csrf_token_for):
 def test_login_required_with_username_list_allows_match(app, csrf_token_for):
     app.config["SIMPLELOGIN_USERNAME"] = "user1"
     app.config["SIMPLELOGIN_PASSWORD"] = "secret"
+    app.extensions["simplelogin"].reload_credentials()
     with app.test_client() as client:
         client.get(url_for("simplelogin.login"))
         client.post(
@@ -160,3 +180,277 @@ def test_flash(app, mocker):
             call("Authentication Error: nasty bug", "primary"),
         )
     )
+
+
+def test_basic_auth_uses_credential_cache(app, mocker):
+    simplelogin = app.extensions["simplelogin"]
+    simplelogin.credential_cache = CredentialCache(ttl=60)
+    checker = mocker.patch.object(simplelogin, "_login_checker", return_value=True)
+    auth = b64encode(b"admin:secret").decode("utf-8")
+    headers = {"Authorization": f"Basic {auth}", "Content-Type": "application/json"}
+    with app.test_client() as client:
+        for _ in range(3):
+            assert client.post("/api", headers=headers).status_code == 200
+        checker.assert_called_once()
+        assert simplelogin.credential_cache.hits == 2
+
+        client.get(url_for("simplelogin.logout"))
+        client.post("/api", headers=headers)
+        assert checker.call_count == 2
+
+
+def test_basic_auth_session_skips_checker_within_interval(app, mocker):
+    simplelogin = configure(app, basic_auth_reverify_interval=60)
+    checker = mocker.patch.object(simplelogin, "_login_checker", return_value=True)
+    now = mocker.patch("flask_simplelogin.time.time", return_value=1000.0)
+    auth = b64encode(b"admin:secret").decode("utf-8")
+    headers = {"Authorization": f"Basic {auth}", "Content-Type": "application/json"}
+    with app.test_client() as client:
+        for _ in range(3):
+            assert client.post("/api", headers=headers).status_code == 200
+        checker.assert_called_once()
+
+        now.return_value = 1061.0
+        assert client.post("/api", headers=headers).status_code == 200
+        assert checker.call_count == 2
+
+        other = b64encode(b"other:secret").decode("utf-8")
+        headers["Authorization"] = f"Basic {other}"
+        client.post("/api", headers=headers)
+        assert checker.call_count == 3
+
+
+def test_basic_auth_session_is_not_used_by_default(app, mocker):
+    simplelogin = app.extensions["simplelogin"]
+    checker = mocker.patch.object(simplelogin, "_login_checker", return_value=True)
+    auth = b64encode(b"admin:secret").decode("utf-8")
+    headers = {"Authorization": f"Basic {auth}", "Content-Type": "application/json"}
+    with app.test_client() as client:
+        client.post("/api", headers=headers)
+        client.post("/api", headers=headers)
+        assert checker.call_count == 2
+        assert "simple_basic_auth_verified_at" not in session
+
+
+def test_login_required_compiles_single_validator_and_username(app):
+    calls = []
+
+    def only_admin(username):
+        calls.append(username)
+        if username != "admin":
+            return "not admin"
+
+    @app.route("/compiled")
+    @login_required(username="admin", must=only_admin)
+    def compiled():
+        return "compiled"
+
+    with app.test_client() as client:
+        with client.session_transaction() as sess:
+            sess["simple_logged_in"] = True
+            sess["simple_username"] = "admin"
+        assert client.get("/compiled").status_code == 200
+        assert calls == ["admin"]
+
+        with client.session_transaction() as sess:
+            sess["simple_username"] = "other"
+        assert client.get("/compiled").status_code == 403
+        assert calls == ["admin"]
+
+
+def test_memoize_validator():
+    calls = []
+
+    def be_admin(username):
+        calls.append(username)
+        if username != "admin":
+            return "not admin"
+
+    memoized = memoize_validator(be_admin)
+    assert memoized.__name__ == "be_admin"
+    assert memoized("admin") is None
+    assert memoized("admin") is None
+    assert memoized("jon") == "not admin"
+    assert calls == ["admin", "jon"]
+
+    memoized.cache_clear()
+    memoized("admin")
+    assert calls == ["admin", "jon", "admin"]
+
+
+def test_memoize_validator_rejects_coroutines():
+    async def be_admin(username):
+        return None
+
+    with pytest.raises(TypeError):
+        memoize_validator(be_admin)
+
+
+def test_default_credentials_are_loaded_once(app, monkeypatch):
+    simplelogin = app.extensions["simplelogin"]
+    monkeypatch.setenv("SIMPLELOGIN_PASSWORD", "rotated")
+    assert simplelogin.check_default_credentials("admin", "secret")
+    assert not simplelogin.check_default_credentials("admin", "rotated")
+
+    simplelogin.reload_credentials()
+    assert not simplelogin.check_default_credentials("admin", "secret")
+    assert simplelogin.check_default_credentials("admin", "rotated")
+    assert not simplelogin.check_default_credentials(None, None)
+
+
+def test_reload_credentials_on_signal(app, monkeypatch):
+    simplelogin = app.extensions["simplelogin"]
+    simplelogin.credential_cache = CredentialCache(ttl=60)
+    simplelogin.credential_cache.add("admin", "secret")
+    previous = signal.getsignal(signal.SIGHUP)
+    try:
+        simplelogin.register_reload_signal()
+        monkeypatch.setenv("SIMPLELOGIN_USERNAME", "chuck")
+        # the handler must not wait for the lock the interrupted thread holds
+        with simplelogin.credential_cache._lock:
+            os.kill(os.getpid(), signal.SIGHUP)
+        assert simplelogin.check_default_credentials("chuck", "secret")
+        assert not simplelogin.credential_cache.get("admin", "secret")
+    finally:
+        signal.signal(signal.SIGHUP, previous)
+
+
+@pytest.mark.parametrize(
+    "mode,set_cookie", (("always", True), ("changed", False), ("never", False))
+)
+def test_basic_auth_session_modes(app, mode, set_cookie):
+    configure(app, basic_auth_session=mode)
+    auth = b64encode(b"admin:secret").decode("utf-8")
+    headers = {"Authorization": f"Basic {auth}", "Content-Type": "application/json"}
+    with app.test_client() as client:
+        first = client.post("/api", headers=headers)
+        assert first.status_code == 200
+        assert ("Set-Cookie" in first.headers) is (mode != "never")
+
+        second = client.post("/api", headers=headers)
+        assert second.status_code == 200
+        assert ("Set-Cookie" in second.headers) is set_cookie
+
+
+def test_stateless_basic_auth_identifies_user_in_request(app):
+    configure(app, basic_auth_session="never")
+    auth = b64encode(b"admin:secret").decode("utf-8")
+    headers = {"Authorization": f"Basic {auth}", "Content-Type": "application/json"}
+    with app.test_client() as client:
+        assert client.post("/api", headers=headers).status_code == 200
+        assert get_username() == "admin"
+        assert is_logged_in("admin")
+        assert "simple_logged_in" not in session
+
+
+def test_invalid_basic_auth_session_mode():
+    myapp = Flask(__name__)
+    myapp.config["SIMPLELOGIN_BASIC_AUTH_SESSION"] = "sometimes"
+    with pytest.raises(ValueError):
+        SimpleLogin(myapp)
+
+
+def test_auth_context_is_resolved_once_per_request(app):
+    with app.test_request_context():
+        session["simple_logged_in"] = True
+        session["simple_username"] = "admin"
+        auth = get_auth_context()
+        assert (auth.logged_in, auth.username, auth.method) == (
+            True,
+            "admin",
+            "session",
+        )
+
+        session["simple_username"] = "other"  # not seen until the next request
+        assert get_auth_context() is auth
+        assert get_username() == "admin"
+        assert is_logged_in("admin")
+        assert is_logged_in(["jon", "admin"])
+        assert not is_logged_in("jon")
+
+    with app.test_request_context():
+        assert not get_auth_context().logged_in
+        assert get_username() is None
+
+
+def test_auth_context_follows_login_and_logout(app, client, csrf_token_for):
+    client.get(url_for("simplelogin.login"))
+    client.post(
+        url_for("simplelogin.login"),
+        data={
+            "username": "admin",
+            "password": "secret",
+            "csrf_token": csrf_token_for(app),
+        },
+    )
+    assert get_auth_context().method == "session"
+    client.get(url_for("simplelogin.logout"))
+    assert not get_auth_context().logged_in
+
+
+def test_auth_context_of_stateless_basic_auth(app):
+    configure(app, basic_auth_session="never")
+
+    @app.route("/whoami", methods=["POST"])
+    @login_required(basic=True)
+    def whoami():
+        auth = get_auth_context()
+        return f"{auth.username} {auth.method}"
+
+    auth = b64encode(b"admin:secret").decode("utf-8")
+    response = app.test_client().post(
+        "/whoami",
+        headers={"Authorization": f"Basic {auth}", "Content-Type": "application/json"},
+    )
+    assert response.data == b"admin basic"
+
+
+def test_anonymous_redirect_is_cached_by_path(app, client):
+    simplelogin = app.extensions["simplelogin"]
+    for _ in range(2):
+        response = client.get("/secret", headers={"Accept": "application/json"})
+        assert response.status_code == 302
+        assert response.location == url_for("simplelogin.login", next="/secret")
+    assert simplelogin._login_locations.cache_info().hits == 1
+    assert "Accept" not in response.vary
+
+
+@pytest.mark.parametrize("mode", ("light", "json"))
+def test_anonymous_browsers_are_redirected_with_a_message(app, mode):
+    configure(app, anonymous_response=mode)
+    with app.test_client() as client:
+        response = client.get("/secret", headers={"Accept": "text/html,*/*;q=0.8"})
+        assert response.status_code == 302
+        assert "Accept" in response.vary
+        assert "Set-Cookie" in response.headers
+        assert session["_flashes"] == [("warning", "You need to login first")]
+
+
+def test_light_mode_skips_the_session_for_other_clients(app):
+    configure(app, anonymous_response="light")
+    with app.test_client() as client:
+        response = client.get("/secret", headers={"Accept": "*/*"})
+        assert response.status_code == 302
+        assert response.location == url_for("simplelogin.login", next="/secret")
+        assert response.data == b""
+        assert "Set-Cookie" not in response.headers
+        assert "_flashes" not in session
+
+
+def test_json_mode_answers_other_clients_with_a_401(app):
+    configure(app, anonymous_response="json")
+    with app.test_client() as client:
+        response = client.get("/secret")
+        assert response.status_code == 401
+        assert response.json == {
+            "error": "login_required",
+            "message": "You need to login first",
+        }
+        assert "Set-Cookie" not in response.headers
+
+
+def test_anonymous_response_must_be_known():
+    myapp = Flask(__name__)
+    myapp.config["SIMPLELOGIN_ANONYMOUS_RESPONSE"] = "teapot"
+    with pytest.raises(ValueError):
+        SimpleLogin(myapp)
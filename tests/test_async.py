@@ -0,0 +1,81 @@
+from base64 import b64encode
+
+import pytest
+from flask import Flask, jsonify
+
+from flask_simplelogin import SimpleLogin, login_required
+
+pytest.importorskip("asgiref")
+
+
+async def async_checker(user):
+    return user.get("username") == "admin" and user.get("password") == "secret"
+
+
+async def be_admin(username):
+    if username != "admin":
+        return "User does not have admin role"
+
+
+@pytest.fixture
+def async_app():
+    app = Flask(__name__)
+    app.config["SECRET_KEY"] = "secret-here"
+    SimpleLogin(app, login_checker=async_checker)
+
+    @app.route("/secret")
+    @login_required
+    async def secret():
+        return "This is Safe"
+
+    @app.route("/api", methods=["POST"])
+    @login_required(basic=True, must=be_admin)
+    async def api():
+        return jsonify(data="You are logged in with basic auth")
+
+    @app.route("/sync")
+    @login_required(must=be_admin)
+    def sync():
+        return "Sync view, async validator"
+
+    return app
+
+
+def basic_auth_headers(credentials):
+    auth = b64encode(credentials).decode("utf-8")
+    return {"Authorization": f"Basic {auth}", "Content-Type": "application/json"}
+
+
+def test_login_view_is_async_for_async_checkers(async_app):
+    simplelogin = async_app.extensions["simplelogin"]
+    assert async_app.view_functions["simplelogin.login"] == simplelogin.login_async
+
+
+def test_login_view_follows_checker_set_by_decorator(async_app):
+    simplelogin = async_app.extensions["simplelogin"]
+    simplelogin.login_checker(lambda user: True)
+    assert async_app.view_functions["simplelogin.login"] == simplelogin.login
+
+
+def test_async_view_redirects_anonymous_users(async_app):
+    with async_app.test_client() as client:
+        response = client.get("/secret")
+        assert response.status_code == 302
+        assert "/login/" in response.location
+
+
+def test_async_basic_auth(async_app):
+    with async_app.test_client() as client:
+        response = client.post("/api", headers=basic_auth_headers(b"admin:secret"))
+        assert response.status_code == 200
+
+        response = client.post("/api", headers=basic_auth_headers(b"admin:wrong"))
+        assert response.status_code == 401
+
+
+def test_async_login_with_basic_auth(async_app):
+    with async_app.test_client() as client:
+        response = client.post("/login/", headers=basic_auth_headers(b"admin:secret"))
+        assert response.status_code == 302
+        assert client.get("/secret").status_code == 200
+        assert client.get("/sync").status_code == 200
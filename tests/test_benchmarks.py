@@ -0,0 +1,34 @@
+from benchmarks import run
+
+
+def test_benchmarks_run(tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(run, "BASELINES", tmp_path)
+    assert run.main(["--requests", "5", "--warmup", "1", "--save", "base"]) == 0
+    assert (tmp_path / "base.json").exists()
+
+    baseline = run.load("base")
+    assert set(baseline) == {
+        f"{scenario}/{driver}"
+        for scenario in (
+            "login_get",
+            "login_post",
+            "logout",
+            "usernames",
+            "validators",
+            "basic_auth_json",
+        )
+        for driver in ("client", "server")
+    }
+
+    status = run.main(["--requests", "5", "--driver", "client", "--compare", "base"])
+    assert status in (0, 1)  # timings this short are noisy
+    assert "req/s vs base" in capsys.readouterr().out
+
+
+def test_regressions():
+    result = run.Result("usernames", "client", 10, 80.0, 1.0, 2.0, 3.0)
+    faster = run.Result("usernames", "client", 10, 200.0, 1.0, 2.0, 3.0)
+    baseline = {"usernames/client": faster}
+    assert run.regressions([result], baseline, threshold=0.1) == ["usernames/client"]
+    assert run.regressions([faster], baseline, threshold=0.1) == []
+    assert run.regressions([result], {}, threshold=0.1) == []
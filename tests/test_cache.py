@@ -0,0 +1,58 @@
+from flask_simplelogin.cache import CredentialCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_hit_and_miss_counters():
+    cache = CredentialCache(ttl=10)
+    assert not cache.get("admin", "secret")
+    cache.add("admin", "secret")
+    assert cache.get("admin", "secret")
+    assert not cache.get("admin", "wrong")
+    assert cache.hits == 1
+    assert cache.misses == 2
+
+
+def test_entries_expire():
+    clock = FakeClock()
+    cache = CredentialCache(ttl=10, clock=clock)
+    cache.add("admin", "secret")
+    clock.now = 11
+    assert not cache.get("admin", "secret")
+    assert len(cache) == 0
+
+
+def test_cache_is_bounded():
+    cache = CredentialCache(ttl=10, maxsize=2)
+    cache.add("user1", "secret")
+    cache.add("user2", "secret")
+    cache.get("user1", "secret")
+    cache.add("user3", "secret")
+    assert len(cache) == 2
+    assert cache.get("user1", "secret")
+    assert not cache.get("user2", "secret")
+
+
+def test_invalidate():
+    cache = CredentialCache(ttl=10)
+    cache.add("user1", "secret")
+    cache.add("user1", "other")
+    cache.add("user2", "secret")
+    cache.invalidate("user1")
+    assert not cache.get("user1", "secret")
+    assert not cache.get("user1", "other")
+    assert cache.get("user2", "secret")
+    cache.invalidate()
+    assert len(cache) == 0
+
+
+def test_plain_text_is_not_stored():
+    cache = CredentialCache(ttl=10)
+    cache.add("admin", "secret")
+    assert all(b"secret" not in key for key in cache._entries)
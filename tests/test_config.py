@@ -73,3 +73,39 @@ def test_custom_messages():
     assert isinstance(sl.messages["is_logged_in"], Message)
     assert sl.messages["logout"] is None
     assert sl.messages["login_required"] == SimpleLogin.messages["login_required"]
+
+
+def test_basic_auth_cache_is_disabled_by_default():
+    sl = create_simple_login(Settings())
+    assert sl.credential_cache is None
+
+
+def test_basic_auth_cache_can_be_enabled():
+    settings = Settings(
+        SIMPLELOGIN_BASIC_AUTH_CACHE_TTL=30, SIMPLELOGIN_BASIC_AUTH_CACHE_SIZE=10
+    )
+    sl = create_simple_login(settings)
+    assert sl.credential_cache is not None
+    assert sl.credential_cache.ttl == 30
+    assert sl.credential_cache.maxsize == 10
+
+
+def test_checker_executor_can_be_enabled():
+    assert create_simple_login(Settings()).checker_executor is None
+    settings = Settings(
+        SIMPLELOGIN_CHECKER_MAX_WORKERS=2, SIMPLELOGIN_CHECKER_QUEUE_SIZE=4
+    )
+    executor = create_simple_login(settings).checker_executor
+    assert executor is not None
+    assert executor.max_workers == 2
+    assert executor.queue_size == 4
+
+
+def test_rate_limiter_can_be_enabled():
+    assert create_simple_login(Settings()).rate_limiter is None
+    settings = Settings(SIMPLELOGIN_LOGIN_RATE_LIMIT=3, SIMPLELOGIN_LOGIN_LOCKOUT=5)
+    limiter = create_simple_login(settings).rate_limiter
+    assert limiter is not None
+    assert limiter.limit == 3
+    assert limiter.lockout == 5
+    assert limiter.window == 60
@@ -0,0 +1,74 @@
+import threading
+from base64 import b64encode
+
+import pytest
+from flask import current_app
+
+from flask_simplelogin import CheckerOverloadedError
+from flask_simplelogin.executor import CheckerExecutor, LatencyStats
+
+
+def test_latency_stats():
+    stats = LatencyStats()
+    assert stats.mean == 0.0
+    stats.record(0.1)
+    stats.record(0.3)
+    assert stats.count == 2
+    assert stats.max == 0.3
+    assert stats.mean == pytest.approx(0.2)
+
+
+def test_run_records_metrics():
+    executor = CheckerExecutor(max_workers=1, queue_size=0)
+    assert executor.run(lambda x: x * 2, 21) == 42
+    assert executor.queue_wait.count == 1
+    assert executor.checker_latency.count == 1
+    executor.shutdown()
+
+
+def test_fails_fast_when_full():
+    executor = CheckerExecutor(max_workers=1, queue_size=1, retry_after=5)
+    release = threading.Event()
+    busy = [executor.submit(release.wait) for _ in range(2)]
+    with pytest.raises(CheckerOverloadedError) as error:
+        executor.submit(release.wait)
+    assert error.value.retry_after == 5
+    assert executor.rejected == 1
+
+    release.set()
+    for future in busy:
+        future.result()
+    assert executor.run(lambda: True)
+    executor.shutdown()
+
+
+def test_checker_runs_with_app_context(app):
+    executor = CheckerExecutor(max_workers=1)
+    assert executor.run(lambda: current_app.name) == app.name
+    executor.shutdown()
+
+
+def test_overloaded_basic_auth_returns_503(app, mocker):
+    simplelogin = app.extensions["simplelogin"]
+    simplelogin.checker_executor = CheckerExecutor(max_workers=1, retry_after=3)
+    mocker.patch.object(
+        simplelogin.checker_executor,
+        "submit",
+        side_effect=CheckerOverloadedError(retry_after=3),
+    )
+    auth = b64encode(b"admin:secret").decode("utf-8")
+    headers = {"Authorization": f"Basic {auth}", "Content-Type": "application/json"}
+    with app.test_client() as client:
+        response = client.post("/api", headers=headers)
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "3"
+
+
+def test_basic_auth_through_executor(app):
+    simplelogin = app.extensions["simplelogin"]
+    simplelogin.checker_executor = CheckerExecutor(max_workers=1)
+    auth = b64encode(b"admin:secret").decode("utf-8")
+    headers = {"Authorization": f"Basic {auth}", "Content-Type": "application/json"}
+    with app.test_client() as client:
+        assert client.post("/api", headers=headers).status_code == 200
+    assert simplelogin.checker_executor.checker_latency.count == 1
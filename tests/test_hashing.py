@@ -0,0 +1,92 @@
+import pytest
+from werkzeug.security import generate_password_hash
+
+from flask_simplelogin import PasswordHasher
+
+
+@pytest.mark.parametrize("method", ("pbkdf2:sha256:1000", "scrypt:1024:8:1"))
+def test_hash_and_verify(method):
+    hasher = PasswordHasher(method)
+    password_hash = hasher.hash("norris")
+    assert password_hash.startswith(f"{method}$")
+    assert hasher.verify("norris", password_hash)
+    assert not hasher.verify("wrong", password_hash)
+    assert not hasher.needs_rehash(password_hash)
+
+
+@pytest.mark.parametrize("method", ("pbkdf2:sha256:1000", "scrypt:1024:8:1"))
+def test_verifies_werkzeug_hashes(method):
+    hasher = PasswordHasher("pbkdf2:sha256:2000")
+    password_hash = generate_password_hash("norris", method=method)
+    assert hasher.verify("norris", password_hash)
+    assert not hasher.verify("wrong", password_hash)
+    assert hasher.needs_rehash(password_hash)
+
+
+@pytest.mark.parametrize(
+    "method,needs_rehash",
+    (
+        ("pbkdf2:sha256:2000", False),
+        ("pbkdf2:sha256:4000", False),
+        ("pbkdf2:sha256:1000", True),
+        ("pbkdf2:sha512:2000", True),
+        ("scrypt:32768:8:1", True),
+    ),
+)
+def test_stronger_hashes_are_not_rehashed(method, needs_rehash):
+    hasher = PasswordHasher("pbkdf2:sha256:2000")
+    password_hash = PasswordHasher(method).hash("norris")
+    assert hasher.needs_rehash(password_hash) is needs_rehash
+
+
+def test_invalid_hashes_do_not_verify():
+    hasher = PasswordHasher("pbkdf2:sha256:1000")
+    assert not hasher.verify("norris", "not a hash")
+    assert not hasher.verify("norris", "md5:1$salt$value")
+
+
+@pytest.mark.parametrize(
+    "method", ("pbkdf2:sha256", "pbkdf2:nope:1000", "scrypt:1024", "bcrypt:12")
+)
+def test_invalid_methods(method):
+    with pytest.raises(ValueError):
+        PasswordHasher(method)
+
+
+def test_is_hash():
+    assert PasswordHasher.is_hash(PasswordHasher("pbkdf2:sha256:1000").hash("x"))
+    assert not PasswordHasher.is_hash("secret")
+    assert not PasswordHasher.is_hash("pbkdf2:but-not-a-hash")
+
+
+def test_calibrate_pbkdf2(mocker):
+    mocker.patch.object(PasswordHasher, "_time", return_value=0.01)
+    hasher = PasswordHasher.calibrate(target=0.05)
+    assert hasher.method == "pbkdf2:sha256:50000"
+
+
+def test_calibrate_scrypt(mocker):
+    timings = iter((0.01, 0.02, 0.04, 0.08))
+    mocker.patch.object(PasswordHasher, "_time", side_effect=lambda _: next(timings))
+    hasher = PasswordHasher.calibrate(target=0.05, algorithm="scrypt")
+    assert hasher.method == "scrypt:8192:8:1"
+
+
+def test_calibrate_unknown_algorithm():
+    with pytest.raises(ValueError):
+        PasswordHasher.calibrate(algorithm="bcrypt")
+
+
+def test_calibrate_measures_time():
+    assert PasswordHasher._time("pbkdf2:sha256:1000", rounds=1) > 0
+
+
+def test_hashed_default_password(app):
+    simplelogin = app.extensions["simplelogin"]
+    simplelogin.hasher = PasswordHasher("pbkdf2:sha256:1000")
+    app.config["SIMPLELOGIN_PASSWORD"] = simplelogin.hasher.hash("norris")
+    simplelogin.reload_credentials()
+    assert simplelogin.check_default_credentials("admin", "norris")
+    assert not simplelogin.check_default_credentials("admin", "secret")
+    assert not simplelogin.check_default_credentials("admin", None)
+    assert not simplelogin.check_default_credentials("chuck", "norris")
@@ -0,0 +1,97 @@
+import pytest
+from flask import Flask, get_flashed_messages
+
+from flask_simplelogin import Message, SimpleLogin, login_required
+from flask_simplelogin.i18n import CompiledMessage, MessageCatalog, compile_message
+
+TRANSLATIONS = {
+    "pt-BR": {
+        "login_failure": Message("credenciais inválidas", "danger"),
+        "auth_error": "Erro de autenticação: {0}",
+    },
+    "de": {"login_failure": "ungültige Anmeldeinformationen"},
+}
+
+
+@pytest.mark.parametrize(
+    "text,args,kwargs",
+    (
+        ("Authentication Error: {0}", ("nope",), {}),
+        ("{} and {}", (1, 2.5), {}),
+        ("{1} before {0}", ("a", "b"), {}),
+        ("hello {name}!", (), {"name": "chuck"}),
+        ("{0!r} uses a conversion", ("quoted",), {}),
+        ("{0:>8} uses a spec", ("right",), {}),
+        ("{user.title} uses an attribute", (), {"user": "chuck"}),
+        ("{{escaped}} {0}", ("braces",), {}),
+    ),
+)
+def test_compiled_message_formats_like_str_format(text, args, kwargs):
+    assert CompiledMessage(text).format(*args, **kwargs) == text.format(*args, **kwargs)
+
+
+def test_compiled_message_without_fields_is_not_copied():
+    message = CompiledMessage("Access Denied")
+    assert message.format() is message.text
+
+
+def test_compiled_messages_are_shared():
+    assert compile_message(Message("hi", "info")) is compile_message(
+        Message("hi", "info")
+    )
+    assert compile_message("hi") is not compile_message(Message("hi", "info"))
+    assert compile_message(None) is None
+
+
+def test_catalog_negotiates_the_locale_once_per_header():
+    catalog = MessageCatalog(SimpleLogin.messages, TRANSLATIONS)
+    header = "fr-CH, fr;q=0.9, pt;q=0.8, de;q=0.7"
+    table = catalog.table(header)
+    assert table["login_failure"].text == "credenciais inválidas"
+    assert table["logout"].text == "Logged out!"  # not translated
+    assert catalog.table(header) is table
+    assert catalog._negotiate.cache_info().hits == 1
+
+    assert catalog.table("de-AT")["login_failure"].category == "primary"
+    assert catalog.table("ja") is catalog.default
+    assert catalog.table(None) is catalog.default
+    assert MessageCatalog(SimpleLogin.messages).table("de") is catalog.default
+
+
+@pytest.fixture
+def translated_app():
+    app = Flask(__name__)
+    app.config["SECRET_KEY"] = "secret-here"
+    app.config["WTF_CSRF_ENABLED"] = False
+    SimpleLogin(app, translations=TRANSLATIONS)
+
+    def be_admin(username):
+        return "não é admin"
+
+    @app.route("/admin")
+    @login_required(must=be_admin)
+    def admin():
+        return "admin"
+
+    return app
+
+
+def test_flash_uses_the_client_language(translated_app):
+    with translated_app.test_client() as client:
+        client.post(
+            "/login/",
+            data={"username": "admin", "password": "wrong"},
+            headers={"Accept-Language": "pt-BR,pt;q=0.9"},
+        )
+        assert get_flashed_messages(with_categories=True) == [
+            ("danger", "credenciais inválidas")
+        ]
+
+
+def test_auth_error_uses_the_client_language(translated_app):
+    with translated_app.test_client() as client:
+        client.post("/login/", data={"username": "admin", "password": "secret"})
+        response = client.get("/admin", headers={"Accept-Language": "pt-BR"})
+        assert response.status_code == 403
+        assert response.text == "Erro de autenticação: não é admin"
+        assert client.get("/admin").text == "Authentication Error: não é admin"
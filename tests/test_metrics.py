@@ -0,0 +1,123 @@
+import pytest
+
+from flask_simplelogin import login_required
+from flask_simplelogin.metrics import (
+    Counter,
+    Histogram,
+    MetricsRegistry,
+    PrometheusExporter,
+)
+
+
+def test_histogram():
+    histogram = Histogram("latency", "Latency", buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 2.0):
+        histogram.observe(value, view="a")
+    histogram.observe(0.5, view="b")
+
+    series = histogram.series(view="a")
+    assert series.count == 4
+    assert series.sum == pytest.approx(2.65)
+    assert histogram.series(view="c") is None
+    samples = dict((labels, rest) for labels, *rest in histogram.samples())
+    assert samples[(("view", "a"),)][0] == [2, 3, 4]
+    assert samples[(("view", "b"),)][0] == [0, 1, 1]
+
+
+def test_histogram_time(mocker):
+    mocker.patch("flask_simplelogin.metrics.time.perf_counter", side_effect=[1, 3])
+    histogram = Histogram("latency", "Latency")
+    with histogram.time():
+        pass
+    assert histogram.series().sum == 2
+
+
+def test_registry():
+    registry = MetricsRegistry()
+    counter = registry.counter("requests", "Requests")
+    assert registry.counter("requests") is counter
+    assert isinstance(registry["requests"], Counter)
+    assert "requests" in registry
+    with pytest.raises(ValueError):
+        registry.histogram("requests")
+
+    counter.inc(reason="login")
+    counter.inc(2, reason="login")
+    assert counter.value(reason="login") == 3
+    assert counter.value(reason="logout") == 0
+
+
+def test_prometheus_exporter():
+    registry = MetricsRegistry()
+    registry.counter("redirects_total", "Redirects").inc(reason='a "b"')
+    registry.histogram("seconds", "Time\nspent", buckets=(0.5,)).observe(0.25)
+
+    assert PrometheusExporter().render(registry) == (
+        "# HELP redirects_total Redirects\n"
+        "# TYPE redirects_total counter\n"
+        'redirects_total{reason="a \\"b\\""} 1\n'
+        "# HELP seconds Time\\nspent\n"
+        "# TYPE seconds histogram\n"
+        'seconds_bucket{le="0.5"} 1\n'
+        'seconds_bucket{le="+Inf"} 1\n'
+        "seconds_sum 0.25\n"
+        "seconds_count 1\n"
+    )
+
+
+@pytest.fixture
+def create_app(create_app):
+    def factory(**settings):
+        app = create_app(**settings)
+
+        def be_admin(username):
+            if username != "admin":
+                return "Not admin"
+
+        @app.route("/secret")
+        @login_required(must=be_admin)
+        def secret():
+            return "secret"
+
+        return app
+
+    return factory
+
+
+def test_metrics_are_disabled_by_default(create_app):
+    app = create_app()
+    simplelogin = app.extensions["simplelogin"]
+    assert simplelogin.metrics is None
+    client = app.test_client()
+    client.post("/login/", data={"username": "admin", "password": "secret"})
+    assert client.get("/secret").status_code == 200
+    assert "simplelogin.metrics" not in app.view_functions
+
+
+def test_metrics(create_app):
+    app = create_app(SIMPLELOGIN_METRICS=True, SIMPLELOGIN_METRICS_URL="/metrics")
+    metrics = app.extensions["simplelogin"].metrics
+    client = app.test_client()
+
+    assert client.get("/secret").status_code == 302
+    client.post("/login/", data={"username": "admin", "password": "wrong"})
+    client.post("/login/", data={"username": "admin", "password": "secret"})
+    assert client.get("/secret").status_code == 200
+    client.get("/logout/")
+
+    redirects = metrics["simplelogin_redirects_total"]
+    assert redirects.value(reason="login_required") == 1
+    assert redirects.value(reason="login") == 1
+    assert redirects.value(reason="logout") == 1
+    assert metrics["simplelogin_login_checker_seconds"].series().count == 2
+    assert metrics["simplelogin_form_validation_seconds"].series().count == 2
+    validator_series = [
+        labels for labels, *_ in metrics["simplelogin_validator_seconds"].samples()
+    ]
+    assert len(validator_series) == 1
+    assert validator_series[0][0][0] == "validator"
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.content_type == PrometheusExporter.content_type
+    assert b"simplelogin_login_checker_seconds_count 2" in response.data
@@ -0,0 +1,158 @@
+from base64 import b64encode
+
+import pytest
+from flask import Flask
+
+from flask_simplelogin import SimpleLogin, get_auth_context, login_required
+from flask_simplelogin.middleware import PathRule, PrefixTrie, SimpleLoginMiddleware
+
+
+def test_prefix_trie_longest_prefix_wins():
+    trie = PrefixTrie()
+    protected, public = PathRule(True), PathRule(False)
+    trie.add("/admin", protected)
+    trie.add("/admin/health/", public)
+    assert trie.match("/admin") is protected
+    assert trie.match("/admin/users/1") is protected
+    assert trie.match("/admin/health") is public
+    assert trie.match("/admin/health/db") is public
+    assert trie.match("/administrators") is None
+    assert trie.match("/") is None
+
+    trie.add("/", public)
+    assert trie.match("/anything") is public
+
+
+@pytest.fixture
+def protected_app():
+    app = Flask(__name__)
+    app.config["SECRET_KEY"] = "secret-here"
+    app.config["WTF_CSRF_ENABLED"] = False
+    app.config["SIMPLELOGIN_TOKEN_MAX_AGE"] = 60
+    SimpleLogin(app)
+    app.calls = []
+
+    @app.before_request
+    def track():
+        app.calls.append("before_request")
+
+    @app.route("/admin/")
+    @app.route("/admin/<path:page>")
+    def admin(page=""):
+        auth = get_auth_context()
+        return {"username": auth.username, "method": auth.method}
+
+    @app.route("/api/data")
+    def api():
+        return {"username": get_auth_context().username}
+
+    @app.route("/public")
+    def public():
+        return "public"
+
+    middleware = SimpleLoginMiddleware(app, protect=["/admin"], allow=["/admin/about"])
+    middleware.protect("/api", basic=True)
+    app.wsgi_app = middleware
+    return app
+
+
+def test_unprotected_paths_reach_the_app(protected_app):
+    client = protected_app.test_client()
+    assert client.get("/public").text == "public"
+    assert client.get("/admin/about").status_code == 200
+    assert client.get("/login/").status_code == 200
+
+
+def test_anonymous_requests_never_reach_the_app(protected_app):
+    client = protected_app.test_client()
+    response = client.get("/admin/users?page=2", headers={"Accept": "text/html"})
+    assert response.status_code == 302
+    assert response.location == "/login/?next=/admin/users%3Fpage%3D2"
+    assert "Set-Cookie" not in response.headers
+
+    response = client.get("/admin/users")
+    assert response.status_code == 401
+    assert response.json == {
+        "error": "login_required",
+        "message": "You need to login first",
+    }
+    assert "WWW-Authenticate" not in response.headers
+    assert protected_app.calls == []
+
+
+def test_logged_in_users_get_in(protected_app):
+    client = protected_app.test_client()
+    client.post("/login/", data={"username": "admin", "password": "secret"})
+    protected_app.calls.clear()
+    response = client.get("/admin/users")
+    assert response.json == {"username": "admin", "method": "session"}
+    assert protected_app.calls == ["before_request"]
+
+
+def test_bearer_tokens(protected_app):
+    token = protected_app.extensions["simplelogin"].issue_token("robot")
+    client = protected_app.test_client()
+    headers = {"Authorization": f"Bearer {token}"}
+    assert client.get("/admin/", headers=headers).json == {
+        "username": "robot",
+        "method": "token",
+    }
+    headers = {"Authorization": "Bearer forged"}
+    assert client.get("/admin/", headers=headers).status_code == 401
+
+
+def test_basic_auth_only_where_enabled(protected_app):
+    client = protected_app.test_client()
+    auth = b64encode(b"admin:secret").decode("utf-8")
+    headers = {"Authorization": f"Basic {auth}"}
+    response = client.get("/api/data", headers=headers)
+    assert response.json == {"username": "admin"}
+    assert "Set-Cookie" not in response.headers
+    assert client.get("/admin/", headers=headers).status_code == 401
+
+    wrong = b64encode(b"admin:wrong").decode("utf-8")
+    response = client.get("/api/data", headers={"Authorization": f"Basic {wrong}"})
+    assert response.status_code == 401
+    assert response.headers["WWW-Authenticate"] == 'Basic realm="Login Required"'
+
+
+def test_too_many_attempts_are_rejected():
+    app = Flask(__name__)
+    app.config["SECRET_KEY"] = "secret-here"
+    app.config["SIMPLELOGIN_LOGIN_RATE_LIMIT"] = 1
+    SimpleLogin(app)
+    app.wsgi_app = SimpleLoginMiddleware(app, protect=["/"], basic=True)
+
+    client = app.test_client()
+    wrong = b64encode(b"admin:wrong").decode("utf-8")
+    headers = {"Authorization": f"Basic {wrong}"}
+    assert client.get("/", headers=headers).status_code == 401
+    assert client.get("/", headers=headers).status_code == 429
+
+
+def test_basic_auth_views_do_not_check_again():
+    app = Flask(__name__)
+    app.config["SECRET_KEY"] = "secret-here"
+    checked, teardowns = [], []
+
+    def checker(user):
+        checked.append(user["username"])
+        return user["password"] == "secret"
+
+    SimpleLogin(app, login_checker=checker)
+    app.wsgi_app = SimpleLoginMiddleware(app, protect=["/api"], basic=True)
+    app.teardown_request(teardowns.append)
+
+    @app.route("/api/data", methods=["POST"])
+    @login_required(basic=True, username="admin")
+    def api():
+        return {"username": get_auth_context().username}
+
+    auth = b64encode(b"admin:secret").decode("utf-8")
+    headers = {"Authorization": f"Basic {auth}"}
+    response = app.test_client().post("/api/data", headers=headers, json={})
+    assert response.json == {"username": "admin"}
+    assert "Set-Cookie" not in response.headers
+    assert checked == ["admin"]
+    # once for the authentication, once for the app
+    assert len(teardowns) == 2
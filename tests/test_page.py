@@ -0,0 +1,113 @@
+import re
+from base64 import b64encode
+from functools import partial
+
+import pytest
+from flask import flash
+
+from flask_simplelogin import SimpleLogin
+
+TOKEN = re.compile(r'name="csrf_token" type="hidden" value="([^"]+)"')
+
+
+@pytest.fixture
+def create_app(create_app):
+    return partial(create_app, WTF_CSRF_ENABLED=True, SIMPLELOGIN_LOGIN_PAGE_CACHE=True)
+
+
+def test_cached_page_matches_the_rendered_page(create_app):
+    cached_app = create_app()
+    app = create_app(SIMPLELOGIN_LOGIN_PAGE_CACHE=False)
+    cached = cached_app.test_client().get("/login/?next=/secret").text
+    rendered = app.test_client().get("/login/?next=/secret").text
+    assert TOKEN.sub("", cached) == TOKEN.sub("", rendered)
+
+
+def test_cached_page_tokens_are_valid(mocker, create_app):
+    app = create_app()
+    render = mocker.spy(app.extensions["simplelogin"].login_page, "form_factory")
+    client = app.test_client()
+    first = TOKEN.search(client.get("/login/").text).group(1)
+    second = TOKEN.search(client.get("/login/").text).group(1)
+    assert render.call_count == 1  # only to build the page skeleton
+    assert "__simplelogin" not in first
+
+    response = client.post(
+        "/login/",
+        data={"username": "admin", "password": "secret", "csrf_token": second},
+    )
+    assert response.status_code == 302
+
+
+def test_next_is_escaped(create_app):
+    app = create_app()
+    page = app.test_client().get('/login/?next=/a"><b').text
+    assert 'name="next" value="/a&#34;&gt;&lt;b"' in page
+
+
+def test_flashed_messages_render_the_page(create_app):
+    app = create_app()
+
+    @app.route("/flash")
+    def flash_message():
+        flash("Hello there")
+        return "flashed"
+
+    client = app.test_client()
+    client.get("/flash")
+    assert "Hello there" in client.get("/login/").text
+    assert "Hello there" not in client.get("/login/").text
+
+
+def test_custom_templates_are_not_cached_unless_always(tmp_path, create_app):
+    (tmp_path / "login.html").write_text("{{ form.csrf_token }} {{ now }}")
+    app = create_app(template_folder=str(tmp_path))
+
+    counter = iter(range(10))
+    app.context_processor(lambda: {"now": next(counter)})
+    client = app.test_client()
+    assert client.get("/login/").text != client.get("/login/").text
+
+    app = create_app(
+        template_folder=str(tmp_path), SIMPLELOGIN_LOGIN_PAGE_CACHE="always"
+    )
+    counter = iter(range(10))
+    app.context_processor(lambda: {"now": next(counter)})
+    client = app.test_client()
+    first, second = client.get("/login/").text, client.get("/login/").text
+    assert TOKEN.sub("", first) == TOKEN.sub("", second)
+
+
+def test_etag(create_app):
+    app = create_app(SIMPLELOGIN_LOGIN_PAGE_MAX_AGE=60)
+    client = app.test_client()
+    response = client.get("/login/")
+    etag = response.headers["ETag"]
+    assert response.headers["Cache-Control"] == "private, max-age=60"
+
+    response = client.get("/login/", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+
+    response = client.get("/login/?next=/other", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+
+async def async_checker(user):
+    return user["username"] == "admin" and user["password"] == "secret"
+
+
+@pytest.mark.parametrize("checker", (None, async_checker))
+def test_json_logins_are_not_answered_with_the_page(create_app, checker):
+    app = create_app(init=False)
+    SimpleLogin(app, login_checker=checker)
+    auth = b64encode(b"admin:secret").decode("utf-8")
+    headers = {"Authorization": f"Basic {auth}", "Content-Type": "application/json"}
+    response = app.test_client().get("/login/", headers=headers)
+    assert response.status_code == 302
+
+
+def test_invalid_login_page_cache(create_app):
+    with pytest.raises(ValueError):
+        create_app(SIMPLELOGIN_LOGIN_PAGE_CACHE="sometimes")
@@ -0,0 +1,132 @@
+from base64 import b64encode
+
+import pytest
+
+from flask_simplelogin import TooManyLoginAttemptsError
+from flask_simplelogin.ratelimit import (
+    CounterStorage,
+    LimiterState,
+    LoginRateLimiter,
+    MemoryCounterStorage,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeSharedStorage(CounterStorage):
+    """Stands for a backend shared by many workers"""
+
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, state, ttl):
+        self.data[key] = state
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+
+def test_lockout_after_limit():
+    clock = FakeClock()
+    limiter = LoginRateLimiter(limit=3, window=60, lockout=10, clock=clock)
+    for _ in range(2):
+        limiter.failed(["ip:1"])
+        limiter.check(["ip:1"])
+
+    limiter.failed(["ip:1"])
+    with pytest.raises(TooManyLoginAttemptsError) as error:
+        limiter.check(["ip:1", "ip:2"])
+    assert error.value.retry_after == 10
+
+    clock.now += 10
+    limiter.check(["ip:1"])
+
+
+def test_failures_outside_the_window_are_forgotten():
+    clock = FakeClock()
+    limiter = LoginRateLimiter(limit=2, window=60, clock=clock)
+    limiter.failed(["ip:1"])
+    clock.now += 61
+    limiter.failed(["ip:1"])
+    assert limiter.retry_after(["ip:1"]) is None
+
+
+def test_lockout_grows_exponentially():
+    clock = FakeClock()
+    limiter = LoginRateLimiter(
+        limit=1, window=60, lockout=10, max_lockout=25, clock=clock
+    )
+    expected = (10, 20, 25)
+    for seconds in expected:
+        limiter.failed(["ip:1"])
+        assert limiter.retry_after(["ip:1"]) == seconds
+        clock.now += seconds
+
+    limiter.succeeded(["ip:1"])
+    limiter.failed(["ip:1"])
+    assert limiter.retry_after(["ip:1"]) == 10
+
+
+def test_memory_storage_is_bounded_and_expires():
+    clock = FakeClock()
+    storage = MemoryCounterStorage(maxsize=2, clock=clock)
+    for key in ("a", "b", "c"):
+        storage.set(key, LimiterState(), ttl=10)
+    assert len(storage) == 2
+    assert storage.get("a") is None
+    assert storage.get("b") is not None
+
+    clock.now += 10
+    assert storage.get("b") is None
+    storage.delete("c")
+    assert len(storage) == 0
+
+
+def test_shared_storage():
+    storage = FakeSharedStorage()
+    worker1 = LoginRateLimiter(limit=2, storage=storage)
+    worker2 = LoginRateLimiter(limit=2, storage=storage)
+    worker1.failed(["ip:1"])
+    worker2.failed(["ip:1"])
+    with pytest.raises(TooManyLoginAttemptsError):
+        worker1.check(["ip:1"])
+
+
+def test_rejects_before_running_the_checker(app, mocker):
+    simplelogin = app.extensions["simplelogin"]
+    simplelogin.rate_limiter = LoginRateLimiter(limit=2, lockout=30)
+    checker = mocker.patch.object(simplelogin, "_login_checker", return_value=False)
+    auth = b64encode(b"admin:wrong").decode("utf-8")
+    headers = {"Authorization": f"Basic {auth}", "Content-Type": "application/json"}
+    with app.test_client() as client:
+        assert client.post("/api", headers=headers).status_code == 401
+        assert client.post("/api", headers=headers).status_code == 401
+        response = client.post("/api", headers=headers)
+        assert response.status_code == 429
+        assert response.headers["Retry-After"] == "30"
+        assert checker.call_count == 2
+
+
+def test_valid_login_clears_username_failures(app, mocker):
+    simplelogin = app.extensions["simplelogin"]
+    simplelogin.rate_limiter = LoginRateLimiter(limit=3)
+    checker = mocker.patch.object(simplelogin, "_login_checker", return_value=False)
+    auth = b64encode(b"admin:secret").decode("utf-8")
+    headers = {"Authorization": f"Basic {auth}", "Content-Type": "application/json"}
+    with app.test_client() as client:
+        client.post("/api", headers=headers)
+        checker.return_value = True
+        client.post("/api", headers=headers)
+
+    storage = simplelogin.rate_limiter.storage
+    assert storage.get("username:admin") is None
+    assert storage.get("ip:127.0.0.1").failures
@@ -0,0 +1,107 @@
+import pytest
+from flask import url_for
+
+from flask_simplelogin.redirects import AllowedHosts, RedirectPolicy
+
+
+def test_allowed_hosts_are_normalized():
+    hosts = AllowedHosts(["Example.com", " *.Partner.org", ".cdn.net", ""])
+    assert hosts.exact == frozenset({"example.com"})
+    assert hosts.suffixes == frozenset({".partner.org", ".cdn.net"})
+    assert len(hosts) == 3
+
+
+@pytest.mark.parametrize(
+    "netloc,allowed",
+    (
+        ("example.com", True),
+        ("EXAMPLE.com", True),
+        ("example.com:8080", False),
+        ("www.example.com", False),
+        ("shop.partner.org", True),
+        ("a.b.partner.org", True),
+        ("partner.org", False),
+        ("evilpartner.org", False),
+        ("partner.org.evil.com", False),
+        ("static.cdn.net", True),
+        ("shop.partner.org:8080", False),
+        ("evil.com\\.partner.org", False),
+        ("evil.com%5C.partner.org", False),
+        ("evil.com%5c.example.com", False),
+        ("evil.com\t.partner.org", False),
+        ("shop.partner.org@evil.com", False),
+        ("evil.com@shop.partner.org", True),
+        ("", False),
+    ),
+)
+def test_allowed_hosts_lookup(netloc, allowed):
+    hosts = AllowedHosts(["example.com", "*.partner.org", ".cdn.net"])
+    assert (netloc in hosts) is allowed
+
+
+@pytest.mark.parametrize(
+    "url,allowed",
+    (
+        ("/", True),
+        ("/page?next=https://evil.com", True),
+        ("http://localhost/page", True),
+        ("https://shop.partner.org/cart", True),
+        ("//shop.partner.org/cart", True),
+        ("https://evil.com", False),
+        ("//evil.com", False),
+        ("javascript:alert(1)", False),
+        ("https://evil.com\\.partner.org/", False),
+        ("https://evil.com%5C.partner.org/", False),
+        ("https://shop.partner.org@evil.com/", False),
+        ("/\\evil.com", False),
+        ("/\t/evil.com", False),
+        (" //evil.com", False),
+    ),
+)
+def test_redirect_policy(url, allowed):
+    policy = RedirectPolicy(["*.partner.org"])
+    assert policy.is_allowed("localhost", url) is allowed
+
+
+def test_wildcard_hosts_with_a_port():
+    hosts = AllowedHosts(["*.partner.org:8080"])
+    assert "shop.partner.org:8080" in hosts
+    assert "shop.partner.org" not in hosts
+
+
+@pytest.mark.parametrize(
+    "next_url",
+    (
+        "https://evil.com\\.partner.org/",
+        "https://evil.com%5C.partner.org/",
+        "https://shop.partner.org@evil.com/",
+    ),
+)
+def test_login_view_rejects_lookalike_hosts(app, next_url):
+    app.config["ALLOWED_HOSTS"] = ["*.partner.org"]
+    with app.test_client() as client:
+        response = client.get(url_for("simplelogin.login", next=next_url))
+        assert response.status_code == 400
+
+
+def test_redirect_policy_caches_decisions():
+    policy = RedirectPolicy([], cache_size=2)
+    for _ in range(3):
+        assert policy.is_allowed("localhost", "/secret")
+    assert policy.is_allowed.cache_info().hits == 2
+
+
+def test_replacing_allowed_hosts_recompiles_the_policy(app):
+    simplelogin = app.extensions["simplelogin"]
+    compiled = simplelogin.redirect_policy
+    with app.test_client() as client:
+        next_url = "https://shop.partner.org/"
+        response = client.get(url_for("simplelogin.login", next=next_url))
+        assert response.status_code == 400
+        assert simplelogin.redirect_policy is compiled
+
+        app.config["ALLOWED_HOSTS"] = ["*.partner.org"]
+        response = client.get(url_for("simplelogin.login", next=next_url))
+        assert response.status_code == 200
+        assert simplelogin.redirect_policy is not compiled
+        assert simplelogin.redirect_policy.source is app.config["ALLOWED_HOSTS"]
@@ -0,0 +1,144 @@
+from base64 import b64encode
+
+import pytest
+
+from flask_simplelogin import get_username, login_required
+from flask_simplelogin.revocation import RevocationList
+
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_revoked_ids_expire():
+    clock = Clock()
+    revocations = RevocationList(bucket_seconds=10, clock=clock)
+    revocations.revoke("a", clock.now + 5)
+    revocations.revoke("b", clock.now + 50)
+    revocations.revoke("c", clock.now - 1)  # already expired, nothing to do
+    assert revocations.is_revoked("a")
+    assert revocations.is_revoked("b")
+    assert not revocations.is_revoked("c")
+    assert len(revocations) == 2
+
+    clock.now += 20
+    assert not revocations.is_revoked("a")
+    assert revocations.is_revoked("b")
+    assert len(revocations) == 1
+
+    clock.now += 40
+    assert not revocations.is_revoked("b")
+    assert len(revocations) == 0
+
+
+def test_revoking_again_keeps_the_latest_expiration():
+    clock = Clock()
+    revocations = RevocationList(bucket_seconds=10, clock=clock)
+    revocations.revoke("a", clock.now + 100)
+    revocations.revoke("a", clock.now + 5)
+    clock.now += 50
+    assert revocations.is_revoked("a")
+
+    revocations.revoke("a", clock.now + 200)
+    clock.now += 100
+    assert revocations.is_revoked("a")
+    assert len(revocations) == 1
+
+
+def test_snapshot_and_load():
+    clock = Clock()
+    revocations = RevocationList(clock=clock)
+    revocations.revoke("a", clock.now + 30)
+    revocations.revoke("b", clock.now + 300)
+
+    clock.now += 60
+    snapshot = revocations.snapshot()
+    assert snapshot == [("b", 1300.0)]
+
+    restarted = RevocationList(clock=clock)
+    restarted.load(snapshot)
+    assert restarted.is_revoked("b")
+    assert not restarted.is_revoked("a")
+
+
+@pytest.fixture
+def create_app(create_app):
+    def factory(**settings):
+        app = create_app(**settings)
+
+        @app.route("/secret", methods=["GET", "POST"])
+        @login_required
+        def secret():
+            return get_username()
+
+        return app
+
+    return factory
+
+
+def test_logout_revokes_bearer_tokens(create_app):
+    app = create_app(SIMPLELOGIN_TOKEN_MAX_AGE=300)
+    simplelogin = app.extensions["simplelogin"]
+    token = simplelogin.issue_token("chuck")
+    other = simplelogin.issue_token("chuck")
+    client = app.test_client(use_cookies=False)
+    headers = {"Authorization": f"Bearer {token}"}
+
+    assert client.get("/secret", headers=headers).data == b"chuck"
+    client.get("/logout/", headers=headers)
+    response = client.get("/secret", headers=headers)
+    assert response.status_code == 401
+    assert "invalid_token" in response.headers["WWW-Authenticate"]
+
+    headers = {"Authorization": f"Bearer {other}"}
+    assert client.get("/secret", headers=headers).status_code == 200
+
+
+def test_revoke_token(create_app):
+    app = create_app(SIMPLELOGIN_TOKEN_MAX_AGE=300)
+    simplelogin = app.extensions["simplelogin"]
+    token = simplelogin.issue_token("chuck")
+    assert simplelogin.revoke_token(token)
+    assert not simplelogin.revoke_token("not a token")
+    assert len(simplelogin.revocations) == 1
+
+    client = app.test_client()
+    response = client.get("/secret", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 401
+
+
+def test_logout_revokes_copies_of_the_session_cookie(create_app):
+    app = create_app(SIMPLELOGIN_REVOKE_SESSIONS=True)
+    client = app.test_client()
+    auth = b64encode(b"admin:secret").decode("utf-8")
+    client.post(
+        "/login/",
+        headers={"Authorization": f"Basic {auth}", "Content-Type": "application/json"},
+    )
+    cookie = client.get_cookie("session")
+    assert cookie is not None
+    assert client.get("/secret").data == b"admin"
+
+    stolen = app.test_client()
+    stolen.set_cookie("session", cookie.value)
+    assert stolen.get("/secret").status_code == 200
+
+    client.get("/logout/")
+    assert stolen.get("/secret").status_code == 302
+
+    # logging in again gets a new session ID
+    stolen.post("/login/", data={"username": "admin", "password": "secret"})
+    assert stolen.get("/secret").status_code == 200
+
+
+def test_sessions_are_not_tracked_by_default(create_app):
+    app = create_app()
+    client = app.test_client()
+    client.post("/login/", data={"username": "admin", "password": "secret"})
+    with client.session_transaction() as session:
+        assert session["simple_logged_in"]
+        assert "simple_session_id" not in session
@@ -0,0 +1,131 @@
+from base64 import b64encode
+
+import pytest
+from flask import Flask
+
+from flask_simplelogin import (
+    MemoryUserStore,
+    RoleRegistry,
+    SimpleLogin,
+    get_username,
+    login_required,
+)
+from flask_simplelogin.roles import PERMISSION_BITS, BitIndex
+
+USERS = {"chuck": ["admin"], "jon": ["editor"], "arya": []}
+ROLES = {"admin": ["read", "write", "delete"], "editor": ["read", "write"]}
+
+
+def test_bit_index():
+    bits = BitIndex()
+    assert bits.mask(None) == 0
+    assert bits.mask("a") == 1
+    assert bits.mask(["b", "a"]) == 3
+    assert bits.bit("c") == 4
+    assert bits.mask(["a", "b", "c"]) == 7
+
+
+def test_registry_masks_are_loaded_once():
+    calls = []
+
+    def loader(username):
+        calls.append(username)
+        return USERS.get(username)
+
+    registry = RoleRegistry(ROLES, loader=loader)
+    assert registry.has_roles("chuck", "admin")
+    assert registry.has_roles("jon", ["admin", "editor"])
+    assert not registry.has_roles("arya", "editor")
+    assert registry.has_permissions("chuck", ["read", "delete"])
+    assert registry.has_permissions("jon", "write")
+    assert not registry.has_permissions("jon", ["write", "delete"])
+    assert not registry.has_permissions("nobody", "read")
+
+    registry.masks("chuck")
+    assert calls == ["chuck", "jon", "arya", "nobody"]
+
+    USERS["arya"] = ["editor"]
+    try:
+        assert not registry.has_roles("arya", "editor")
+        registry.invalidate("arya")
+        assert registry.has_roles("arya", "editor")
+    finally:
+        USERS["arya"] = []
+
+
+def test_registry_is_bounded_and_define_role_invalidates():
+    registry = RoleRegistry(ROLES, loader=USERS.get, maxsize=2)
+    for username in USERS:
+        registry.masks(username)
+    assert len(registry) == 2
+
+    registry.define_role("editor", ["read", "write", "publish"])
+    assert len(registry) == 0
+    assert registry.masks("jon")[1] & PERMISSION_BITS.mask("publish")
+
+
+@pytest.fixture
+def roles_app():
+    app = Flask(__name__)
+    app.config["SECRET_KEY"] = "secret-here"
+    app.config["WTF_CSRF_ENABLED"] = False
+    store = MemoryUserStore()
+    store.hasher.method = "pbkdf2:sha256:1000"
+    store.create_user("chuck", "norris", roles=["admin"])
+    store.create_user("jon", "snow", roles=["editor"])
+    store.create_user("arya", "stark")
+    SimpleLogin(app, user_store=store, roles=RoleRegistry(ROLES))
+
+    @app.route("/edit", methods=["GET", "POST"])
+    @login_required(basic=True, roles=["admin", "editor"], permissions="write")
+    def edit():
+        return get_username()
+
+    @app.route("/delete")
+    @login_required(permissions=["write", "delete"])
+    def delete():
+        return get_username()
+
+    return app
+
+
+def login(app, username, password):
+    client = app.test_client()
+    client.post("/login/", data={"username": username, "password": password})
+    return client
+
+
+def test_login_required_roles_and_permissions(roles_app):
+    chuck = login(roles_app, "chuck", "norris")
+    jon = login(roles_app, "jon", "snow")
+    arya = login(roles_app, "arya", "stark")
+
+    assert chuck.get("/edit").data == b"chuck"
+    assert chuck.get("/delete").data == b"chuck"
+    assert jon.get("/edit").data == b"jon"
+    assert jon.get("/delete").status_code == 403
+    assert arya.get("/edit").status_code == 403
+    assert roles_app.test_client().get("/edit").status_code == 302
+
+
+def test_roles_are_checked_for_basic_auth(roles_app):
+    def post(credentials):
+        auth = b64encode(credentials).decode("utf-8")
+        headers = {"Authorization": f"Basic {auth}", "Content-Type": "application/json"}
+        return roles_app.test_client().post("/edit", headers=headers)
+
+    assert post(b"jon:snow").status_code == 200
+    assert post(b"arya:stark").status_code == 403
+
+
+def test_store_changes_invalidate_roles(roles_app):
+    simplelogin = roles_app.extensions["simplelogin"]
+    arya = login(roles_app, "arya", "stark")
+    assert arya.get("/edit").status_code == 403
+
+    simplelogin.user_store.set_roles("arya", ["editor"])
+    assert arya.get("/edit").status_code == 200
+    assert simplelogin.user_store.get_roles("arya") == ["editor"]
+
+    with pytest.raises(KeyError):
+        simplelogin.user_store.set_roles("nobody", ["editor"])
@@ -0,0 +1,153 @@
+from base64 import b64encode
+
+import pytest
+from flask import Flask, session
+
+from flask_simplelogin import (
+    MemorySessionBackend,
+    SimpleLogin,
+    SQLiteSessionBackend,
+    login_required,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def backend_factory(request, tmp_path):
+    def factory(clock):
+        if request.param == "memory":
+            return MemorySessionBackend(clock=clock)
+        return SQLiteSessionBackend(str(tmp_path / "sessions.db"), clock=clock)
+
+    return factory
+
+
+def test_backend_get_set_delete_and_expire(backend_factory):
+    clock = FakeClock()
+    backend = backend_factory(clock)
+    backend.set("sid", {"simple_username": "chuck"}, ttl=10)
+    assert backend.get("sid") == {"simple_username": "chuck"}
+    assert backend.get("other") is None
+
+    clock.now += 10
+    assert backend.get("sid") is None
+
+    backend.set("sid", {"a": 1}, ttl=10)
+    backend.delete("sid")
+    assert backend.get("sid") is None
+
+
+def test_memory_backend_is_bounded():
+    clock = FakeClock()
+    backend = MemorySessionBackend(maxsize=2, clock=clock)
+    backend.set("expired", {}, ttl=1)
+    backend.set("b", {}, ttl=20)
+    clock.now += 1
+    backend.set("c", {}, ttl=10)
+    assert len(backend) == 2
+    backend.set("d", {}, ttl=30)
+    assert len(backend) == 2
+    assert backend.get("c") is None
+    assert backend.get("d") is not None
+
+
+def test_memory_backend_evicts_in_batches():
+    clock = FakeClock()
+    backend = MemorySessionBackend(maxsize=200, clock=clock)
+    for n in range(200):
+        backend.set(f"sid-{n}", {}, ttl=100 + n)
+    backend.set("new", {}, ttl=10)
+    assert len(backend) == 199
+    assert backend.get("sid-0") is None
+    assert backend.get("sid-1") is None
+    assert backend.get("sid-2") is not None
+
+    backend.set("newer", {}, ttl=10)
+    assert len(backend) == 200
+    assert backend.get("new") is not None
+
+
+def test_memory_backend_forgets_stale_expirations():
+    backend = MemorySessionBackend(maxsize=200)
+    for _ in range(100):
+        backend.set("sid", {}, ttl=10)
+    assert len(backend._expirations) <= 2 + backend._batch
+
+
+def test_sqlite_backend_cleans_expired_sessions():
+    clock = FakeClock()
+    backend = SQLiteSessionBackend(":memory:", cleanup_every=2, clock=clock)
+    backend.set("old", {}, ttl=1)
+    clock.now += 1
+    backend.set("new", {}, ttl=1)
+    count = backend._connection().execute("SELECT COUNT(*) FROM simplelogin_sessions")
+    assert count.fetchone() == (1,)
+
+
+@pytest.fixture
+def server_side_app():
+    app = Flask(__name__)
+    app.config["SECRET_KEY"] = "secret-here"
+    backend = MemorySessionBackend()
+    SimpleLogin(app, session_backend=backend)
+
+    @app.route("/api", methods=["POST"])
+    @login_required(basic=True)
+    def api():
+        return "ok"
+
+    @app.route("/secret")
+    @login_required
+    def secret():
+        return session["simple_username"]
+
+    return app
+
+
+def basic_auth_headers():
+    auth = b64encode(b"admin:secret").decode("utf-8")
+    return {"Authorization": f"Basic {auth}", "Content-Type": "application/json"}
+
+
+def test_cookie_holds_only_the_session_id(server_side_app):
+    backend = server_side_app.extensions["simplelogin"].session_backend
+    with server_side_app.test_client() as client:
+        response = client.post("/api", headers=basic_auth_headers())
+        assert response.status_code == 200
+        cookie = client.get_cookie("session")
+        assert backend.get(cookie.value)["simple_username"] == "admin"
+        assert client.get("/secret").data == b"admin"
+
+
+def test_unchanged_session_is_not_saved(server_side_app, mocker):
+    backend = server_side_app.extensions["simplelogin"].session_backend
+    with server_side_app.test_client() as client:
+        client.post("/api", headers=basic_auth_headers())
+        spy = mocker.spy(backend, "set")
+        response = client.get("/secret")
+        assert "Set-Cookie" not in response.headers
+        spy.assert_not_called()
+
+
+def test_session_id_changes_on_login_and_is_deleted_on_logout(server_side_app):
+    backend = server_side_app.extensions["simplelogin"].session_backend
+    with server_side_app.test_client() as client:
+        client.get("/login/")  # creates a session with the CSRF token
+        anonymous_sid = client.get_cookie("session").value
+        assert backend.get(anonymous_sid) is not None
+
+        client.post("/login/", headers=basic_auth_headers())
+        sid = client.get_cookie("session").value
+        assert sid != anonymous_sid
+        assert backend.get(anonymous_sid) is None
+
+        client.get("/logout/")
+        assert backend.get(sid) is None or "simple_logged_in" not in backend.get(sid)
+        assert client.get("/secret").status_code == 302
@@ -0,0 +1,68 @@
+from base64 import b64encode
+
+import pytest
+
+from flask_simplelogin import login_required, signals
+
+
+@pytest.fixture
+def create_app(create_app):
+    def factory():
+        app = create_app()
+
+        @app.route("/admin", methods=["GET", "POST"])
+        @login_required(username="chuck", basic=True)
+        def admin():
+            return "admin"
+
+        return app
+
+    return factory
+
+
+def record(app, *names):
+    received = []
+    for name in names:
+
+        def receiver(sender, name=name, **kwargs):
+            assert sender is app
+            received.append((name, kwargs))
+
+        getattr(signals, name).connect(receiver, sender=app, weak=False)
+    return received
+
+
+def test_form_login_signals(create_app):
+    app = create_app()
+    received = record(app, "login_succeeded", "login_failed", "logged_out")
+    client = app.test_client()
+    client.post("/login/", data={"username": "admin", "password": "wrong"})
+    client.post("/login/", data={"username": "admin", "password": "secret"})
+    client.get("/logout/")
+    assert received == [
+        ("login_failed", {"username": "admin", "method": "form"}),
+        ("login_succeeded", {"username": "admin", "method": "form"}),
+        ("logged_out", {"username": "admin"}),
+    ]
+
+
+def test_basic_auth_and_access_denied_signals(create_app):
+    app = create_app()
+    received = record(app, "basic_auth_checked", "access_denied", "login_failed")
+    client = app.test_client(use_cookies=False)
+
+    assert client.get("/admin").status_code == 302
+
+    def post(credentials):
+        auth = b64encode(credentials).decode("utf-8")
+        headers = {"Authorization": f"Basic {auth}", "Content-Type": "application/json"}
+        return client.post("/admin", headers=headers)
+
+    assert post(b"admin:wrong").status_code == 401
+    assert post(b"admin:secret").status_code == 403
+    assert received == [
+        ("access_denied", {"username": None, "reason": "login_required"}),
+        ("basic_auth_checked", {"username": "admin", "succeeded": False}),
+        ("basic_auth_checked", {"username": "admin", "succeeded": True}),
+        ("access_denied", {"username": "admin", "reason": "username"}),
+    ]
@@ -0,0 +1,234 @@
+import json
+import os
+import threading
+from base64 import b64encode
+from unittest.mock import Mock
+
+import pytest
+from flask import Flask
+from werkzeug.security import generate_password_hash
+
+from flask_simplelogin import (
+    FileUserStore,
+    MemoryUserStore,
+    PasswordHasher,
+    SimpleLogin,
+    SQLiteUserStore,
+    login_required,
+)
+
+FAST_HASHER = PasswordHasher("pbkdf2:sha256:1000")
+
+
+@pytest.fixture(params=["memory", "sqlite", "file"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        user_store = MemoryUserStore()
+    elif request.param == "file":
+        user_store = FileUserStore(str(tmp_path / "users.json"))
+    else:
+        user_store = SQLiteUserStore(str(tmp_path / "users.db"), pool_size=2)
+    user_store.hasher = FAST_HASHER
+    return user_store
+
+
+def test_create_and_check_user(store):
+    record = store.create_user("chuck", "norris", name="Chuck Norris")
+    assert record["password"] != "norris"
+    assert store.get("chuck")["name"] == "Chuck Norris"
+    assert store.check({"username": "chuck", "password": "norris"})
+    assert store({"username": "chuck", "password": "norris"})
+    assert not store.check({"username": "chuck", "password": "wrong"})
+    assert not store.check({"username": "bruce", "password": "norris"})
+    assert not store.check({"username": "chuck", "password": None})
+
+
+def test_unknown_users_are_verified_against_a_dummy_hash(store, mocker):
+    store.create_user("chuck", "norris")
+    verify = mocker.spy(store.hasher, "verify")
+    assert not store.check({"username": "bruce", "password": "norris"})
+    assert not store.check({"username": "chuck", "password": "wrong"})
+    assert verify.call_count == 2
+
+    unknown_user_hash = verify.call_args_list[0].args[1]
+    assert unknown_user_hash.startswith(f"{store.hasher.method}$")
+    assert not store.check({"username": "bruce", "password": "norris"})
+    assert verify.call_args_list[2].args[1] == unknown_user_hash
+
+
+def test_create_user_requires_credentials(store):
+    with pytest.raises(ValueError):
+        store.create_user("chuck", "")
+
+
+def test_set_password_and_delete_notify_callbacks(store):
+    callback = Mock()
+    store.register_on_change_callback(callback)
+    store.create_user("chuck", "norris")
+    store.set_password("chuck", "roundhouse")
+    assert store.check({"username": "chuck", "password": "roundhouse"})
+    assert store.delete_user("chuck")
+    assert not store.delete_user("chuck")
+    assert store.get("chuck") is None
+    assert callback.call_count == 3
+
+    with pytest.raises(KeyError):
+        store.set_password("chuck", "norris")
+
+
+def test_sqlite_store_pool_is_bounded(tmp_path):
+    store = SQLiteUserStore(str(tmp_path / "users.db"), pool_size=2)
+    store.create_user("chuck", "norris")
+    errors = []
+
+    def login():
+        try:
+            for _ in range(5):
+                assert store.get("chuck") is not None
+        except Exception as error:  # pragma: no cover
+            errors.append(error)
+
+    threads = [threading.Thread(target=login) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    assert store._created <= 2
+    store.close()
+    assert store._created == 0
+
+
+def test_sqlite_memory_database_uses_a_single_connection():
+    store = SQLiteUserStore(":memory:", pool_size=4)
+    store.create_user("chuck", "norris")
+    assert store.pool_size == 1
+    assert store.get("chuck") is not None
+
+
+def test_default_login_checker_uses_user_store():
+    store = MemoryUserStore()
+    store.create_user("chuck", "norris")
+    app = Flask(__name__)
+    app.config["SECRET_KEY"] = "secret-here"
+    simplelogin = SimpleLogin(app, user_store=store)
+    simplelogin.credential_cache = Mock()
+    simplelogin.credential_cache.get.return_value = False
+
+    @app.route("/api", methods=["POST"])
+    @login_required(basic=True)
+    def api():
+        return "ok"
+
+    def post(credentials):
+        auth = b64encode(credentials).decode("utf-8")
+        headers = {"Authorization": f"Basic {auth}", "Content-Type": "application/json"}
+        return app.test_client().post("/api", headers=headers)
+
+    assert post(b"chuck:norris").status_code == 200
+    assert post(b"admin:secret").status_code == 401
+
+    store.set_password("chuck", "roundhouse")
+    simplelogin.credential_cache.invalidate.assert_called_once_with("chuck")
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def wait_for_reload():
+    for thread in threading.enumerate():
+        if thread.name == "simplelogin-user-reload":
+            thread.join()
+
+
+def test_file_store_reloads_changed_file(tmp_path):
+    path = tmp_path / "users.json"
+    clock = FakeClock()
+    store = FileUserStore(str(path), check_interval=5, clock=clock)
+    store.create_user("chuck", "norris")
+
+    other = FileUserStore(str(path))
+    assert len(other) == 1
+    other.create_user("bruce", "lee")
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    assert store.get("bruce") is None  # not checked again yet
+    clock.now = 6
+    store.get("bruce")  # notices the change and reloads in the background
+    wait_for_reload()
+    assert store.get("bruce") is not None
+    assert len(store) == 2
+
+
+def test_file_store_ignores_malformed_entries(tmp_path):
+    path = tmp_path / "users.json"
+    path.write_text(json.dumps({"username": "", "password": ""}))
+    assert len(FileUserStore(str(path))) == 0
+
+
+def test_file_store_keeps_users_if_reload_fails(tmp_path):
+    path = tmp_path / "users.json"
+    clock = FakeClock()
+    store = FileUserStore(str(path), check_interval=1, clock=clock)
+    store.create_user("chuck", "norris")
+    path.write_text("{ not json")
+    clock.now = 2
+    store.get("chuck")
+    wait_for_reload()
+    assert store.get("chuck") is not None
+
+
+def test_file_store_can_be_a_login_checker(tmp_path):
+    store = FileUserStore(str(tmp_path / "users.json"))
+    store.create_user("chuck", "norris")
+    app = Flask(__name__)
+    app.config["SECRET_KEY"] = "secret-here"
+    SimpleLogin(app, login_checker=store)
+
+    @app.route("/api", methods=["POST"])
+    @login_required(basic=True)
+    def api():
+        return "ok"
+
+    auth = b64encode(b"chuck:norris").decode("utf-8")
+    headers = {"Authorization": f"Basic {auth}", "Content-Type": "application/json"}
+    assert app.test_client().post("/api", headers=headers).status_code == 200
+
+
+def test_hash_is_upgraded_on_login(store):
+    store.create_user("chuck", "norris")
+    old_hash = store.get("chuck")["password"]
+    store.hasher = PasswordHasher("pbkdf2:sha256:2000")
+    store.rehash = True
+    assert not store.check({"username": "chuck", "password": "wrong"})
+    assert store.get("chuck")["password"] == old_hash
+
+    assert store.check({"username": "chuck", "password": "norris"})
+    new_hash = store.get("chuck")["password"]
+    assert new_hash.startswith("pbkdf2:sha256:2000$")
+    assert store.check({"username": "chuck", "password": "norris"})
+
+
+def test_hashes_are_kept_without_a_hash_method(store, create_app):
+    store.put({"username": "chuck", "password": generate_password_hash("norris")})
+    old_hash = store.get("chuck")["password"]
+    SimpleLogin(create_app(init=False), user_store=store)
+    assert store.check({"username": "chuck", "password": "norris"})
+    assert store.get("chuck")["password"] == old_hash
+
+
+def test_simplelogin_configures_store_hasher():
+    store = MemoryUserStore()
+    app = Flask(__name__)
+    app.config["SECRET_KEY"] = "secret-here"
+    app.config["SIMPLELOGIN_PASSWORD_HASH_METHOD"] = "scrypt:1024:8:1"
+    SimpleLogin(app, user_store=store)
+    assert store.hasher.method == "scrypt:1024:8:1"
+    assert store.rehash
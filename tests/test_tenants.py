@@ -0,0 +1,213 @@
+from base64 import b64encode
+
+import pytest
+from werkzeug.middleware.dispatcher import DispatcherMiddleware
+from werkzeug.test import Client
+
+from benchmarks import tenants
+from flask_simplelogin import (
+    MemorySessionBackend,
+    MemoryUserStore,
+    Message,
+    SimpleLogin,
+    SimpleLoginNotInitializedError,
+    get_username,
+    login_required,
+)
+from flask_simplelogin.ratelimit import MemoryCounterStorage
+
+
+@pytest.fixture
+def create_app(create_app):
+    """Apps left for the tests to initialize, with an API of their own"""
+
+    def factory(name, **settings):
+        app = create_app(name, init=False, SECRET_KEY=f"{name}-secret", **settings)
+
+        @app.route("/api", methods=["POST"])
+        @login_required(basic=True)
+        def api():
+            return {"app": name}
+
+        return app
+
+    return factory
+
+
+def basic_auth(username, password):
+    auth = b64encode(f"{username}:{password}".encode()).decode("utf-8")
+    return {"Authorization": f"Basic {auth}", "Content-Type": "application/json"}
+
+
+def test_one_instance_serves_many_apps(create_app):
+    first = create_app("first", SIMPLELOGIN_LOGIN_URL="/signin/")
+    second = create_app("second", SIMPLELOGIN_USERNAME="chuck")
+    simple_login = SimpleLogin()
+    simple_login.init_app(first)
+    simple_login.init_app(second)
+
+    assert first.extensions["simplelogin"] is simple_login
+    tenant = second.extensions["simplelogin"]
+    assert tenant is not simple_login
+    assert simple_login.tenants == [simple_login, tenant]
+    assert simple_login.for_app(second) is tenant
+    with second.app_context():
+        assert simple_login.for_app() is tenant
+
+    assert simple_login.config["login_url"] == "/signin/"
+    assert tenant.config["login_url"] == "/login/"
+    assert first.test_client().get("/signin/").status_code == 200
+    assert second.test_client().get("/login/").status_code == 200
+
+    headers = basic_auth("chuck", "secret")
+    assert first.test_client().post("/api", headers=headers).status_code == 401
+    assert second.test_client().post("/api", headers=headers).json == {"app": "second"}
+
+
+def test_for_app_rejects_apps_of_other_instances(create_app):
+    simple_login = SimpleLogin(create_app("first"))
+    other = create_app("other")
+    SimpleLogin(other)
+    with pytest.raises(SimpleLoginNotInitializedError):
+        simple_login.for_app(other)
+
+
+def test_init_app_twice_on_the_same_app_fails(create_app):
+    app = create_app("app")
+    simple_login = SimpleLogin(app)
+    with pytest.raises(RuntimeError):
+        simple_login.init_app(app)
+
+
+def test_config_and_messages_are_read_only(create_app):
+    simple_login = SimpleLogin(create_app("app"))
+    with pytest.raises(TypeError):
+        simple_login.config["login_url"] = "/elsewhere/"
+    with pytest.raises(TypeError):
+        simple_login.messages["logout"] = None
+
+
+def test_custom_messages_do_not_leak_between_apps(create_app):
+    defaults = dict(SimpleLogin.messages)
+    messages = {"logout": "Bye!"}
+    simple_login = SimpleLogin(create_app("first"), messages=messages)
+    simple_login.init_app(create_app("second"), messages={"logout": None})
+    same = SimpleLogin(create_app("third"), messages=messages)
+
+    assert dict(SimpleLogin.messages) == defaults
+    assert SimpleLogin(create_app("plain")).messages is SimpleLogin.messages
+    assert simple_login.messages["logout"] == Message("Bye!")
+    assert simple_login.tenants[1].messages["logout"] is None
+    assert same.messages is simple_login.messages
+
+
+def test_apps_with_the_same_settings_share_their_config(create_app):
+    simple_login = SimpleLogin()
+    for name in ("first", "second"):
+        simple_login.init_app(create_app(name, SIMPLELOGIN_HOME_URL="/home/"))
+    first, second = simple_login.tenants
+    assert first.config is second.config
+
+
+def test_login_checker_applies_to_every_app(create_app):
+    first, second = create_app("first"), create_app("second")
+    simple_login = SimpleLogin(first)
+    simple_login.init_app(second)
+
+    @simple_login.login_checker
+    def only_chuck(user):
+        return user["username"] == "chuck"
+
+    headers = basic_auth("chuck", "whatever")
+    for app in (first, second):
+        assert app.test_client().post("/api", headers=headers).status_code == 200
+
+
+def test_user_store_changes_reach_every_app(create_app):
+    store = MemoryUserStore()
+    store.create_user("chuck", "norris")
+    first = create_app("first", SIMPLELOGIN_BASIC_AUTH_CACHE_TTL=60)
+    second = create_app("second", SIMPLELOGIN_BASIC_AUTH_CACHE_TTL=60)
+    simple_login = SimpleLogin(first, login_checker=store, user_store=store)
+    simple_login.init_app(second)
+
+    headers = basic_auth("chuck", "norris")
+    for app in (first, second):
+        assert app.test_client().post("/api", headers=headers).status_code == 200
+
+    store.set_password("chuck", "roundhouse")
+    for app in (first, second):
+        assert app.test_client().post("/api", headers=headers).status_code == 401
+
+
+def test_validator_executor_is_created_on_first_use(create_app):
+    simple_login = SimpleLogin(create_app("app"))
+    assert simple_login._validator_executor is None
+    executor = simple_login.validator_executor
+    assert executor is simple_login.validator_executor
+    assert executor.max_workers == 4
+
+
+def test_footprint_per_app_is_bounded():
+    footprint = tenants.measure("shared", 20)
+    assert footprint.per_app_kib < 64
+    assert tenants.main(["--apps", "5", "--max-kib", "0"]) == 1
+
+
+def test_apps_sharing_a_session_backend_do_not_share_sessions(create_app):
+    first, second = create_app("first"), create_app("second")
+    for app in (first, second):
+
+        @app.route("/secret")
+        @login_required
+        def secret():
+            return f"hello {get_username()}"
+
+    simple_login = SimpleLogin(first, session_backend=MemorySessionBackend())
+    simple_login.init_app(second)
+    dispatcher = DispatcherMiddleware(first, {"/b": second})
+    client = Client(dispatcher)
+
+    client.post("/login/", data={"username": "admin", "password": "secret"})
+    assert client.get("/secret").text == "hello admin"
+    assert client.get("/b/secret").status_code == 302
+
+
+def test_apps_sharing_a_rate_limit_storage_have_their_own_lockouts(create_app):
+    settings = {"SIMPLELOGIN_LOGIN_RATE_LIMIT": 1}
+    first, second = create_app("first", **settings), create_app("second", **settings)
+    simple_login = SimpleLogin(first, rate_limit_storage=MemoryCounterStorage())
+    simple_login.init_app(second)
+
+    wrong = basic_auth("admin", "wrong")
+    client = first.test_client()
+    assert client.post("/api", headers=wrong).status_code == 401
+    assert client.post("/api", headers=wrong).status_code == 429
+
+    headers = basic_auth("admin", "secret")
+    assert second.test_client().post("/api", headers=headers).status_code == 200
+
+
+def test_apps_with_their_own_user_store_have_their_own_roles(create_app):
+    first_store, second_store = MemoryUserStore(), MemoryUserStore()
+    first_store.create_user("bob", "secret", roles=["admin"])
+    second_store.create_user("bob", "secret")
+    first, second = create_app("first"), create_app("second")
+    for app in (first, second):
+
+        @app.route("/admin", methods=["POST"])
+        @login_required(basic=True, roles="admin")
+        def admin():
+            return "admin"
+
+    simple_login = SimpleLogin(login_checker=lambda user: True)
+    simple_login.init_app(first, user_store=first_store)
+    simple_login.init_app(second, user_store=second_store)
+
+    headers = basic_auth("bob", "secret")
+    assert first.test_client().post("/admin", headers=headers).status_code == 200
+    assert second.test_client().post("/admin", headers=headers).status_code == 403
+
+    second_store.set_roles("bob", ["admin"])
+    assert second.test_client().post("/admin", headers=headers).status_code == 200
+    assert simple_login.for_app(second).roles is not simple_login.roles
@@ -0,0 +1,100 @@
+from base64 import b64encode
+
+import pytest
+from flask import Flask
+
+from flask_simplelogin import SimpleLogin, get_username, login_required
+from flask_simplelogin.tokens import TokenSigner
+
+
+def test_issue_and_verify():
+    signer = TokenSigner(["key"], max_age=60)
+    assert signer.verify(signer.issue("chuck")) == "chuck"
+    assert signer.verify("not a token") is None
+    assert TokenSigner(["other"], max_age=60).verify(signer.issue("chuck")) is None
+
+
+def test_expired_tokens_are_rejected(mocker):
+    signer = TokenSigner(["key"], max_age=60)
+    token = signer.issue("chuck")
+    mocker.patch("itsdangerous.timed.time.time", return_value=10**11)
+    assert signer.verify(token) is None
+
+
+def test_key_rotation():
+    old = TokenSigner(["old"], max_age=60)
+    rotated = TokenSigner(["old", "new"], max_age=60)
+    assert rotated.verify(old.issue("chuck")) == "chuck"
+    assert old.verify(rotated.issue("chuck")) is None
+    assert TokenSigner(["new"], max_age=60).verify(rotated.issue("chuck")) == "chuck"
+
+
+def test_keys_are_required():
+    with pytest.raises(ValueError):
+        TokenSigner([], max_age=60)
+
+
+@pytest.fixture
+def token_app():
+    app = Flask(__name__)
+    app.config["SECRET_KEY"] = "secret-here"
+    app.config["SIMPLELOGIN_TOKEN_MAX_AGE"] = 300
+    SimpleLogin(app)
+
+    @app.route("/api", methods=["POST"])
+    @login_required(basic=True)
+    def api():
+        return get_username()
+
+    @app.route("/admin")
+    @login_required(username="chuck")
+    def admin():
+        return "admin"
+
+    return app
+
+
+def test_login_issues_tokens_and_views_accept_them(token_app, mocker):
+    simplelogin = token_app.extensions["simplelogin"]
+    auth = b64encode(b"admin:secret").decode("utf-8")
+    client = token_app.test_client(use_cookies=False)
+    response = client.post(
+        "/login/",
+        headers={"Authorization": f"Basic {auth}", "Content-Type": "application/json"},
+    )
+    assert response.status_code == 200
+    assert response.json["token_type"] == "Bearer"
+    assert response.json["expires_in"] == 300
+
+    checker = mocker.patch.object(simplelogin, "_login_checker")
+    headers = {
+        "Authorization": f"Bearer {response.json['token']}",
+        "Content-Type": "application/json",
+    }
+    response = client.post("/api", headers=headers)
+    assert response.status_code == 200
+    assert response.data == b"admin"
+    assert client.get("/admin", headers=headers).status_code == 403
+    checker.assert_not_called()
+
+
+def test_invalid_bearer_tokens_are_rejected(token_app):
+    client = token_app.test_client()
+    response = client.post("/api", headers={"Authorization": "Bearer nope"})
+    assert response.status_code == 401
+    assert "invalid_token" in response.headers["WWW-Authenticate"]
+
+
+def test_issue_token_requires_tokens_enabled(app):
+    with pytest.raises(RuntimeError):
+        app.extensions["simplelogin"].issue_token("chuck")
+
+
+def test_token_keys_config():
+    app = Flask(__name__)
+    app.config["SECRET_KEY"] = "secret-here"
+    app.config["SIMPLELOGIN_TOKEN_MAX_AGE"] = 60
+    app.config["SIMPLELOGIN_TOKEN_KEYS"] = ["old", "new"]
+    simplelogin = SimpleLogin(app)
+    token = TokenSigner(["old"], max_age=60).issue("chuck")
+    assert simplelogin.token_signer.verify(token) == "chuck"
@@ -0,0 +1,158 @@
+import asyncio
+import time
+
+import pytest
+
+from flask_simplelogin import batch_validator, login_required
+from flask_simplelogin.validators import compile_validators, validator_name
+
+GRANTS = {"chuck": {"edit", "publish"}, "jon": {"edit"}}
+
+
+@pytest.fixture
+def calls():
+    return []
+
+
+@pytest.fixture
+def can(calls):
+    @batch_validator
+    def can(username, checks):
+        calls.append(checks)
+        granted = GRANTS.get(username, set())
+        return [
+            None if action in granted else f"Cannot {action}" for (action,) in checks
+        ]
+
+    return can
+
+
+def logged_in_client(app, username):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session["simple_logged_in"] = True
+        session["simple_username"] = username
+    return client
+
+
+def test_batch_checks_are_merged(can):
+    def plain(username):
+        return None
+
+    compiled = compile_validators([can.check("edit"), plain, can.check("publish")])
+    assert len(compiled) == 2
+    assert compiled[1] is plain
+    assert validator_name(compiled[0]) == validator_name(can.function)
+    assert len(compile_validators(can.check("edit"))) == 1
+
+
+def test_batch_validator_runs_once_per_request(can, calls, create_app):
+    app = create_app()
+
+    @app.route("/publish")
+    @login_required(must=[can.check("edit"), can.check("publish")])
+    def publish():
+        return "published"
+
+    assert logged_in_client(app, "chuck").get("/publish").data == b"published"
+    assert calls == [(("edit",), ("publish",))]
+
+    response = logged_in_client(app, "jon").get("/publish")
+    assert response.status_code == 403
+    assert b"Cannot publish" in response.data
+    assert len(calls) == 2
+
+
+def slow(seconds, error=None):
+    def validator(username):
+        time.sleep(seconds)
+        return error
+
+    validator.__qualname__ = f"slow_{seconds}_{bool(error)}"
+    return validator
+
+
+def test_concurrent_validators(create_app):
+    app = create_app()
+
+    @app.route("/concurrent")
+    @login_required(must=[slow(0.2), slow(0.2), slow(0.2)], concurrent=True)
+    def concurrent():
+        return "ok"
+
+    @app.route("/early-exit")
+    @login_required(must=[slow(1), slow(0, error="Nope")], concurrent=True)
+    def early_exit():
+        return "ok"
+
+    client = logged_in_client(app, "chuck")
+    started_at = time.perf_counter()
+    assert client.get("/concurrent").status_code == 200
+    assert time.perf_counter() - started_at < 0.5
+
+    started_at = time.perf_counter()
+    response = client.get("/early-exit")
+    assert response.status_code == 403
+    assert b"Nope" in response.data
+    assert time.perf_counter() - started_at < 0.5
+
+
+def test_validator_timings(create_app):
+    app = create_app()
+    validator = slow(0.01)
+
+    @app.route("/timed")
+    @login_required(must=validator)
+    def timed():
+        return "ok"
+
+    client = logged_in_client(app, "chuck")
+    client.get("/timed")
+    client.get("/timed")
+
+    timings = app.extensions["simplelogin"].validator_timings
+    name = validator_name(validator)
+    assert name in timings
+    assert timings[name].count == 2
+    assert timings[name].mean >= 0.01
+    assert timings.slowest(1) == [(name, timings[name])]
+
+
+def test_async_batch_and_concurrent_validators(calls, create_app):
+    pytest.importorskip("asgiref")
+
+    @batch_validator
+    async def can(username, checks):
+        calls.append(checks)
+        granted = GRANTS.get(username, set())
+        return [
+            None if action in granted else f"Cannot {action}" for (action,) in checks
+        ]
+
+    async def sleepy(username):
+        await asyncio.sleep(0.2)
+
+    app = create_app()
+
+    @app.route("/async")
+    @login_required(
+        must=[sleepy, can.check("edit"), can.check("publish"), slow(0.2)],
+        concurrent=True,
+    )
+    async def view():
+        return "ok"
+
+    @app.route("/sync")
+    @login_required(must=[can.check("edit"), sleepy])
+    def sync_view():
+        return "ok"
+
+    started_at = time.perf_counter()
+    assert logged_in_client(app, "chuck").get("/async").status_code == 200
+    assert time.perf_counter() - started_at < 0.35
+
+    response = logged_in_client(app, "jon").get("/async")
+    assert response.status_code == 403
+    assert b"Cannot publish" in response.data
+    assert logged_in_client(app, "jon").get("/sync").status_code == 200
+    assert len(calls) == 3